@@ -0,0 +1,508 @@
+# bench.py — microbenchmarks del listener (python bench.py <nombre>)
+import argparse
+import re
+import time
+
+def sample_invoice(products=5, billing=False, tables=1):
+    """Builds an invoice payload shaped like the ones sent in NewOrderComanda events."""
+    return {
+        "code": "0003-00001234",
+        "date": "2025-08-01",
+        "hour": "12:30",
+        "total": str(3001.0 * products),
+        "billing": billing,
+        "company": {"name": "Parrilla Don José", "address": "Av. Siempreviva 742", "document_number": "20361797400"},
+        "client": {"name": "Consumidor Final", "document_number": "0", "document_type": {"Id": 99}},
+        "seller": {"name": "Ana"},
+        "invoice_type": {"name": "Comanda"},
+        "tables": [{"name": str(i + 1), "living_room": {"name": "Salón"}} for i in range(tables)],
+        "products": [
+            {"id": 1000 + i, "name": f"Milanesa napolitana {i}", "description": "Con papas fritas y ensalada",
+             "image": f"https://cdn.example.com/products/{1000 + i}.jpg", "barcode": f"779{i:010d}",
+             "category": {"id": 3, "name": "Cocina", "created_at": "2024-01-01T00:00:00Z"},
+             "created_at": "2024-01-01T00:00:00Z", "updated_at": "2025-07-30T18:22:11Z",
+             "pivot": {"invoice_id": 1234, "product_id": 1000 + i, "amount": "2", "price": "1500.50", "taxe": 21}}
+            for i in range(products)
+        ],
+        "electronic_invoice": {"fields": {
+            "income_brut": "901-123456-7", "activity_start_date": "2020-01-01",
+            "voucher_type": {"Id": 6, "Desc": "Factura B"}, "concept_type": {"Desc": "Productos"},
+            "point_of_sale": 3, "cbte_hasta": 1234, "cae": "74123456789012", "caef_ch_vto": "2025-08-11",
+        }} if billing else {},
+    }
+
+def timeit(fn, min_time=0.5):
+    """Returns seconds per call, repeating until `min_time` has elapsed."""
+    fn()
+    n, start = 0, time.perf_counter()
+    while True:
+        fn()
+        n += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / n
+
+def bench_render(args):
+    from utils.ticket import get_layout, invoice_fields
+    for paper in ("58mm", "80mm"):
+        layout = get_layout(paper)
+        for products in (1, 10, 50, 100, 500):
+            data = sample_invoice(products, billing=True)
+            fields = invoice_fields(data)
+            cost = timeit(lambda: layout.render_text(data, fields=fields))
+            print(f"render {paper} {products:>4} items: {cost * 1e6:9.1f} µs/ticket")
+
+def bench_qr(args):
+    import qrcode
+    from utils import ticket
+    data = sample_invoice(5, billing=True)
+    url = ticket.afip_qr_url(data, data["company"], ticket.invoice_fields(data))
+
+    def cold(fn):
+        def run():
+            ticket.qr_bitmap.cache_clear()
+            ticket.qr_raster.cache_clear()
+            ticket.qr_image.cache_clear()
+            fn()
+        return run
+
+    cases = [
+        ("before: qrcode.make + resize(300)", lambda: qrcode.make(url).resize((300, 300))),
+        ("raster 1-bit, uncached", cold(lambda: ticket.qr_raster(url, 288))),
+        ("raster 1-bit, cached (reprint)", lambda: ticket.qr_raster(url, 288)),
+        ("GDI image, uncached", cold(lambda: ticket.qr_image(url))),
+        ("native GS ( k command", lambda: ticket.encode_lines([], qr=url)),
+    ]
+    for name, fn in cases:
+        print(f"qr {name:<36} {timeit(fn) * 1e6:10.1f} µs/ticket")
+
+def bench_backends(args):
+    from utils import backends
+    from utils.fake_printer import FakePrinter
+    from utils.ticket import generate_ticket_bytes
+    ticket = generate_ticket_bytes(sample_invoice(10))
+    count = 2000
+
+    with FakePrinter() as printer:
+        sinks = [("raw 9100 (fake printer)", backends.RawTcpBackend(printer.host, printer.port)),
+                 ("null", backends.backend_for("null:"))]
+        for name, backend in sinks:
+            start = time.perf_counter()
+            for _ in range(count):
+                backend.send(ticket)
+            elapsed = time.perf_counter() - start
+            print(f"backend {name:<26} {count / elapsed:10.0f} tickets/s ({len(ticket)} bytes each)")
+        deadline = time.time() + 2
+        while printer.cut_count() < count and time.time() < deadline:
+            time.sleep(0.01)
+        print(f"fake printer received {printer.cut_count()} tickets over {printer.connections} connection(s)")
+
+def bench_idle(args):
+    import threading
+    from utils.service import Supervisor
+    supervisor = Supervisor(interval=0.5)
+    supervisor.add("sleeper", lambda: _started(threading.Thread(target=supervisor.stop_event.wait, daemon=True)))
+    threading.Timer(3.0, supervisor.stop).start()
+    cpu, wall = time.process_time(), time.perf_counter()
+    supervisor.run()
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    print(f"idle supervisor: {cpu * 1000:.1f} ms CPU over {wall:.1f} s ({100 * cpu / wall:.2f}% of one core)")
+
+def bench_coalesce(args):
+    import contextlib
+    import io
+    from utils import metrics
+    from utils.dispatcher import PrintDispatcher
+    from utils.fake_printer import FakePrinter
+    from utils.printer import print_batch, print_invoice
+    metrics.LOG_FILE = None
+    count = 500
+
+    for latency in (0.0, 0.002):
+        for window, max_jobs in ((0.0, 1), (0.0, 16), (0.005, 16), (0.005, 64)):
+            with FakePrinter(latency=latency) as printer:
+                destination = f"{printer.host}:{printer.port}"
+                dispatcher = PrintDispatcher(print_invoice, maxsize=count, batch_handler=print_batch,
+                                             coalesce_window=window, coalesce_max=max_jobs)
+                invoices = [dict(sample_invoice(5, billing=False), code=f"B-{i}") for i in range(count)]
+                with contextlib.redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    for invoice in invoices:
+                        dispatcher.submit(invoice, destination)
+                    dispatcher.join()
+                    while printer.cut_count() < count and time.perf_counter() - start < 30:
+                        time.sleep(0.001)
+                    elapsed = time.perf_counter() - start
+                dispatcher.stop()
+                mode = "off" if max_jobs == 1 else f"{window * 1000:.0f} ms / {max_jobs} jobs"
+                print(f"coalesce {mode:<14} printer latency {latency * 1000:.0f} ms/write: "
+                      f"{count / elapsed:8.0f} tickets/s ({printer.reads} reads)")
+
+def bench_renderpool(args):
+    import contextlib
+    import io
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+    from utils import metrics, printer, render_pool, ticket
+    metrics.LOG_FILE = None
+    count = 400
+    print(f"renderpool on {os.cpu_count()} CPU(s): processes only pay off with spare cores")
+
+    def invoices():
+        # totales distintos: cada QR es nuevo, como en producción (sin aciertos de caché)
+        return [dict(sample_invoice(10, billing=True), total=str(1000 + i)) for i in range(count)]
+
+    for qr_mode in ("native", "raster"):
+        ticket.QR_MODE = qr_mode
+        ticket.qr_bitmap.cache_clear()
+        ticket.qr_raster.cache_clear()
+        batch = invoices()
+        start = time.perf_counter()
+        for data in batch:
+            ticket.generate_ticket_bytes(data, printer.PAPER, printer.CODEPAGE)
+        single = count / (time.perf_counter() - start)
+        print(f"renderpool {qr_mode:<6} in-thread         {single:8.0f} tickets/s")
+
+        ticket.qr_bitmap.cache_clear()
+        ticket.qr_raster.cache_clear()
+        batch = invoices()
+        with ThreadPoolExecutor(4) as threads:  # como 4 colas de impresora renderizando a la vez
+            start = time.perf_counter()
+            list(threads.map(lambda data: ticket.generate_ticket_bytes(data, printer.PAPER, printer.CODEPAGE), batch))
+            rate = count / (time.perf_counter() - start)
+        print(f"renderpool {qr_mode:<6} 4 threads         {rate:8.0f} tickets/s")
+
+        for workers in (2, 4):
+            with contextlib.redirect_stdout(io.StringIO()):
+                render_pool.start(workers)
+            batch = invoices()
+            with ThreadPoolExecutor(4) as threads:
+                start = time.perf_counter()
+                list(threads.map(lambda data: printer.render_tickets([data]), batch))
+                rate = count / (time.perf_counter() - start)
+            render_pool.stop()
+            print(f"renderpool {qr_mode:<6} {workers} processes       {rate:8.0f} tickets/s  ({rate / single:.2f}x)")
+
+HEAVY_MODULES = ("requests", "qrcode", "PIL.Image", "asyncio", "http.server", "win32print")
+
+def bench_startup(args):
+    import os
+    import statistics
+    import subprocess
+    import sys
+    probe = ("import sys, time; t = time.perf_counter(); {}; "
+             "print(time.perf_counter() - t, *[m for m in %r if m in sys.modules])" % (HEAVY_MODULES,))
+    # lo que main.py cargaba antes de arrancar (menos win32, que acá no existe)
+    eager = "import main, " + ", ".join(m for m in HEAVY_MODULES if m != "win32print")
+    cases = [("import main (lazy)", "import main"), ("import main + eager deps", eager)]
+    for name, stmt in cases:
+        runs, loaded = [], []
+        for _ in range(7):
+            out = subprocess.run([sys.executable, "-c", probe.format(stmt)], capture_output=True, text=True,
+                                 cwd=os.path.dirname(os.path.abspath(__file__)))
+            if out.returncode != 0:
+                print(f"startup {name}: failed\n{out.stderr.strip()[-400:]}")
+                break
+            fields = out.stdout.split()
+            runs.append(float(fields[0]))
+            loaded = fields[1:]
+        if runs:
+            print(f"startup {name:<26} {statistics.median(runs) * 1000:7.1f} ms median of {len(runs)}"
+                  f"   heavy modules loaded: {', '.join(loaded) or 'none'}")
+
+def _started(thread):
+    thread.start()
+    return thread
+
+def pusher_frame(invoice, cuit="20361797400", printer="192.168.0.50"):
+    import json
+    data = json.dumps({"invoice": invoice, "printer": {"name": printer}})
+    return json.dumps({"event": f"NewOrderComanda_{cuit}", "channel": "comandas", "data": data})
+
+def bench_decode(args):
+    import json
+    import tracemalloc
+    from utils import fastjson
+
+    def stdlib(frame):
+        return json.loads(json.loads(frame)["data"])
+
+    def fast(frame):
+        return fastjson.loads(fastjson.loads(frame)["data"])
+
+    cases = [("stdlib json x2", stdlib)]
+    if fastjson.orjson or fastjson.msgspec:
+        cases.append(("fast loads x2", fast))
+    for products in (1, 10, 100, 500):
+        frame = pusher_frame(sample_invoice(products, billing=True))
+        for name, fn in cases:
+            tracemalloc.start()
+            result = fn(frame)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            del result
+            cost = timeit(lambda: fn(frame))
+            print(f"decode {products:>4} items {name:<15} {cost * 1e6:9.1f} µs  {peak / 1024:8.1f} KiB peak")
+
+# Listener real en otro proceso: su CPU y memoria se miden sin contar los servidores falsos
+LISTENER = """
+import json, sys
+from utils import api, metrics
+cfg = json.loads(sys.argv[1])
+api.LARAVEL_API_URL = cfg["api_url"]
+metrics.LOG_FILE = None
+metrics.METRICS_PORT = cfg["metrics_port"]
+from utils import lan_api, websocket_handler as wh
+wh.HEALTH_ENABLED = cfg["health"]
+wh.COALESCE_WINDOW, wh.COALESCE_MAX = cfg["coalesce_window"], cfg["coalesce_max"]
+wh.LAN_API_ENABLED = cfg["lan_port"] is not None
+lan_api.LAN_API_HOST, lan_api.LAN_API_PORT = "127.0.0.1", cfg["lan_port"]
+# las comandas solo pueden nombrar impresoras conocidas: las falsas, como si las hubiera descubierto
+printers = [{"name": d, "identifier": d, "type": "network"} for d in cfg["printers"]]
+wh.connect_to_pusher(printers, cfg["cuit"], url=cfg["url"], device_id="bench")
+"""
+
+def load_orders(args, printers):
+    """Yields Pusher `data` strings: replayed from --replay, else a seeded mix of order shapes."""
+    import json
+    import random
+    rnd = random.Random(args.seed)
+    if args.replay:
+        with open(args.replay, encoding="utf-8") as f:
+            recorded = [json.loads(line) for line in f if line.strip()]
+        # acepta frames de Pusher ({"event", "data"}) o payloads ({"invoice", "printer"})
+        recorded = [json.loads(r["data"]) if isinstance(r.get("data"), str) else r.get("data", r) for r in recorded]
+    for i in range(args.orders):
+        if args.replay:
+            payload = dict(recorded[i % len(recorded)])
+            invoice = dict(payload["invoice"])
+        else:
+            payload = {}
+            invoice = sample_invoice(rnd.choice((1, 3, 5, 10, 30)), billing=rnd.random() < 0.3,
+                                     tables=rnd.choice((0, 1, 1, 2)))
+        # código único (el spool no lo descarta) y rastreable en los bytes impresos
+        invoice["code"] = f"{invoice.get('code') or 'LOAD'}~{i}"
+        payload["invoice"] = invoice
+        payload["printer"] = {"name": printers[i % len(printers)]}
+        yield json.dumps(payload)
+
+TICKET_NUMBER = re.compile(rb"NRO: \S*~(\d+)")
+
+def printed_orders(printer):
+    """[(order number, cut time)] per ticket received, from the code printed on it."""
+    result = []
+    for data, cut_time in printer.tickets():
+        numbers = TICKET_NUMBER.findall(data)  # el último: un resto de otro ticket puede quedar delante
+        if numbers:
+            result.append((int(numbers[-1]), cut_time))
+    return result
+
+def bench_load(args):
+    import json
+    import os
+    import signal
+    import socket
+    import subprocess
+    import sys
+    import tempfile
+    import http.client
+    import urllib.request
+    from utils.fake_laravel import FakeLaravel
+    from utils.fake_printer import FakePrinter
+    from utils.fake_pusher import FakePusherServer
+    from utils.metrics import quantile
+    cuit, channel = "20361797400", "comandas"
+
+    def free_port():
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            return s.getsockname()[1]
+
+    metrics_port = free_port()
+    lan_port = free_port() if args.via != "pusher" else None
+    printers = [FakePrinter(latency=args.latency, fail_every=args.fail_every).start() for _ in range(args.printers)]
+    destinations = [f"{p.host}:{p.port}" for p in printers]
+    frames = list(load_orders(args, destinations))
+
+    with FakePusherServer() as pusher, FakeLaravel() as laravel, tempfile.TemporaryDirectory() as workdir:
+        cfg = {"url": pusher.url(), "api_url": laravel.register_url, "metrics_port": metrics_port, "cuit": cuit,
+               "health": not args.no_health, "coalesce_window": args.coalesce_window,
+               "coalesce_max": args.coalesce_max, "lan_port": lan_port, "printers": destinations}
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+        output = None if args.verbose else subprocess.DEVNULL
+        child = subprocess.Popen([sys.executable, "-c", LISTENER, json.dumps(cfg)], cwd=workdir, env=env,
+                                 stdout=output, stderr=output)
+        try:
+            if not pusher.wait_for_subscribers(channel, timeout=15):
+                print("load: the listener never subscribed (run with --verbose to see why)")
+                return
+            lan = None
+            if lan_port:
+                # una sola conexión keep-alive, como un POS
+                lan = http.client.HTTPConnection("127.0.0.1", lan_port, timeout=30)
+
+            def send(chunk):
+                if args.via != "lan":
+                    for data in chunk:
+                        pusher.broadcast(channel, f"NewOrderComanda_{cuit}", data)
+                if lan:
+                    sent = time.perf_counter()
+                    lan.request("POST", "/print", body="[" + ",".join(chunk) + "]",
+                                headers={"Content-Type": "application/json"})
+                    lan.getresponse().read()
+                    rtts.append(time.perf_counter() - sent)
+
+            sent_at, chunk, rtts, interval = [], [], [], 1.0 / args.rate if args.rate else 0.0
+            start = time.perf_counter()
+            for i, data in enumerate(frames):
+                if interval:  # carga abierta: cada comanda sale a su hora aunque el listener se atrase
+                    delay = start + i * interval - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                sent_at.append(time.perf_counter())
+                chunk.append(data)
+                if len(chunk) >= args.batch or i == len(frames) - 1:
+                    send(chunk)
+                    chunk = []
+            # espera a que salgan todas; un ticket perdido en una conexión cortada no llega nunca
+            deadline, cuts, last_progress = time.perf_counter() + args.timeout, 0, time.perf_counter()
+            while time.perf_counter() < deadline and time.perf_counter() - last_progress < args.settle:
+                if sum(p.cut_count() for p in printers) != cuts:
+                    cuts, last_progress = sum(p.cut_count() for p in printers), time.perf_counter()
+                    if len({n for p in printers for n, _ in printed_orders(p)}) >= len(frames):
+                        break
+                time.sleep(0.01)
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{metrics_port}/metrics.json", timeout=5) as res:
+                    snapshot = json.loads(res.read())
+            except OSError:
+                snapshot = {"summaries": [], "counters": []}
+        finally:
+            child.send_signal(signal.SIGTERM)
+            _, _, usage = os.wait4(child.pid, 0)
+            child.returncode = 0
+
+    for p in printers:
+        p.stop()
+    first_cut, duplicates = {}, 0
+    for p in printers:
+        for number, cut_time in printed_orders(p):
+            if number in first_cut:
+                duplicates += 1  # se cortó la conexión después de que la impresora recibió el ticket
+            else:
+                first_cut[number] = cut_time
+    latencies = sorted(cut_time - sent_at[number] for number, cut_time in first_cut.items())
+    printed = len(latencies)
+    elapsed = max(first_cut.values(), default=start) - start
+    cpu = usage.ru_utime + usage.ru_stime
+
+    mode = f"{args.rate:.0f}/s" if args.rate else "burst"
+    if args.batch > 1:
+        mode += f", batches of {args.batch}"
+    print(f"load {args.orders} orders via {args.via} ({mode}) over {args.printers} printer(s), "
+          f"latency {args.latency * 1000:.0f} ms/write, fail every {args.fail_every or '-'} reads")
+    print(f"  printed      {printed}/{len(frames)} in {elapsed:.2f} s = {printed / max(elapsed, 1e-9):.0f} tickets/s"
+          f"  ({len(frames) - printed} lost, {duplicates} duplicates)")
+    if latencies:
+        print(f"  {args.via}->paper ".ljust(15) + "  ".join(f"p{int(q * 100)} {quantile(latencies, q) * 1000:.1f} ms"
+                                             for q in (0.5, 0.95, 0.99)) + f"  max {latencies[-1] * 1000:.1f} ms")
+    if rtts:
+        rtts.sort()
+        print(f"  LAN request  " + "  ".join(f"p{int(q * 100)} {quantile(rtts, q) * 1000:.1f} ms"
+                                           for q in (0.5, 0.95, 0.99)) + f"  max {rtts[-1] * 1000:.1f} ms")
+    for summary in snapshot["summaries"]:
+        names = {d: f"printer{n}" for n, d in enumerate(destinations)}
+        labels = ",".join(names.get(v, v) for v in summary["labels"].values())
+        name = summary["name"].replace("_seconds", "") + (f"[{labels}]" if labels else "")
+        print(f"  {name:<34} n={summary['count']:<6} p50 {summary['p50'] * 1000:7.2f} ms"
+              f"  p99 {summary['p99'] * 1000:7.2f} ms")
+    print(f"  listener CPU {cpu:.2f} s ({100 * cpu / max(elapsed, 1e-9):.0f}% of one core)"
+          f"  max RSS {usage.ru_maxrss / 1024:.1f} MiB")
+    print(f"  printers     {sum(p.connections for p in printers)} connection(s), {sum(p.reads for p in printers)} reads")
+    return {"printed": printed, "orders": len(frames), "duplicates": duplicates, "latencies": latencies,
+            "rtts": rtts}
+
+def bench_lanapi(args):
+    """The same load through Pusher, through the LAN API, and through both at once (must print once)."""
+    from utils.metrics import quantile
+    rows = []
+    for via in ("pusher", "lan", "both"):
+        result = bench_load(argparse.Namespace(**dict(vars(args), via=via)))
+        if result:
+            rows.append((via, result))
+        print()
+    for via, r in rows:
+        lat = r["latencies"]
+        rtt = f"  request p50 {quantile(r['rtts'], 0.5) * 1000:.1f} ms" if r["rtts"] else ""
+        print(f"lanapi {via:<7} printed {r['printed']}/{r['orders']} ({r['duplicates']} duplicates)  "
+              + "  ".join(f"p{int(q * 100)} {quantile(lat, q) * 1000:6.1f} ms" for q in (0.5, 0.95, 0.99)) + rtt)
+
+def bench_discovery(args):
+    """Passive discovery (ARP/mDNS/SNMP stand-ins) against the /24 sweep, over loopback."""
+    from utils import network, passive
+    from utils.fake_discovery import FakeMdnsResponder, FakeSnmpAgent
+    from utils.fake_printer import FakePrinter
+    printers = [FakePrinter(f"127.0.0.{10 + i}").start() for i in range(max(3, args.printers))]
+    ports = tuple(p.port for p in printers)
+    mdns = FakeMdnsResponder([(f"TM-T20 {p.host}", p.host, p.port, {"ty": "EPSON TM-T20III"})
+                              for p in printers[::3]]).start()
+    agents, snmp_port = [], 0
+    for p in printers[1::3]:  # todos en el mismo puerto, como el 161 de verdad
+        agents.append(FakeSnmpAgent({passive.HR_DEVICE_DESCR: "XP-58IIH POS-58"}, host=p.host, port=snmp_port).start())
+        snmp_port = agents[-1].port
+    # la caché ARP tiene a los que no se anuncian por mDNS
+    neighbors = {p.host: "02:00:00:00:00:%02x" % i for i, p in enumerate(printers) if i % 3}
+    start = time.perf_counter()
+    found = passive.passive_scan(["127.0.0.0/24"], neighbors, ports, ("127.0.0.1", mdns.port), snmp_port)
+    elapsed = time.perf_counter() - start
+    print(f"discovery passive {elapsed * 1000:7.1f} ms  {passive.last_passive_stats['probes']:5d} probes  "
+          f"found {len(found)}/{len(printers)}  enriched {sum(1 for p in found if p['model'])}")
+    start = time.perf_counter()
+    swept = network.scan_network_printers(["127.0.0.0/24"], ports)
+    elapsed = time.perf_counter() - start
+    print(f"discovery sweep   {elapsed * 1000:7.1f} ms  {network.last_scan_stats['probes']:5d} probes  "
+          f"found {len(swept)}/{len(printers)}  (loopback refuses at once; on a LAN silent hosts cost SCAN_TIMEOUT)")
+    for responder in [mdns] + agents + printers:
+        responder.stop()
+
+BENCHMARKS = {
+    "render": bench_render,
+    "qr": bench_qr,
+    "backends": bench_backends,
+    "idle": bench_idle,
+    "decode": bench_decode,
+    "coalesce": bench_coalesce,
+    "startup": bench_startup,
+    "load": bench_load,
+    "renderpool": bench_renderpool,
+    "lanapi": bench_lanapi,
+    "discovery": bench_discovery,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Listener benchmarks")
+    parser.add_argument("name", choices=sorted(BENCHMARKS) + ["all"])
+    load = parser.add_argument_group("load (end-to-end through a local Pusher and fake printers)")
+    load.add_argument("--orders", type=int, default=500)
+    load.add_argument("--rate", type=float, default=0, help="orders per second (0 = all at once)")
+    load.add_argument("--printers", type=int, default=2)
+    load.add_argument("--latency", type=float, default=0.0, help="seconds each fake printer write takes")
+    load.add_argument("--fail-every", type=int, default=0, help="drop the printer connection every N reads")
+    load.add_argument("--replay", help="JSON lines of recorded Pusher frames or payloads")
+    load.add_argument("--coalesce-window", type=float, default=0.0)
+    load.add_argument("--coalesce-max", type=int, default=1)
+    load.add_argument("--no-health", action="store_true")
+    load.add_argument("--timeout", type=float, default=60)
+    load.add_argument("--settle", type=float, default=5, help="stop waiting after this long without a new ticket")
+    load.add_argument("--seed", type=int, default=1)
+    load.add_argument("--verbose", action="store_true", help="show the listener's output")
+    load.add_argument("--via", choices=("pusher", "lan", "both"), default="pusher",
+                      help="send orders through Pusher, the LAN print API or both (they must print once)")
+    load.add_argument("--batch", type=int, default=1, help="orders per LAN API request")
+    args = parser.parse_args()
+    for name, fn in BENCHMARKS.items():
+        if args.name in (name, "all"):
+            fn(args)
+
+if __name__ == "__main__":
+    main()
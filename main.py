@@ -1,19 +1,27 @@
 # main.py
-from utils.config import load_config
-from utils.network import scan_network_printers, detect_local_printers
-from utils.api import register_device_to_laravel
-from utils.websocket_handler import connect_to_pusher
-import winreg
-import winshell
+from utils.config import apply_settings, load_config, load_printer_cache, save_printer_cache
+from utils import discovery
+from utils.discovery import PrinterRevalidator, discover_printers, printable
+from utils.backends import use_printers
+from utils.registration import DeviceRegistrar
+from utils.service import Supervisor
+from utils.websocket_handler import connect_to_pusher, device_status
 import os
 import sys
-from win32com.client import Dispatch
+import time
 
 
 def add_to_startup(app_name="OrderwisePrinter", exe_path=None):
     """
     Agrega el ejecutable al inicio de Windows usando el registro y un acceso directo en shell:startup.
     """
+    if os.name != "nt":
+        return
+    # Solo existen en Windows y tardan en importarse: se cargan acá y no al arrancar
+    import winreg
+    import winshell
+    from win32com.client import Dispatch
+
     if exe_path is None:
         exe_path = os.path.abspath(sys.argv[0])
 
@@ -51,16 +59,40 @@ def add_to_startup(app_name="OrderwisePrinter", exe_path=None):
 
 def main():
     add_to_startup()
+    if "--gateway" in sys.argv[1:]:
+        # Varias empresas en un solo proceso (tenants.json), sin descubrir impresoras
+        from utils.gateway import main as gateway_main
+        return gateway_main()
 
     config = load_config()
-    printers = scan_network_printers() + detect_local_printers()
+    apply_settings(config)
+    printers, last_seen = load_printer_cache()
+    printers = printable(printers)  # caché de versiones que guardaban hosts IPP
+    last_full_scan = time.time()
+    if printers:
+        print(f"[✓] Using {len(printers)} cached printers, revalidating in background.")
+    else:
+        printers = discover_printers()
+        last_seen = {p["identifier"]: last_full_scan for p in printers}
+        save_printer_cache(printers, last_seen)
+        if discovery.PASSIVE_DISCOVERY:
+            last_full_scan = 0  # arrancó con lo pasivo: el barrido completo lo hace el revalidador en segundo plano
 
     print(f"✅ Found {len(printers)} printers (network + local).")
     for i, p in enumerate(printers, 1):
         print(f"{i}. {p['name']} - {p['identifier']} ({p['type']})")
 
-    register_device_to_laravel(config["cuit"], config["device_id"], printers)
-    connect_to_pusher(printers, config["cuit"])
+    use_printers(printers)
+    supervisor = Supervisor()
+    # El registro en Laravel corre en segundo plano: un backend lento no demora la conexión a Pusher
+    registrar = DeviceRegistrar(config["cuit"], config["device_id"], printers, status=device_status)
+    supervisor.add("registration", lambda: registrar.start(supervisor.stop_event))
+    PrinterRevalidator(
+        printers, last_seen, last_full_scan=last_full_scan, on_change=registrar.notify_change,
+    ).start()
+    connect_to_pusher(printers, config["cuit"], supervisor=supervisor, device_id=config["device_id"])
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()  # el .exe congelado arranca así los procesos del render_pool
     main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# los tests importan `utils` como lo hace main.py, desde la raíz del repo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
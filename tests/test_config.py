@@ -0,0 +1,46 @@
+import pytest
+from utils import lan_api, metrics
+from utils import websocket_handler as wh
+from utils.config import apply_settings, env_value
+
+@pytest.mark.parametrize("raw, default, expected", [
+    ("2036", "comandas", "2036"),          # un canal numérico sigue siendo texto
+    ("9470", 9464, 9470),
+    ("0.05", 0.0, 0.05),
+    ("off", True, False),
+    ("Yes", False, True),
+    ('{"Caja": "Barra"}', {}, {"Caja": "Barra"}),
+    ("secreto", None, "secreto"),
+    ("none", 9464, None),
+    ("NULL", "comandas", None),
+])
+def test_env_value_follows_the_default_type(raw, default, expected):
+    assert env_value(raw, default) == expected
+
+@pytest.mark.parametrize("raw, default", [("quizás", True), ("94x", 9464), ("{", {})])
+def test_env_value_rejects_bad_values(raw, default):
+    with pytest.raises(ValueError):
+        env_value(raw, default)
+
+@pytest.fixture
+def settings(monkeypatch):
+    # apply_settings pisa constantes de módulo: monkeypatch las devuelve al terminar
+    for module, attr in ((metrics, "METRICS_PORT"), (wh, "CHANNEL"), (wh, "METRICS_ENABLED"),
+                         (wh, "COALESCE_WINDOW"), (lan_api, "LAN_API_TOKEN")):
+        monkeypatch.setattr(module, attr, getattr(module, attr))
+    return monkeypatch
+
+def test_env_overrides_config_json(settings):
+    settings.setenv("PRINTER_METRICS_PORT", "9470")
+    settings.setenv("PRINTER_CHANNEL", "2036")
+    settings.setenv("PRINTER_METRICS_ENABLED", "false")
+    applied = apply_settings({"metrics_port": 9999, "coalesce_window": 0.02, "cuit": "20361797400"})
+    assert (metrics.METRICS_PORT, wh.CHANNEL, wh.METRICS_ENABLED, wh.COALESCE_WINDOW) == (9470, "2036", False, 0.02)
+    assert "cuit" not in applied
+
+def test_bad_env_value_keeps_the_config_value(settings):
+    settings.setenv("PRINTER_METRICS_PORT", "puerto")
+    settings.setenv("PRINTER_LAN_API_TOKEN", "secreto")
+    apply_settings({"metrics_port": 9999})
+    assert metrics.METRICS_PORT == 9999
+    assert lan_api.LAN_API_TOKEN == "secreto"
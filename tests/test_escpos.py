@@ -0,0 +1,97 @@
+from utils.escpos import (ALIGN, BOLD, CUT, INIT, char_size, encode_lines, qr_code, raster_image,
+                          select_codepage)
+from utils.layout import BIG, CENTER, NORMAL, TITLE
+
+# Bytes esperados escritos a mano desde el manual ESC/POS, no generados con el propio encoder
+
+QR_AB = (
+    b"\x1d(k\x04\x00\x31\x41\x32\x00"   # modelo 2
+    b"\x1d(k\x03\x00\x31\x43\x06"       # módulo de 6 puntos
+    b"\x1d(k\x03\x00\x31\x45\x31"       # corrección M
+    b"\x1d(k\x05\x00\x31\x50\x30AB"     # guardar "AB"
+    b"\x1d(k\x03\x00\x31\x51\x30"       # imprimir
+)
+
+def test_init_and_codepage():
+    assert INIT == b"\x1b@"
+    assert select_codepage("cp858") == b"\x1bt\x13"
+    assert select_codepage("cp850") == b"\x1bt\x02"
+    assert select_codepage("cp437") == b"\x1bt\x00"
+
+def test_bold_size_and_alignment():
+    assert BOLD[True] == b"\x1bE\x01"
+    assert BOLD[False] == b"\x1bE\x00"
+    assert char_size() == b"\x1d!\x00"
+    assert char_size(1, 2) == b"\x1d!\x01"
+    assert char_size(2, 2) == b"\x1d!\x11"
+    assert ALIGN["left"] == b"\x1ba\x00"
+    assert ALIGN["center"] == b"\x1ba\x01"
+    assert ALIGN["right"] == b"\x1ba\x02"
+
+def test_qr_store_and_print():
+    assert qr_code("AB") == QR_AB
+    assert qr_code("AB", module_size=4, error_level="L") == QR_AB.replace(b"\x43\x06", b"\x43\x04").replace(
+        b"\x45\x31", b"\x45\x30")
+
+def test_raster_image():
+    rows = b"\xff\x00\x0f\xf0"
+    assert raster_image(rows, 2) == b"\x1dv0\x00\x02\x00\x02\x00" + rows
+
+def test_cut():
+    assert CUT == b"\x1dVB\x00"
+
+def test_encode_lines_stream():
+    lines = [("TITULO", TITLE), ("Ñandú €5", NORMAL), ("TOTAL", BIG), ("", NORMAL)]
+    assert encode_lines(lines, "cp858", qr="AB") == (
+        b"\x1b@\x1bt\x13"
+        b"\x1ba\x01\x1bE\x01TITULO\n"
+        b"\x1ba\x00\x1bE\x00\xa5and\xa3 \xd55\n"   # Ñ, ú y € en cp858
+        b"\x1bE\x01\x1d!\x01TOTAL\n"
+        b"\x1ba\x00\x1bE\x00\x1d!\x00"            # estilo normal antes del QR
+        b"\x1ba\x01" + QR_AB + b"\n\x1ba\x00"
+        b"\n"                                     # el avance va después del QR
+        b"\x1dVB\x00"
+    )
+
+def test_style_is_not_repeated_between_lines():
+    lines = [("A", CENTER), ("B", CENTER), ("C", NORMAL)]
+    assert encode_lines(lines, "cp858", cut=False) == b"\x1b@\x1bt\x13\x1ba\x01A\nB\n\x1ba\x00C\n"
+
+def test_unencodable_text_is_replaced():
+    assert encode_lines([("日本", NORMAL)], "cp858", cut=False) == b"\x1b@\x1bt\x13??\n"
+
+# Factura B real de punta a punta: la URL de AFIP (~340 caracteres) da un QR versión 14, 73 módulos
+AFIP_INVOICE = {
+    "code": "0003-00001234", "date": "2025-08-01", "hour": "12:30", "total": "3001.00", "billing": True,
+    "company": {"name": "Parrilla Don José", "address": "Av. Siempreviva 742", "document_number": "20361797400"},
+    "client": {"name": "Juan Pérez", "document_number": "20301234567", "document_type": {"Id": 80}},
+    "products": [{"name": "Milanesa", "pivot": {"amount": "2", "price": "1500.50", "taxe": 21}}],
+    "electronic_invoice": {"fields": {
+        "voucher_type": {"Id": 6, "Desc": "Factura B"}, "concept_type": {"Desc": "Productos"},
+        "point_of_sale": 3, "cbte_hasta": 1234, "cae": "74123456789012",
+    }},
+}
+
+def afip_qr(paper):
+    from utils import ticket
+    url = ticket.afip_qr_url(AFIP_INVOICE, AFIP_INVOICE["company"], AFIP_INVOICE["electronic_invoice"]["fields"])
+    return url, ticket.generate_ticket_bytes(AFIP_INVOICE, paper)
+
+def test_afip_qr_fits_58mm_paper(monkeypatch):
+    from utils import ticket
+    monkeypatch.setattr(ticket, "QR_MODE", "native")
+    url, data = afip_qr("58mm")
+    assert 330 <= len(url) <= 362   # versión 14 con corrección M
+    store = len(url) + 3
+    assert (b"\x1ba\x01"
+            b"\x1d(k\x04\x00\x31\x41\x32\x00"
+            b"\x1d(k\x03\x00\x31\x43\x03"          # módulo de 3 puntos: 73 x 3 = 219 <= 288
+            b"\x1d(k\x03\x00\x31\x45\x31"
+            + b"\x1d(k" + bytes([store & 0xFF, store >> 8]) + b"\x31\x50\x30" + url.encode()
+            + b"\x1d(k\x03\x00\x31\x51\x30\n") in data
+
+def test_afip_qr_on_80mm_paper(monkeypatch):
+    from utils import ticket
+    monkeypatch.setattr(ticket, "QR_MODE", "native")
+    _, data = afip_qr("80mm")
+    assert b"\x1d(k\x03\x00\x31\x43\x05" in data    # 73 x 5 = 365 <= 384
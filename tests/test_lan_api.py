@@ -0,0 +1,58 @@
+import http.client
+import pytest
+from utils import websocket_handler as wh
+from utils.lan_api import LanPrintApi
+
+PRINTERS = [{"name": "Caja", "identifier": "192.168.0.50", "type": "network"}]
+
+@pytest.fixture
+def api():
+    orders = []
+    api = LanPrintApi(lambda payload, received_at: orders.append(payload) or 1, host="127.0.0.1", port=0,
+                      token="secreto")
+    api.orders = orders
+    api.start()
+    yield api
+    api.stop()
+
+def post(api, path, body, token="secreto"):
+    conn = http.client.HTTPConnection(api.host, api.port, timeout=5)
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    conn.request("POST", path, body=body, headers=headers)
+    res = conn.getresponse()
+    return res.status, res.read()
+
+def test_refuses_network_bind_without_token():
+    with pytest.raises(ValueError):
+        LanPrintApi(lambda payload, received_at: 1, host="0.0.0.0", port=0, token="")
+
+def test_order_is_submitted(api):
+    status, body = post(api, "/print", b'{"invoice": {"code": "A-1"}, "printer": {"name": "Caja"}}')
+    assert status == 200 and b'"queued"' in body
+    assert api.orders == [{"invoice": {"code": "A-1"}, "printer": {"name": "Caja"}}]
+
+def test_wrong_token_is_rejected(api):
+    assert post(api, "/print", b'{"invoice": {"code": "A-1"}}', token="otro")[0] == 401
+    assert api.orders == []
+
+@pytest.mark.parametrize("name", ["file:/etc/passwd", "null:", "10.9.9.9", "Cocina"])
+def test_payload_cannot_pick_arbitrary_destinations(name):
+    with pytest.raises(ValueError):
+        wh.process_payload({"invoice": {"code": "A-1"}, "printer": {"name": name}}, PRINTERS)
+
+def test_rejections_do_not_wait_for_the_body(api):
+    import socket
+    import time
+    cases = [("/nope", "secreto", 1 << 20, b"404"), ("/print", "otro", 1 << 20, b"401"),
+             ("/print", "secreto", 1 << 30, b"413")]
+    for path, token, length, status in cases:
+        with socket.create_connection((api.host, api.port), timeout=5) as sock:
+            start = time.perf_counter()
+            # declara el largo y no manda el cuerpo: la respuesta tiene que llegar igual
+            sock.sendall(f"POST {path} HTTP/1.1\r\nHost: x\r\nAuthorization: Bearer {token}\r\n"
+                         f"Content-Length: {length}\r\n\r\n".encode())
+            answer = sock.recv(4096)
+            assert answer.split(b" ")[1] == status and b"Connection: close" in answer
+            assert time.perf_counter() - start < 2
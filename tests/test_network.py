@@ -0,0 +1,38 @@
+import asyncio
+import pytest
+from utils import network
+from utils.fake_printer import FakePrinter
+
+@pytest.fixture
+def printers():
+    started = [FakePrinter(f"127.0.0.{host}").start() for host in (10, 12, 13)]
+    yield started
+    for p in started:
+        p.stop()
+
+def test_scan_finds_every_printer_in_order(printers):
+    ports = tuple(p.port for p in printers)
+    found = network.scan_network_printers(["127.0.0.8/29"], ports)
+    assert [(p["identifier"], p["port"]) for p in found] == [(p.host, p.port) for p in printers]
+    assert all(p["type"] == "network" for p in found)
+    # una impresora contesta en un solo puerto de los tres: no aparece repetida
+    assert network.last_scan_stats["hosts"] == 6
+    assert network.last_scan_stats["found"] == 3
+
+def test_scan_stops_once_expected_printers_answer(printers):
+    ports = tuple(p.port for p in printers)
+    network.scan_network_printers(["127.0.0.0/24"], ports, concurrency=4, expected=[printers[0].host])
+    assert network.last_scan_stats["early_exit"]
+    assert network.last_scan_stats["probes"] < 254 * len(ports)
+
+def test_first_port_in_order_wins():
+    # el mismo host con dos servicios: gana el primero de la lista aunque el otro conteste antes
+    raw, lpd = FakePrinter("127.0.0.20").start(), FakePrinter("127.0.0.20").start()
+    try:
+        found, _ = asyncio.run(network.scan_hosts(["127.0.0.20"], (lpd.port, raw.port)))
+        assert found == {"127.0.0.20": lpd.port}
+        found, _ = asyncio.run(network.scan_hosts(["127.0.0.20"], (raw.port, lpd.port)))
+        assert found == {"127.0.0.20": raw.port}
+    finally:
+        raw.stop()
+        lpd.stop()
@@ -0,0 +1,68 @@
+import pytest
+from utils import passive
+from utils.discovery import printable
+from utils.fake_discovery import FakeMdnsResponder, FakeSnmpAgent
+from utils.fake_printer import FakePrinter
+
+LINUX_ARP = """IP address       HW type     Flags       HW address            Mask     Device
+192.168.0.50     0x1         0x2         00:26:ab:12:34:56     *        eth0
+192.168.0.51     0x1         0x0         00:00:00:00:00:00     *        eth0
+"""
+WINDOWS_ARP = """
+Interface: 192.168.0.10 --- 0xb
+  Internet Address      Physical Address      Type
+  192.168.0.52          00-11-62-ab-cd-ef     dynamic
+  192.168.0.255         ff-ff-ff-ff-ff-ff     static
+  224.0.0.251           01-00-5e-00-00-fb     static
+"""
+MACOS_ARP = """? (192.168.0.53) at 0:26:ab:1:2:3 on en0 ifscope [ethernet]
+? (192.168.0.54) at (incomplete) on en0 ifscope [ethernet]
+"""
+
+def test_parse_arp_formats():
+    assert passive.parse_arp(LINUX_ARP) == {"192.168.0.50": "00:26:ab:12:34:56"}
+    assert passive.parse_arp(WINDOWS_ARP) == {"192.168.0.52": "00:11:62:ab:cd:ef"}
+    assert passive.parse_arp(MACOS_ARP) == {"192.168.0.53": "0:26:ab:1:2:3"}
+
+@pytest.fixture
+def lan():
+    """Tres impresoras en loopback: una se anuncia por mDNS, otra contesta SNMP y otra solo está en la caché ARP."""
+    printers = [FakePrinter(f"127.0.0.{host}").start() for host in (30, 31, 32)]
+    ipp = FakePrinter("127.0.0.33").start()
+    mdns = FakeMdnsResponder([
+        ("TM-T20III", printers[0].host, printers[0].port, {"ty": "EPSON TM-T20III"}),
+        ("Oficina", ipp.host, ipp.port, {"ty": "HP LaserJet"}, "_ipp._tcp.local"),
+    ]).start()
+    snmp = FakeSnmpAgent({passive.HR_DEVICE_DESCR: "XP-58IIH POS-58"}, host=printers[1].host).start()
+    neighbors = {printers[1].host: "02:00:00:00:00:31", printers[2].host: "02:00:00:00:00:32"}
+    ports = tuple(p.port for p in printers + [ipp])
+    yield printers, ipp, lambda: passive.passive_scan(["127.0.0.0/24"], neighbors, ports, ("127.0.0.1", mdns.port),
+                                                       snmp.port)
+    for responder in printers + [ipp, mdns, snmp]:
+        responder.stop()
+
+def test_passive_scan_finds_and_enriches_printers(lan):
+    printers, ipp, scan = lan
+    found = {p["identifier"]: p for p in scan()}
+    assert set(found) == {p.host for p in printers} | {ipp.host}
+
+    announced = found[printers[0].host]
+    assert (announced["source"], announced["port"], announced["backend"]) == ("mdns", printers[0].port, "raw")
+    assert (announced["model"], announced["paper"], announced["escpos"]) == ("EPSON TM-T20III", "80mm", True)
+
+    snmp = found[printers[1].host]
+    assert (snmp["source"], snmp["model"], snmp["paper"]) == ("snmp", "XP-58IIH POS-58", "58mm")
+    assert snmp["mac"] == "02:00:00:00:00:31"
+
+    arp = found[printers[2].host]
+    assert (arp["source"], arp["port"], arp["model"]) == ("arp", printers[2].port, None)
+
+    # nada de barrer la subred: solo se sondean los candidatos sin puerto conocido
+    assert passive.last_passive_stats["probed_hosts"] == 2
+
+def test_ipp_only_hosts_are_not_printable(lan):
+    _, ipp, scan = lan
+    found = scan()
+    office = next(p for p in found if p["identifier"] == ipp.host)
+    assert (office["backend"], office["escpos"]) == ("ipp", False)
+    assert ipp.host not in {p["identifier"] for p in printable(found)}
@@ -0,0 +1,77 @@
+import threading
+import time
+import pytest
+from utils import pusher_client
+from utils.fake_pusher import FakePusherServer
+from utils.pusher_client import PusherClient
+
+CHANNELS = ["comandas", "comandas-20361797400"]
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+@pytest.fixture
+def connect(monkeypatch):
+    monkeypatch.setattr(pusher_client, "WATCHDOG_INTERVAL", 0.05)
+    started = []
+
+    def connect(server, **kwargs):
+        events = []
+        client = PusherClient(server.url(), CHANNELS, events.append, reconnect_base=0.05, reconnect_max=0.1,
+                              **kwargs)
+        client.events_seen = events
+        stop = threading.Event()
+        thread = threading.Thread(target=client.run, args=(stop,), daemon=True)
+        thread.start()
+        started.append((client, stop, thread))
+        return client
+
+    yield connect
+    for client, stop, thread in started:
+        stop.set()
+        client.close()
+        thread.join(5)
+
+def test_reconnects_after_network_cut(connect):
+    with FakePusherServer() as server:
+        client = connect(server)
+        assert server.wait_for_subscribers("comandas")
+        server.drop_clients()
+        assert wait_until(lambda: server.stats["connections"] == 2 and client.state == "connected")
+        assert client.stats["disconnects"] == 1
+        assert server.wait_for_subscribers("comandas")
+        server.broadcast("comandas", "NewOrderComanda", {"invoice": {"code": "A-1"}})
+        assert wait_until(lambda: client.events_seen)
+        assert client.events_seen[0]["event"] == "NewOrderComanda"
+
+def test_missing_pong_drops_the_connection(connect):
+    with FakePusherServer(answer_pings=False) as server:
+        client = connect(server, activity_timeout=0.2, pong_timeout=0.3)
+        assert server.wait_for_subscribers("comandas")
+        assert wait_until(lambda: client.stats["pong_timeouts"] >= 1)
+        assert server.stats["pings"] >= 1
+        # el socket medio muerto se cierra y se vuelve a conectar
+        assert wait_until(lambda: server.stats["connections"] >= 2)
+
+def test_answered_pings_keep_the_connection(connect):
+    with FakePusherServer() as server:
+        client = connect(server, activity_timeout=0.2, pong_timeout=0.3)
+        assert server.wait_for_subscribers("comandas")
+        assert wait_until(lambda: server.stats["pings"] >= 2)
+        assert client.stats["pong_timeouts"] == 0
+        assert server.stats["connections"] == 1
+
+def test_every_channel_is_resubscribed_on_reconnect(connect):
+    with FakePusherServer() as server:
+        connect(server)
+        for channel in CHANNELS:
+            assert server.wait_for_subscribers(channel)
+        server.drop_clients()
+        for channel in CHANNELS:
+            assert server.wait_for_subscribers(channel)
+        assert server.stats["subscribes"] == 2 * len(CHANNELS)
@@ -0,0 +1,28 @@
+import threading
+import time
+from utils.service import Supervisor
+
+IDLE_WINDOW = 1.0
+MAX_CPU_SHARE = 0.05   # 5% de un núcleo; el busy-wait viejo se comía uno entero
+
+def test_idle_supervisor_uses_almost_no_cpu():
+    supervisor = Supervisor(interval=0.1)
+
+    def start_sleeper():
+        thread = threading.Thread(target=supervisor.stop_event.wait, daemon=True)
+        thread.start()
+        return thread
+
+    supervisor.add("sleeper", start_sleeper)
+    # run() en un hilo aparte: no pisa los handlers de señales de pytest
+    runner = threading.Thread(target=supervisor.run, daemon=True)
+    runner.start()
+    time.sleep(0.2)  # arranque fuera de la ventana medida
+    cpu, wall = time.process_time(), time.perf_counter()
+    time.sleep(IDLE_WINDOW)
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    supervisor.stop()
+    runner.join(2)
+    assert not runner.is_alive()
+    assert supervisor.restarts == {"sleeper": 0}
+    assert cpu / wall < MAX_CPU_SHARE, f"{cpu * 1000:.1f} ms CPU over {wall:.2f} s"
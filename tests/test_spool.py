@@ -0,0 +1,80 @@
+import threading
+import pytest
+from utils import spool as spool_module
+from utils.spool import PrintSpool, backoff, job_key, start_retry_loop
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "spool.db")
+
+def test_job_key():
+    assert job_key({"code": "A-1"}, "caja") == "A-1@caja"
+    assert job_key({"code": "A-1", "station": "cocina"}, "cocina") == "A-1#cocina@cocina"
+    assert job_key({"code": "A-1", "tenant": "2036"}, "caja") == "2036/A-1@caja"
+    assert job_key({"code": ""}, "caja") is None
+
+def test_same_order_on_same_printer_is_spooled_once(path):
+    spool = PrintSpool(path).start()
+    first = spool.add({"code": "A-1"}, "caja")
+    assert first is not None
+    assert spool.add({"code": "A-1"}, "caja") is None
+    assert spool.add({"code": "A-1"}, "barra") not in (None, first)
+    # sin código no hay clave: no se puede deduplicar, se imprime siempre
+    assert spool.add({}, "caja") is not None
+    assert spool.add({}, "caja") is not None
+
+def test_async_add_reports_after_commit(path):
+    spool = PrintSpool(path).start()
+    results, done = [], threading.Event()
+
+    def on_added(job_id, error):
+        results.append((job_id, error))
+        if len(results) == 3:
+            done.set()
+
+    for code in ("A-1", "A-2", "A-1"):
+        assert spool.add({"code": code}, "caja", on_added=on_added) is None
+    assert done.wait(5)
+    assert [job_id is not None for job_id, _ in results] == [True, True, False]
+    assert all(error is None for _, error in results)
+
+def test_backoff_doubles_up_to_the_cap():
+    assert [backoff(n) for n in (1, 2, 3)] == [2.0, 4.0, 8.0]
+    assert backoff(20) == spool_module.RETRY_MAX
+
+def test_failed_job_waits_for_its_backoff(path, monkeypatch):
+    spool = PrintSpool(path).start()
+    job_id = spool.add({"code": "A-1"}, "caja")
+    spool.mark_failed(job_id, "printer offline")
+    assert spool.due() == []   # 2 s de espera todavía
+    monkeypatch.setattr(spool_module, "RETRY_BASE", 0.0)
+    other = spool.add({"code": "A-2"}, "caja")
+    spool.mark_failed(other, "printer offline")
+    assert spool.due() == [(other, "caja", {"code": "A-2"})]
+    assert spool.due() == []   # ya reclamado: vuelve a "queued"
+
+def test_retry_loop_resubmits_due_jobs(path, monkeypatch):
+    monkeypatch.setattr(spool_module, "RETRY_BASE", 0.0)
+    spool = PrintSpool(path).start()
+    job_id = spool.add({"code": "A-1"}, "caja")
+    spool.mark_failed(job_id, "printer offline")
+    submitted, stop = [], threading.Event()
+    got = threading.Event()
+    start_retry_loop(spool, lambda *job: submitted.append(job) or got.set(), interval=0.02, stop_event=stop)
+    assert got.wait(5)
+    stop.set()
+    assert submitted == [({"code": "A-1"}, "caja", job_id)]
+
+def test_recover_replays_unfinished_jobs(path):
+    spool = PrintSpool(path).start()
+    printed = spool.add({"code": "A-1"}, "caja")
+    pending = spool.add({"code": "A-2"}, "caja")
+    failed = spool.add({"code": "A-3"}, "barra")
+    spool.mark_done(printed)
+    spool.mark_failed(failed, "printer offline")
+    spool.due()   # las marcas son asíncronas: esto espera a que estén escritas
+
+    # otro proceso (el listener reiniciado) abre el mismo archivo
+    again = PrintSpool(path).start()
+    assert again.recover() == [(pending, "caja", {"code": "A-2"}), (failed, "barra", {"code": "A-3"})]
+    assert again.add({"code": "A-1"}, "caja") is None   # lo ya impreso sigue deduplicado
@@ -0,0 +1,25 @@
+from utils.ticket import generate_ticket_text
+
+LONG_NAME = "Milanesa napolitana con papas fritas y ensalada"
+
+def invoice(name, **extra):
+    return dict({"code": "A-1", "total": 3000,
+                 "products": [{"name": name, "pivot": {"amount": "2", "price": "1500"}}]}, **extra)
+
+def test_long_product_name_wraps_on_58mm():
+    # el layout compilado parte los nombres largos por palabra; el texto viejo los dejaba cortar por la impresora
+    lines = generate_ticket_text(invoice(LONG_NAME))[0].splitlines()
+    assert lines[lines.index("2.00 x 1500.00        3000.00") + 1:][:2] == [
+        "MILANESA NAPOLITANA CON PAPAS",
+        "FRITAS Y ENSALADA",
+    ]
+    assert all(len(line) <= 32 for line in lines)
+
+def test_long_product_name_wraps_on_kitchen_ticket():
+    lines = generate_ticket_text(invoice(LONG_NAME, station="cocina"))[0].splitlines()
+    assert "2 x MILANESA NAPOLITANA CON" in lines
+    assert lines[lines.index("2 x MILANESA NAPOLITANA CON") + 1] == "PAPAS FRITAS Y ENSALADA"
+
+def test_short_product_name_stays_on_one_line():
+    lines = generate_ticket_text(invoice("Flan"))[0].splitlines()
+    assert lines[lines.index("2.00 x 1500.00        3000.00") + 1] == "FLAN"
@@ -1,15 +1,138 @@
-import requests
+import hashlib
+import json
+import threading
+from datetime import datetime, timezone
 
+# Se puede cambiar en config.json ("laravel_api_url") o con PRINTER_LARAVEL_API_URL
 LARAVEL_API_URL = "http://localhost:8000/api/public/register-device"
 # LARAVEL_API_URL = "https://api-orderwise.qbitsinc.com/api/public/register-device"
 
+def api_url(path):
+    """Other endpoints live next to register-device, so they follow LARAVEL_API_URL overrides."""
+    return LARAVEL_API_URL.rsplit("/", 1)[0] + "/" + path
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+REQUEST_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+POOL_SIZE = 4
+GET_RETRIES = 2  # reintentos de urllib3 para GET ante 502/503/504 o errores de conexión
+
+_session = None
+_session_lock = threading.Lock()
+
+def session():
+    """
+    Shared requests.Session: keeps TCP/TLS connections to Laravel alive between calls.
+    requests (~90 ms to import) is only loaded with the first request, not at startup.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+            retry = Retry(total=GET_RETRIES, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                          allowed_methods=frozenset(["GET"]), raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+            _session = requests.Session()
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+def printers_hash(printers):
+    """Stable digest of the printer list, so an unchanged list is never re-sent."""
+    ordered = sorted(printers, key=lambda p: str(p.get("identifier")))
+    canonical = json.dumps(ordered, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
 def register_device_to_laravel(cuit, device_id, printers):
-    payload = {"cuit": cuit, "device_id": device_id, "printers": printers}
+    """Returns True if Laravel accepted the registration."""
+    payload = {"cuit": cuit, "device_id": device_id, "printers": printers, "printers_hash": printers_hash(printers)}
     try:
-        res = requests.post(LARAVEL_API_URL, json=payload)
+        res = session().post(LARAVEL_API_URL, json=payload, timeout=REQUEST_TIMEOUT)
         if res.status_code == 200:
             print("[✓] Device and printers registered successfully.")
-        else:
-            print(f"[X] Laravel error: {res.status_code} - {res.text}")
+            return True
+        print(f"[X] Laravel error: {res.status_code} - {res.text[:200]}")
+    except Exception as e:
+        print(f"[X] Failed to connect to Laravel: {e}")
+    return False
+
+def register_printer_changes(cuit, device_id, printers, added, removed):
+    """Pushes only when the printer set changed; `added`/`removed` carry the delta."""
+    if not added and not removed:
+        return True
+    payload = {"cuit": cuit, "device_id": device_id, "printers": printers, "added": added, "removed": removed,
+               "printers_hash": printers_hash(printers)}
+    try:
+        res = session().post(LARAVEL_API_URL, json=payload, timeout=REQUEST_TIMEOUT)
+        if res.status_code == 200:
+            print(f"[✓] Printer changes registered (+{len(added)} -{len(removed)}).")
+            return True
+        print(f"[X] Laravel error: {res.status_code} - {res.text[:200]}")
     except Exception as e:
         print(f"[X] Failed to connect to Laravel: {e}")
+    return False
+
+# Latido periódico: el backend sabe que el equipo sigue vivo y con qué lista de impresoras
+HEARTBEAT_PATH = "device-heartbeat"
+
+def send_heartbeat(cuit, device_id, printers_digest, status=None):
+    """
+    Returns the decoded answer ({} if empty), or None when it failed. A 404 means the
+    backend has no heartbeat endpoint and is returned as {"unsupported": True}.
+    """
+    payload = {"cuit": cuit, "device_id": device_id, "printers_hash": printers_digest, "status": status or {}}
+    try:
+        res = session().post(api_url(HEARTBEAT_PATH), json=payload, timeout=REQUEST_TIMEOUT)
+        if res.status_code == 404:
+            return {"unsupported": True}
+        if res.status_code == 200:
+            try:
+                return res.json() or {}
+            except ValueError:
+                return {}
+        print(f"[X] Laravel error on heartbeat: {res.status_code} - {res.text[:200]}")
+    except Exception as e:
+        print(f"[X] Heartbeat failed: {e}")
+    return None
+
+# Comandas emitidas mientras el listener estuvo desconectado (mismo formato que el evento de Pusher)
+MISSED_ORDERS_PATH = "pending-comandas"
+
+def fetch_missed_orders(cuit, device_id, since):
+    params = {"cuit": cuit, "device_id": device_id, "since": datetime.fromtimestamp(since, timezone.utc).isoformat()}
+    try:
+        res = session().get(api_url(MISSED_ORDERS_PATH), params=params, timeout=REQUEST_TIMEOUT)
+        if res.status_code == 200:
+            return res.json()
+        print(f"[X] Laravel error fetching missed orders: {res.status_code} - {res.text[:200]}")
+    except Exception as e:
+        print(f"[X] Failed to fetch missed orders: {e}")
+    return []
+
+# Autorización de canales privados de Pusher (por CUIT)
+CHANNEL_AUTH_PATH = "broadcasting/auth"
+
+def authorize_channel(cuit, device_id, socket_id, channel):
+    """Asks Laravel to sign a private channel subscription. Returns the "auth" string."""
+    payload = {"cuit": cuit, "device_id": device_id, "socket_id": socket_id, "channel_name": channel}
+    res = session().post(api_url(CHANNEL_AUTH_PATH), json=payload, timeout=REQUEST_TIMEOUT)
+    res.raise_for_status()
+    return res.json()["auth"]
+
+# Tabla de ruteo de productos a estaciones (barra, parrilla, cocina...)
+ROUTES_PATH = "printer-routes"
+
+def fetch_routes(cuit, device_id):
+    """Returns the routing table configured in Laravel, or None if it could not be fetched."""
+    try:
+        res = session().get(api_url(ROUTES_PATH), params={"cuit": cuit, "device_id": device_id},
+                            timeout=REQUEST_TIMEOUT)
+        if res.status_code == 200:
+            return res.json()
+        if res.status_code != 404:
+            print(f"[X] Laravel error fetching printer routes: {res.status_code} - {res.text[:200]}")
+    except Exception as e:
+        print(f"[X] Failed to fetch printer routes: {e}")
+    return None
@@ -0,0 +1,274 @@
+# backends.py — destinos de impresión intercambiables
+import os
+import platform
+import socket
+import subprocess
+import threading
+from utils.connection_pool import pool
+
+LPD_TIMEOUT = 10.0
+LP_TIMEOUT = 30.0
+STATUS_TIMEOUT = 2.0
+
+# Estados de salud: "ok", "degraded" (imprime, p.ej. papel por acabarse) y "down"
+OK, DEGRADED, DOWN = "ok", "degraded", "down"
+
+def parse_escpos_status(status):
+    """Interprets DLE EOT 1/2/4 answers ({n: byte}) as (state, detail)."""
+    if not status:
+        return OK, "reachable (no status support)"
+    problems = []
+    if status.get(1, 0) & 0x08:
+        problems.append("offline")
+    s2 = status.get(2, 0)
+    if s2 & 0x04:
+        problems.append("cover open")
+    if s2 & 0x20 or status.get(4, 0) & 0x60:
+        problems.append("paper out")
+    if s2 & 0x40:
+        problems.append("error")
+    if problems:
+        return DOWN, ", ".join(problems)
+    if status.get(4, 0) & 0x0C:
+        return DEGRADED, "paper near end"
+    return OK, "online"
+
+def tcp_reachable(host, port, timeout=STATUS_TIMEOUT):
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return OK, "reachable"
+    except OSError as e:
+        return DOWN, f"unreachable: {e}"
+
+class RawTcpBackend:
+    """JetDirect / port 9100 through the persistent connection pool."""
+    kind = "raw"
+
+    def __init__(self, host, port=9100):
+        self.host = host
+        self.port = port
+
+    def send(self, data):
+        pool.send(self.host, data, self.port)
+
+    @property
+    def escpos(self):
+        printer = find_printer(self.host)
+        return bool(printer and printer.get("escpos") and printer.get("port", 9100) == self.port)
+
+    def status(self):
+        """
+        DLE EOT status over the socket we already hold, or on a throwaway one for printers
+        known to speak ESC/POS. Anything else on 9100 (an office laser found by the sweep)
+        only gets a connect/close check: no control bytes, no connection kept open.
+        """
+        try:
+            status = pool.query_status(self.host, self.port, connect=self.escpos)
+        except OSError as e:
+            return DOWN, f"unreachable: {e}"
+        if status is None:
+            return tcp_reachable(self.host, self.port)
+        return parse_escpos_status(status)
+
+class WindowsSpoolerBackend:
+    """RAW job through the Windows spooler (win32print is only imported when used)."""
+    kind = "windows"
+
+    def __init__(self, name):
+        self.name = name
+
+    def send(self, data):
+        import win32print
+        hPrinter = win32print.OpenPrinter(self.name)
+        try:
+            win32print.StartDocPrinter(hPrinter, 1, ("Factura", None, "RAW"))
+            try:
+                win32print.StartPagePrinter(hPrinter)
+                win32print.WritePrinter(hPrinter, data)
+                win32print.EndPagePrinter(hPrinter)
+            finally:
+                win32print.EndDocPrinter(hPrinter)
+        finally:
+            win32print.ClosePrinter(hPrinter)
+
+    # PRINTER_STATUS_*: ERROR, PAPER_JAM, PAPER_OUT, OFFLINE, NOT_AVAILABLE, DOOR_OPEN
+    DOWN_FLAGS = {0x2: "error", 0x8: "paper jam", 0x10: "paper out", 0x80: "offline",
+                  0x1000: "not available", 0x400000: "door open"}
+
+    def status(self):
+        import win32print
+        hPrinter = win32print.OpenPrinter(self.name)
+        try:
+            info = win32print.GetPrinter(hPrinter, 2)
+        finally:
+            win32print.ClosePrinter(hPrinter)
+        problems = [text for flag, text in self.DOWN_FLAGS.items() if info["Status"] & flag]
+        if info["Attributes"] & 0x400:  # PRINTER_ATTRIBUTE_WORK_OFFLINE
+            problems.append("work offline")
+        if problems:
+            return DOWN, ", ".join(problems)
+        return (DEGRADED, "paper low") if info["Status"] & 0x20000 else (OK, "ready")
+
+class CupsBackend:
+    """Linux/macOS queues through `lp -o raw`."""
+    kind = "cups"
+
+    def __init__(self, name):
+        self.name = name
+
+    def send(self, data):
+        res = subprocess.run(["lp", "-d", self.name, "-o", "raw", "-t", "Factura"],
+                             input=data, capture_output=True, timeout=LP_TIMEOUT)
+        if res.returncode != 0:
+            raise RuntimeError(f"lp failed: {res.stderr.decode(errors='replace').strip()}")
+
+    def status(self):
+        res = subprocess.run(["lpstat", "-p", self.name], capture_output=True, text=True, timeout=STATUS_TIMEOUT)
+        line = (res.stdout or res.stderr).strip().splitlines()[0] if (res.stdout or res.stderr).strip() else ""
+        if res.returncode != 0 or "disabled" in line:
+            return DOWN, line or "unknown queue"
+        return OK, line
+
+class LpdBackend:
+    """Minimal RFC 1179 client (port 515): one control file and one raw data file per job."""
+    kind = "lpd"
+    _job = 0
+    _lock = threading.Lock()
+
+    def __init__(self, host, port=515, queue="raw"):
+        self.host = host
+        self.port = port
+        self.queue = queue
+
+    @staticmethod
+    def _ack(sock):
+        if sock.recv(1) != b"\x00":
+            raise RuntimeError("LPD server refused the job")
+
+    def send(self, data):
+        with LpdBackend._lock:
+            LpdBackend._job = (LpdBackend._job + 1) % 1000
+            job = LpdBackend._job
+        hostname = platform.node()[:31] or "listener"
+        control = f"H{hostname}\nPlistener\nldfA{job:03d}{hostname}\nUdfA{job:03d}{hostname}\n".encode()
+        with socket.create_connection((self.host, self.port), timeout=LPD_TIMEOUT) as sock:
+            sock.sendall(b"\x02" + self.queue.encode() + b"\n")
+            self._ack(sock)
+            sock.sendall(f"\x02{len(control)} cfA{job:03d}{hostname}\n".encode())
+            self._ack(sock)
+            sock.sendall(control + b"\x00")
+            self._ack(sock)
+            sock.sendall(f"\x03{len(data)} dfA{job:03d}{hostname}\n".encode())
+            self._ack(sock)
+            sock.sendall(data + b"\x00")
+            self._ack(sock)
+
+    def status(self):
+        return tcp_reachable(self.host, self.port)
+
+class FileBackend:
+    """Appends every ticket to a file; useful to inspect output or as a benchmark sink."""
+    kind = "file"
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, data):
+        with self._lock, open(self.path, "ab") as f:
+            f.write(data)
+
+    def status(self):
+        return OK, self.path
+
+class NullBackend:
+    kind = "null"
+
+    def __init__(self, *args):
+        self.bytes_sent = 0
+
+    def send(self, data):
+        self.bytes_sent += len(data)
+
+    def status(self):
+        return OK, "null"
+
+# --- Selección de backend ---
+
+_known_printers = []
+_backends = {}
+_lock = threading.Lock()
+
+def use_printers(printers):
+    """Keeps a reference to the discovered printer list (updated in place by discovery)."""
+    global _known_printers
+    _known_printers = printers
+
+def local_backend_kind():
+    return "windows" if os.name == "nt" else "cups"
+
+def is_ip(destination):
+    return destination.replace(".", "").isdigit()
+
+def find_printer(destination):
+    for p in list(_known_printers):
+        if destination in (p["identifier"], p["name"]):
+            return p
+    return None
+
+def printer_kind(printer):
+    """Backend kind for a discovery record (or a tenant's printer given as text)."""
+    if printer.get("backend"):
+        return printer["backend"]
+    if printer.get("type") == "network":
+        return "lpd" if printer.get("port", 9100) == 515 else "raw"
+    if printer.get("type"):
+        return local_backend_kind()
+    return _describe_text(printer["identifier"])[0]
+
+def describe(destination):
+    """Returns (kind, target, port) for a destination: discovery record, 'file:', 'null:', IP[:port] or queue name."""
+    if destination.startswith("file:"):
+        return "file", destination[len("file:"):], None
+    if destination.startswith("null:"):
+        return "null", destination, None
+    printer = find_printer(destination)
+    if printer:
+        if printer.get("backend"):
+            return printer["backend"], printer["identifier"], printer.get("port")
+        if printer["type"] == "network":
+            return printer_kind(printer), printer["identifier"], printer.get("port", 9100)
+        return local_backend_kind(), printer["identifier"], None
+    return _describe_text(destination)
+
+def _describe_text(destination):
+    if is_ip(destination):
+        return "raw", destination, 9100
+    host, _, port = destination.rpartition(":")
+    if host and is_ip(host) and port.isdigit():
+        return ("lpd" if port == "515" else "raw"), host, int(port)
+    return local_backend_kind(), destination, None
+
+BACKENDS = {
+    "raw": lambda target, port: RawTcpBackend(target, port or 9100),
+    "lpd": lambda target, port: LpdBackend(target, port or 515),
+    "windows": lambda target, port: WindowsSpoolerBackend(target),
+    "cups": lambda target, port: CupsBackend(target),
+    "file": lambda target, port: FileBackend(target),
+    "null": lambda target, port: NullBackend(),
+}
+
+def supported(printer):
+    """False for records no backend can print to yet (IPP-only hosts found on port 631)."""
+    return printer_kind(printer) in BACKENDS
+
+def backend_for(destination):
+    key = describe(destination)
+    with _lock:
+        backend = _backends.get(key)
+        if backend is None:
+            kind, target, port = key
+            if kind not in BACKENDS:
+                raise ValueError(f"Unsupported printer backend '{kind}' for {destination}")
+            backend = _backends[key] = BACKENDS[kind](target, port)
+        return backend
@@ -1,14 +1,112 @@
 import os
 import json
 import platform
+import importlib
 
 CONFIG_FILE = "config.json"
 CUIT_FILE = "cuit.txt"  # Nuevo: archivo que contiene el CUIT
+PRINTERS_FILE = "printers.json"  # Caché de impresoras descubiertas
+
+ENV_PREFIX = "PRINTER_"  # p.ej. PRINTER_CUIT, PRINTER_PUSHER_APP_KEY, PRINTER_PAPER=80mm
+
+# Ajustes opcionales de config.json (o PRINTER_<CLAVE> en el entorno) -> constante del módulo que la usa
+SETTINGS = {
+    "laravel_api_url": ("utils.api", "LARAVEL_API_URL"),
+    "pusher_app_key": ("utils.websocket_handler", "PUSHER_APP_KEY"),
+    "pusher_app_secret": ("utils.websocket_handler", "PUSHER_APP_SECRET"),
+    "pusher_cluster": ("utils.websocket_handler", "PUSHER_CLUSTER"),
+    "channel": ("utils.websocket_handler", "CHANNEL"),
+    "tenant_channel": ("utils.websocket_handler", "TENANT_CHANNEL"),
+    "event_name": ("utils.websocket_handler", "EVENT_NAME"),
+    "fallbacks": ("utils.websocket_handler", "FALLBACKS"),
+    "fallback_printer": ("utils.websocket_handler", "FALLBACK_PRINTER"),
+    "coalesce_window": ("utils.websocket_handler", "COALESCE_WINDOW"),
+    "coalesce_max": ("utils.websocket_handler", "COALESCE_MAX"),
+    "health_enabled": ("utils.websocket_handler", "HEALTH_ENABLED"),
+    "metrics_enabled": ("utils.websocket_handler", "METRICS_ENABLED"),
+    "metrics_host": ("utils.metrics", "METRICS_HOST"),
+    "metrics_port": ("utils.metrics", "METRICS_PORT"),
+    "log_file": ("utils.metrics", "LOG_FILE"),
+    "paper": ("utils.printer", "PAPER"),
+    "codepage": ("utils.printer", "CODEPAGE"),
+    "local_raw": ("utils.printer", "LOCAL_RAW"),
+    "qr_mode": ("utils.ticket", "QR_MODE"),
+    "render_workers": ("utils.render_pool", "RENDER_WORKERS"),
+    "spool_file": ("utils.spool", "SPOOL_FILE"),
+    "history_enabled": ("utils.websocket_handler", "HISTORY_ENABLED"),
+    "history_file": ("utils.history", "HISTORY_FILE"),
+    "history_max_bytes": ("utils.history", "HISTORY_MAX_BYTES"),
+    "tenants_file": ("utils.gateway", "TENANTS_FILE"),
+    "lan_api_enabled": ("utils.websocket_handler", "LAN_API_ENABLED"),
+    "lan_api_host": ("utils.lan_api", "LAN_API_HOST"),
+    "lan_api_port": ("utils.lan_api", "LAN_API_PORT"),
+    "lan_api_token": ("utils.lan_api", "LAN_API_TOKEN"),
+    "passive_discovery": ("utils.discovery", "PASSIVE_DISCOVERY"),
+    "snmp_community": ("utils.passive", "SNMP_COMMUNITY"),
+}
+
+TRUE_WORDS = ("1", "true", "yes", "on")
+FALSE_WORDS = ("0", "false", "no", "off")
+
+def env_value(raw, default=None):
+    """
+    Converts an env value to the type of the setting's default, so PRINTER_CHANNEL=2036
+    stays a string and PRINTER_METRICS_PORT=9470 becomes an int. "none"/"null" clear the
+    setting; dicts and lists (fallbacks...) are JSON. Raises ValueError on a bad value.
+    """
+    if raw.strip().lower() in ("none", "null"):
+        return None
+    if isinstance(default, bool):
+        word = raw.strip().lower()
+        if word not in TRUE_WORDS + FALSE_WORDS:
+            raise ValueError(f"expected true/false, got {raw!r}")
+        return word in TRUE_WORDS
+    if isinstance(default, int):
+        return int(raw)
+    if isinstance(default, float):
+        return float(raw)
+    if isinstance(default, (dict, list, tuple)):
+        return json.loads(raw)
+    return raw  # texto tal cual, también cuando el default es None
+
+def env_overrides(settings):
+    overrides = {}
+    for key, (module, attr) in settings.items():
+        raw = os.environ.get(ENV_PREFIX + key.upper())
+        if raw is None:
+            continue
+        try:
+            overrides[key] = env_value(raw, getattr(importlib.import_module(module), attr, None))
+        except ValueError as e:
+            print(f"[X] Ignoring {ENV_PREFIX + key.upper()}: {e}")
+    return overrides
+
+def apply_settings(config):
+    """
+    Copies every known setting in `config` (plus env overrides) onto the module
+    constant that uses it. Must run before connect_to_pusher. Returns what changed.
+    """
+    values = {k: v for k, v in config.items() if k in SETTINGS}
+    values.update(env_overrides(SETTINGS))
+    for key, value in values.items():
+        module, attr = SETTINGS[key]
+        setattr(importlib.import_module(module), attr, value)
+    return values
 
 def load_config():
+    """config.json (cuit, device_id and optional SETTINGS keys); PRINTER_CUIT / PRINTER_DEVICE_ID win over it."""
+    config = None
     if os.path.exists(CONFIG_FILE):
         with open(CONFIG_FILE, "r") as f:
-            return json.load(f)
+            config = json.load(f)
+    # texto tal cual: un CUIT no es un número
+    overrides = {k: os.environ[ENV_PREFIX + k.upper()] for k in ("cuit", "device_id") if ENV_PREFIX + k.upper() in os.environ}
+    if config is not None:
+        config.update(overrides)
+        return config
+    if "cuit" in overrides:
+        device_id = os.uname().nodename if hasattr(os, 'uname') else platform.node()
+        return {"device_id": device_id, **overrides}
 
     # 🔐 Intentamos cargar el CUIT desde el archivo plano
     cuit = None
@@ -31,3 +129,40 @@ def load_config():
 
     print(f"[✓] Configuration saved in {CONFIG_FILE}")
     return config
+
+def load_printer_cache():
+    """Returns (printers, last_seen) from the discovery cache, or ([], {}) if there is none."""
+    if not os.path.exists(PRINTERS_FILE):
+        return [], {}
+    try:
+        with open(PRINTERS_FILE, "r") as f:
+            cache = json.load(f)
+        return cache.get("printers", []), cache.get("last_seen", {})
+    except (OSError, ValueError) as e:
+        print(f"[X] Ignoring unreadable {PRINTERS_FILE}: {e}")
+        return [], {}
+
+def save_printer_cache(printers, last_seen):
+    tmp = PRINTERS_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"printers": printers, "last_seen": last_seen}, f)
+    os.replace(tmp, PRINTERS_FILE)
+
+ROUTES_FILE = "routes.json"  # Tabla de ruteo cocina/barra (última copia recibida de Laravel)
+
+def load_routes():
+    """Returns the cached routing table, or {} when kitchen routing is not configured."""
+    if not os.path.exists(ROUTES_FILE):
+        return {}
+    try:
+        with open(ROUTES_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[X] Ignoring unreadable {ROUTES_FILE}: {e}")
+        return {}
+
+def save_routes(routes):
+    tmp = ROUTES_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(routes, f)
+    os.replace(tmp, ROUTES_FILE)
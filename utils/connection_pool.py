@@ -0,0 +1,177 @@
+# connection_pool.py
+import select
+import socket
+import threading
+import time
+
+CONNECT_TIMEOUT = 3.0
+SEND_TIMEOUT = 10.0
+IDLE_TIMEOUT = 300       # cerrar sockets sin uso después de 5 minutos
+PROBE_AFTER = 30         # sockets inactivos más de esto se verifican con DLE EOT antes de reusar
+PROBE_TIMEOUT = 0.5
+
+DLE_EOT_PRINTER_STATUS = b"\x10\x04\x01"
+
+def enable_keepalive(sock, idle=30, interval=10, count=3):
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if hasattr(socket, "SIO_KEEPALIVE_VALS"):
+        sock.ioctl(socket.SIO_KEEPALIVE_VALS, (1, idle * 1000, interval * 1000))
+    elif hasattr(socket, "TCP_KEEPIDLE"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, count)
+
+def drain(sock):
+    """Reads whatever the printer sent back (status bytes). Returns False if the peer closed the connection."""
+    while select.select([sock], [], [], 0)[0]:
+        if not sock.recv(1024):
+            return False
+    return True
+
+class PrinterConnectionPool:
+    """
+    Keeps one persistent socket per (host, port) so consecutive tickets skip the
+    connect/teardown. Sends to the same printer are serialized; different printers
+    don't block each other.
+    """
+
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, send_timeout=SEND_TIMEOUT,
+                 idle_timeout=IDLE_TIMEOUT, probe_after=PROBE_AFTER, status_probe=True):
+        self.connect_timeout = connect_timeout
+        self.send_timeout = send_timeout
+        self.idle_timeout = idle_timeout
+        self.probe_after = probe_after
+        self.status_probe = status_probe
+        self._conns = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.stats = {"sends": 0, "connects": 0, "reuses": 0, "reconnects": 0, "errors": 0}
+
+    def _dest_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _connect(self, key):
+        sock = socket.create_connection(key, timeout=self.connect_timeout)
+        enable_keepalive(sock)
+        sock.settimeout(self.send_timeout)
+        self.stats["connects"] += 1
+        return sock
+
+    def _is_healthy(self, sock, last_used):
+        idle = time.monotonic() - last_used
+        if idle > self.idle_timeout:
+            return False
+        try:
+            if not drain(sock):
+                return False
+            if self.status_probe and idle > self.probe_after:
+                sock.sendall(DLE_EOT_PRINTER_STATUS)
+                if not select.select([sock], [], [], PROBE_TIMEOUT)[0] or not sock.recv(1):
+                    return False
+        except OSError:
+            return False
+        return True
+
+    def _close(self, key):
+        entry = self._conns.pop(key, None)
+        if entry:
+            try:
+                entry[0].close()
+            except OSError:
+                pass
+
+    def send(self, host, data, port=9100):
+        key = (host, port)
+        with self._dest_lock(key):
+            self.stats["sends"] += 1
+            entry = self._conns.get(key)
+            if entry and self._is_healthy(*entry):
+                sock, reused = entry[0], True
+                self.stats["reuses"] += 1
+            else:
+                if entry:
+                    self._close(key)
+                    self.stats["reconnects"] += 1
+                try:
+                    sock, reused = self._connect(key), False
+                except OSError:
+                    self.stats["errors"] += 1
+                    raise
+
+            try:
+                sock.sendall(data)
+            except OSError:
+                self._close(key)
+                sock.close()
+                if not reused:
+                    self.stats["errors"] += 1
+                    raise
+                # La conexión reutilizada estaba muerta: reintentamos una vez con un socket nuevo
+                self.stats["reconnects"] += 1
+                try:
+                    sock = self._connect(key)
+                except OSError:
+                    self.stats["errors"] += 1
+                    raise
+                try:
+                    sock.sendall(data)
+                except OSError:
+                    self.stats["errors"] += 1
+                    sock.close()
+                    raise
+            self._conns[key] = [sock, time.monotonic()]
+
+    def query_status(self, host, port=9100, functions=(1, 2, 4), timeout=PROBE_TIMEOUT, connect=True):
+        """
+        Real-time status: sends DLE EOT n for each function and returns {n: status byte};
+        printers that don't answer give {}. The pooled socket is used when there is one
+        (printers often take a single 9100 connection). Otherwise, with `connect`, a
+        socket is opened just for the query and closed afterwards, so probing never
+        holds a printer's only connection; without it, returns None.
+        Raises OSError if the printer is unreachable.
+        """
+        key = (host, port)
+        with self._dest_lock(key):
+            entry = self._conns.pop(key, None)
+            sock = entry[0] if entry and time.monotonic() - entry[1] <= self.idle_timeout else None
+            if entry and sock is None:
+                entry[0].close()
+            pooled = sock is not None
+            if not pooled:
+                if not connect:
+                    return None
+                sock = self._connect(key)
+            status = {}
+            try:
+                if not drain(sock):
+                    raise ConnectionError("printer closed the connection")
+                for n in functions:
+                    sock.sendall(b"\x10\x04" + bytes([n]))
+                    if not select.select([sock], [], [], timeout)[0]:
+                        break
+                    data = sock.recv(1)
+                    if not data:
+                        raise ConnectionError("printer closed the connection")
+                    status[n] = data[0]
+            except OSError:
+                sock.close()
+                raise
+            if pooled:
+                self._conns[key] = [sock, time.monotonic()]
+            else:
+                sock.close()
+            return status
+
+    def reuse_rate(self):
+        sends = self.stats["sends"]
+        return self.stats["reuses"] / sends if sends else 0.0
+
+    def close_all(self):
+        with self._lock:
+            keys = list(self._conns)
+        for key in keys:
+            with self._dest_lock(key):
+                self._close(key)
+
+pool = PrinterConnectionPool()
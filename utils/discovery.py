@@ -0,0 +1,118 @@
+# discovery.py
+import threading
+import time
+from utils.backends import supported
+from utils.config import save_printer_cache
+from utils.network import (PORT_BACKENDS, PRINTER_PORTS, detect_local_printers, probe, scan_hosts,
+                           scan_network_printers)
+from utils.passive import passive_scan
+
+KNOWN_CHECK_INTERVAL = 60       # segundos entre chequeos de impresoras conocidas
+FULL_SCAN_INTERVAL = 6 * 3600   # barrido completo de la red
+PASSIVE_DISCOVERY = True        # ARP/mDNS/SNMP antes de barrer la subred
+
+def diff_printers(old, new):
+    old_ids = {p["identifier"] for p in old}
+    new_ids = {p["identifier"] for p in new}
+    added = [p for p in new if p["identifier"] not in old_ids]
+    removed = [p for p in old if p["identifier"] not in new_ids]
+    return added, removed
+
+def printable(printers):
+    """Drops the records no backend can print to yet (hosts that only speak IPP on 631)."""
+    skipped = [p["identifier"] for p in printers if not supported(p)]
+    if skipped:
+        print(f"[!] Ignoring {len(skipped)} printer(s) without a supported backend: {', '.join(skipped)}")
+    return [p for p in printers if supported(p)]
+
+def probe_known_printers(printers):
+    """
+    Returns the subset of cached network printers that still answer, without sweeping the LAN.
+    Each one is probed on its own cached port; the other printer ports are tried only if that fails.
+    """
+    known = [p for p in printers if p["type"] == "network"]
+    if not known:
+        return []
+    import asyncio
+
+    async def check():
+        return await asyncio.gather(*(probe(p["identifier"], p.get("port", 9100)) for p in known))
+
+    answered = dict(zip((p["identifier"] for p in known), asyncio.run(check())))
+    # solo los que no contestan en su puerto se buscan en los demás; si cambió, cambia el backend con él
+    moved = [p["identifier"] for p in known if not answered[p["identifier"]]]
+    found, _ = asyncio.run(scan_hosts(moved, PRINTER_PORTS, concurrency=len(moved))) if moved else ({}, 0)
+    alive = []
+    for p in known:
+        if answered[p["identifier"]]:
+            alive.append(p)
+        elif p["identifier"] in found:
+            port = found[p["identifier"]]
+            alive.append(dict(p, port=port, backend=PORT_BACKENDS.get(port, "raw")))
+    return printable(alive)
+
+def discover_printers(full=False):
+    """
+    Passive discovery first (see utils.passive); the subnet sweep runs when that found
+    nothing or `full` is set, and only adds the printers the passive pass missed, so
+    the enriched records (model, paper, escpos) win over the sweep's bare ones.
+    """
+    printers = passive_scan() if PASSIVE_DISCOVERY else []
+    if full or not printers:
+        known = {p["identifier"] for p in printers}
+        printers += [p for p in scan_network_printers() if p["identifier"] not in known]
+    return printable(printers + detect_local_printers())
+
+class PrinterRevalidator(threading.Thread):
+    """
+    Keeps `printers` (the list shared with the listener) up to date in the background.
+    Known hosts are probed every KNOWN_CHECK_INTERVAL; the full sweep only runs every
+    FULL_SCAN_INTERVAL or when a known printer stops answering.
+    `on_change(added, removed, printers)` is called only when the set changes.
+    """
+
+    def __init__(self, printers, last_seen=None, on_change=None,
+                 known_interval=KNOWN_CHECK_INTERVAL, full_interval=FULL_SCAN_INTERVAL, last_full_scan=0):
+        super().__init__(name="printer-revalidator", daemon=True)
+        self.printers = printers
+        self.last_seen = dict(last_seen or {})
+        self.on_change = on_change
+        self.known_interval = known_interval
+        self.full_interval = full_interval
+        self.last_full_scan = last_full_scan
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.revalidate()
+            except Exception as e:
+                print(f"[X] Printer revalidation failed: {e}")
+            self.stop_event.wait(self.known_interval)
+
+    def revalidate(self):
+        current = list(self.printers)
+        alive = probe_known_printers(current) + detect_local_printers()
+        missing = [p for p in current if p["identifier"] not in {a["identifier"] for a in alive}]
+
+        if missing or time.time() - self.last_full_scan >= self.full_interval:
+            if missing:
+                print(f"[!] {len(missing)} known printer(s) not answering, running full scan.")
+            alive = discover_printers(full=True)
+            self.last_full_scan = time.time()
+
+        now = time.time()
+        for p in alive:
+            self.last_seen[p["identifier"]] = now
+
+        added, removed = diff_printers(current, alive)
+        if added or removed:
+            self.printers[:] = alive
+            print(f"[✓] Printer list updated: +{len(added)} -{len(removed)}")
+            if self.on_change:
+                self.on_change(added, removed, list(alive))
+        save_printer_cache(list(self.printers), self.last_seen)
+        return added, removed
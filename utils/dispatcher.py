@@ -0,0 +1,230 @@
+# dispatcher.py
+import queue
+import threading
+import time
+from utils.metrics import log_event, registry
+
+QUEUE_SIZE = 100
+OVERFLOW_POLICY = "block"  # "block" (espera BLOCK_TIMEOUT y descarta), "drop_oldest" o "drop_newest"
+BLOCK_TIMEOUT = 2.0
+# Agrupado de ráfagas: hasta COALESCE_MAX tickets que lleguen dentro de COALESCE_WINDOW segundos
+# salen en una sola escritura. COALESCE_MAX = 1 lo desactiva; con ventana 0 solo se agrupa lo ya encolado.
+COALESCE_WINDOW = 0.0
+COALESCE_MAX = 1
+STOP_TIMEOUT = 5.0  # segundos que stop() espera a los workers; lo que quede sigue en el spool
+
+class PrintJob:
+    __slots__ = ("invoice", "destination", "job_id", "enqueued_at", "received_at")
+
+    def __init__(self, invoice, destination, job_id=None, received_at=None):
+        self.invoice = invoice
+        self.destination = destination
+        self.job_id = job_id
+        self.enqueued_at = time.monotonic()
+        # momento en que llegó la comanda (time.monotonic()), para medir pedido→papel
+        self.received_at = received_at or self.enqueued_at
+
+class PrintDispatcher:
+    """
+    One bounded queue and worker thread per destination: different printers print
+    in parallel, tickets for the same printer keep their arrival order, and the
+    caller (the WebSocket thread) never waits on printer I/O.
+    `on_done(job, error)` is called after every job, including dropped ones.
+
+    With a `batch_handler(invoices, destination)` and coalescing enabled (globally or
+    per printer with set_coalescing), a worker that picks a ticket keeps collecting
+    more for up to `coalesce_window` seconds or `coalesce_max` tickets and hands them
+    over together, in order. It returns one error (or None) per invoice.
+    """
+
+    def __init__(self, handler, maxsize=QUEUE_SIZE, policy=OVERFLOW_POLICY, block_timeout=BLOCK_TIMEOUT, on_done=None,
+                 batch_handler=None, coalesce_window=COALESCE_WINDOW, coalesce_max=COALESCE_MAX):
+        self.handler = handler
+        self.batch_handler = batch_handler
+        self.coalesce_window = coalesce_window
+        self.coalesce_max = coalesce_max
+        self._coalesce = {}
+        self.on_done = on_done
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._queues = {}
+        self._threads = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def _queue_for(self, destination):
+        with self._lock:
+            q = self._queues.get(destination)
+            if q is None:
+                q = self._queues[destination] = queue.Queue(self.maxsize)
+                self._stats[destination] = {"submitted": 0, "printed": 0, "failed": 0, "dropped": 0,
+                                            "wait_total": 0.0, "wait_max": 0.0}
+                thread = self._threads[destination] = threading.Thread(target=self._worker, args=(destination, q),
+                                                                       name=f"printer-{destination}", daemon=True)
+                thread.start()
+            return q
+
+    def _finish(self, job, error=None):
+        result = "printed" if error is None else ("dropped" if str(error).startswith("dropped") else "failed")
+        registry.inc("print_jobs_total", printer=job.destination, result=result)
+        if self.on_done:
+            try:
+                self.on_done(job, error)
+            except Exception as e:
+                print(f"[X] Job callback failed: {e}")
+
+    def submit(self, invoice, destination, job_id=None, received_at=None):
+        """Queues a ticket; returns False if it was dropped by the overflow policy or the dispatcher is stopping."""
+        if self._stopping.is_set():
+            return False
+        q = self._queue_for(destination)
+        stats = self._stats[destination]
+        job = PrintJob(invoice, destination, job_id, received_at)
+        stats["submitted"] += 1
+        try:
+            if self.policy == "block":
+                q.put(job, timeout=self.block_timeout)
+            elif self.policy == "drop_oldest":
+                while True:
+                    try:
+                        q.put_nowait(job)
+                        break
+                    except queue.Full:
+                        try:
+                            self._finish(q.get_nowait(), "dropped: queue full")
+                            q.task_done()
+                            stats["dropped"] += 1
+                            log_event("job_dropped", f"[X] Queue for {destination} full, dropped oldest ticket.",
+                                      level="error", printer=destination, policy=self.policy)
+                        except queue.Empty:
+                            pass
+            else:
+                q.put_nowait(job)
+        except queue.Full:
+            stats["dropped"] += 1
+            log_event("job_dropped", f"[X] Queue for {destination} full, ticket dropped.",
+                      level="error", printer=destination, policy=self.policy)
+            self._finish(job, "dropped: queue full")
+            return False
+        return True
+
+    def set_coalescing(self, destination, window, max_jobs):
+        """Overrides the coalescing window/size for one printer."""
+        self._coalesce[destination] = (window, max_jobs)
+
+    def _collect(self, destination, q, job):
+        """Returns (batch, stop): `job` plus whatever arrives within the window."""
+        window, max_jobs = self._coalesce.get(destination, (self.coalesce_window, self.coalesce_max))
+        batch = [job]
+        if not self.batch_handler or max_jobs <= 1:
+            return batch, False
+        deadline = time.monotonic() + window
+        while len(batch) < max_jobs:
+            remaining = deadline - time.monotonic()
+            try:
+                nxt = q.get(timeout=remaining) if remaining > 0 else q.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is None:
+                return batch, True
+            batch.append(nxt)
+        return batch, False
+
+    def _complete(self, job, error):
+        stats = self._stats[job.destination]
+        if error is None:
+            stats["printed"] += 1
+            registry.observe("order_to_paper_seconds", time.monotonic() - job.received_at, printer=job.destination)
+        else:
+            stats["failed"] += 1
+            log_event("print_failed", f"[X] Failed to print on {job.destination}: {error}", level="error",
+                      printer=job.destination, job_id=job.job_id, error=str(error))
+        self._finish(job, error)
+
+    def _worker(self, destination, q):
+        stats = self._stats[destination]
+        while True:
+            job = q.get()
+            if job is None:
+                q.task_done()
+                return
+            if self._stopping.is_set():
+                q.task_done()  # apagando: queda pendiente en el spool y se imprime al volver
+                continue
+            batch, stop = self._collect(destination, q, job)
+            now = time.monotonic()
+            for job in batch:
+                wait = now - job.enqueued_at
+                stats["wait_total"] += wait
+                stats["wait_max"] = max(stats["wait_max"], wait)
+                registry.observe("print_queue_wait_seconds", wait, printer=destination)
+            try:
+                if len(batch) == 1:
+                    try:
+                        self.handler(batch[0].invoice, destination)
+                        errors = [None]
+                    except Exception as e:
+                        errors = [e]
+                else:
+                    registry.observe("print_batch_size", len(batch), printer=destination)
+                    try:
+                        errors = self.batch_handler([j.invoice for j in batch], destination)
+                    except Exception as e:
+                        errors = [e] * len(batch)
+                for job, error in zip(batch, errors):
+                    self._complete(job, error)
+            finally:
+                for _ in batch:
+                    q.task_done()
+            if stop:
+                q.task_done()
+                return
+
+    def stats(self):
+        with self._lock:
+            items = list(self._queues.items())
+        result = {}
+        for destination, q in items:
+            s = dict(self._stats[destination])
+            done = s["printed"] + s["failed"]
+            s["depth"] = q.qsize()
+            s["wait_avg"] = s["wait_total"] / done if done else 0.0
+            result[destination] = s
+        return result
+
+    def gauges(self):
+        """Queue depth per printer, for registry.gauge()."""
+        return [("print_queue_depth", {"printer": destination}, s["depth"]) for destination, s in self.stats().items()]
+
+    def join(self):
+        with self._lock:
+            queues = list(self._queues.values())
+        for q in queues:
+            q.join()
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """
+        Never blocks on a full queue: queued tickets are discarded (they stay pending in
+        the spool) and each worker gets a stop marker. Waits up to `timeout` in total
+        for workers to finish the ticket they are on; a worker stuck on a dead printer
+        is left behind (daemon thread).
+        """
+        self._stopping.set()
+        with self._lock:
+            items = [(q, self._threads[destination]) for destination, q in self._queues.items()]
+        for q, _ in items:
+            while True:
+                try:
+                    q.put_nowait(None)
+                    break
+                except queue.Full:
+                    try:
+                        q.get_nowait()
+                        q.task_done()
+                    except queue.Empty:
+                        pass
+        deadline = time.monotonic() + timeout
+        for _, thread in items:
+            thread.join(max(0.0, deadline - time.monotonic()))
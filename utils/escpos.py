@@ -0,0 +1,105 @@
+# escpos.py — codificador ESC/POS para impresoras térmicas
+ESC = b"\x1b"
+GS = b"\x1d"
+
+INIT = ESC + b"@"
+CUT = GS + b"V\x42\x00"  # avanza hasta la cuchilla y corte parcial
+
+# Tablas de caracteres con acentos y ñ; el valor es el n de ESC t n
+CODEPAGES = {
+    "cp437": 0,
+    "cp850": 2,
+    "cp858": 19,
+}
+DEFAULT_CODEPAGE = "cp858"
+
+ALIGN = {"left": b"\x1ba\x00", "center": b"\x1ba\x01", "right": b"\x1ba\x02"}
+BOLD = {False: b"\x1bE\x00", True: b"\x1bE\x01"}
+
+def select_codepage(codepage):
+    return ESC + b"t" + bytes([CODEPAGES[codepage]])
+
+def char_size(width=1, height=1):
+    return GS + b"!" + bytes([((width - 1) << 4) | (height - 1)])
+
+def feed(lines):
+    return ESC + b"d" + bytes([lines])
+
+# Bytes que entran en un QR con corrección M, por versión (1..40); la versión v mide 17 + 4v módulos
+QR_CAPACITY_M = (14, 26, 42, 62, 84, 106, 122, 152, 180, 213, 251, 287, 331, 362, 412, 450, 504, 560, 624, 666,
+                 711, 779, 857, 911, 997, 1059, 1125, 1190, 1264, 1370, 1452, 1538, 1628, 1722, 1809, 1911, 1989,
+                 2099, 2213, 2331)
+
+def qr_module_size(data, dots):
+    """
+    Largest module size (dots per module) that keeps the native QR for `data` within
+    `dots`: a GS ( k symbol wider than the print area is silently not printed.
+    """
+    size = len(data.encode("ascii"))
+    version = next((v for v, capacity in enumerate(QR_CAPACITY_M, 1) if capacity >= size), 40)
+    return max(1, min(16, dots // (17 + 4 * version)))
+
+def qr_code(data, module_size=6, error_level="M"):
+    """Native QR (GS ( k): the printer builds the symbol, we only send the payload."""
+    payload = data.encode("ascii")
+    ec = {"L": 48, "M": 49, "Q": 50, "H": 51}[error_level]
+    store_len = len(payload) + 3
+
+    def fn(cn, fn_code, params):
+        body = bytes([cn, fn_code]) + params
+        return GS + b"(k" + len(body).to_bytes(2, "little") + body
+
+    return b"".join([
+        fn(49, 65, b"\x32\x00"),               # modelo 2
+        fn(49, 67, bytes([module_size])),      # tamaño del módulo en puntos
+        fn(49, 69, bytes([ec])),               # nivel de corrección
+        GS + b"(k" + store_len.to_bytes(2, "little") + b"\x31\x50\x30" + payload,
+        fn(49, 81, b"\x30"),                   # imprimir
+    ])
+
+def raster_image(rows, width_bytes):
+    """GS v 0: prints a 1-bit image; `rows` is already packed (width_bytes per row, MSB = left dot)."""
+    height = len(rows) // width_bytes
+    return GS + b"v0\x00" + width_bytes.to_bytes(2, "little") + height.to_bytes(2, "little") + rows
+
+def encode_lines(lines, codepage=DEFAULT_CODEPAGE, qr=None, cut=True, qr_dots=None):
+    """
+    Encodes rendered layout lines [(text, (align, bold, height)), ...] into one ESC/POS
+    stream. Style commands are only emitted when the style changes between lines.
+    `qr` is either the payload string (native QR command) or ready-made command bytes;
+    a native QR is sized to fit `qr_dots` (the paper's QR width) when given.
+    """
+    out = [INIT, select_codepage(codepage)]
+    append = out.append
+    align, bold, height = "left", False, 1
+    tail = []
+
+    for text, (line_align, line_bold, line_height) in lines:
+        if not text.strip("\n"):
+            # líneas de avance (Feed) se dejan para después del QR
+            tail.append(text.encode("ascii") + b"\n")
+            continue
+        if tail:
+            out.extend(tail)
+            tail = []
+        if line_align != align:
+            append(ALIGN[line_align])
+            align = line_align
+        if line_bold != bold:
+            append(BOLD[line_bold])
+            bold = line_bold
+        if line_height != height:
+            append(char_size(1, line_height))
+            height = line_height
+        append(text.encode(codepage, "replace") + b"\n")
+
+    if align != "left" or bold or height != 1:
+        out.extend([ALIGN["left"], BOLD[False], char_size()])
+    if qr:
+        if not isinstance(qr, bytes):
+            qr = qr_code(qr, qr_module_size(qr, qr_dots)) if qr_dots else qr_code(qr)
+        out.extend([ALIGN["center"], qr, b"\n", ALIGN["left"]])
+    out.extend(tail)
+    if cut:
+        append(CUT)
+    return b"".join(out)
@@ -0,0 +1,97 @@
+# fake_discovery.py — respondedores mDNS y SNMP falsos en loopback para probar el descubrimiento pasivo
+import socket
+import struct
+import threading
+from utils.passive import SYS_DESCR, _ber, _ber_int, _ber_oid, _ber_read, _encode_name, _oid_str
+
+class _UdpResponder:
+    def __init__(self, host, port):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((host, port))
+        self.host, self.port = self._sock.getsockname()[:2]
+        self.queries = 0
+        self._running = False
+
+    def start(self):
+        self._running = True
+        threading.Thread(target=self._serve, name=f"{type(self).__name__}-{self.port}", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._sock.close()
+
+    def _serve(self):
+        while self._running:
+            try:
+                data, addr = self._sock.recvfrom(9000)
+            except OSError:
+                return
+            self.queries += 1
+            try:
+                answer = self.answer(data)
+            except (IndexError, ValueError, struct.error):
+                continue  # consulta rota: una impresora real tampoco contesta
+            if answer:
+                self._sock.sendto(answer, addr)
+
+class FakeMdnsResponder(_UdpResponder):
+    """
+    Answers any query, unicast to the sender, with PTR/SRV/TXT/A records for each of
+    `printers`: (instance name, ip, port, txt dict[, service]). The service defaults to
+    _pdl-datastream._tcp.local (raw 9100).
+    """
+
+    def __init__(self, printers, host="127.0.0.1", port=0):
+        super().__init__(host, port)
+        self.printers = printers
+
+    def answer(self, data):
+        records = []
+        for i, entry in enumerate(self.printers):
+            name, ip, port, txt = entry[:4]
+            service = entry[4] if len(entry) > 4 else "_pdl-datastream._tcp.local"
+            instance = f"{name}.{service}"
+            target = f"printer-{i}.local"
+            rdata = b"".join(bytes([len(item)]) + item
+                             for item in (f"{k}={v}".encode() for k, v in txt.items())) or b"\x00"
+            records += [
+                (service, 12, _encode_name(instance)),
+                (instance, 33, struct.pack(">HHH", 0, 0, port) + _encode_name(target)),
+                (instance, 16, rdata),
+                (target, 1, socket.inet_aton(ip)),
+            ]
+        body = b"".join(_encode_name(name) + struct.pack(">HHIH", rtype, 1, 120, len(rdata)) + rdata
+                        for name, rtype, rdata in records)
+        return struct.pack(">HHHHHH", 0, 0x8400, 0, len(records), 0, 0) + body
+
+class FakeSnmpAgent(_UdpResponder):
+    """SNMP v2c agent that answers GETs from `values` ({oid: text}); unknown OIDs get noSuchObject."""
+
+    def __init__(self, values=None, host="127.0.0.1", port=0, community="public"):
+        super().__init__(host, port)
+        self.values = values if values is not None else {SYS_DESCR: "EPSON TM-T20III"}
+        self.community = community
+
+    def answer(self, data):
+        _, message, _ = _ber_read(data, 0)
+        offset = _ber_read(message, 0)[2]
+        _, community, offset = _ber_read(message, offset)
+        if community.decode() != self.community:
+            return None  # comunidad equivocada: silencio, como los equipos reales
+        tag, pdu, _ = _ber_read(message, offset)
+        if tag != 0xA0:
+            return None
+        _, request_id, offset = _ber_read(pdu, 0)
+        offset = _ber_read(pdu, offset)[2]
+        offset = _ber_read(pdu, offset)[2]
+        _, varbinds, _ = _ber_read(pdu, offset)
+        out, offset = b"", 0
+        while offset < len(varbinds):
+            _, varbind, offset = _ber_read(varbinds, offset)
+            oid = _oid_str(_ber_read(varbind, 0)[1])
+            value = self.values.get(oid)
+            out += _ber(0x30, _ber_oid(oid) + (_ber(0x04, value.encode()) if value is not None else b"\x80\x00"))
+        response = _ber(0xA2, _ber_int(int.from_bytes(request_id, "big", signed=True)) + _ber_int(0) + _ber_int(0)
+                        + _ber(0x30, out))
+        return _ber(0x30, _ber_int(1) + _ber(0x04, community) + response)
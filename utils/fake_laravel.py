@@ -0,0 +1,101 @@
+# fake_laravel.py — API de Laravel falsa en loopback (registro, latidos, comandas pendientes, rutas)
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeLaravel:
+    """
+    Answers the endpoints the listener uses under /api/public/. Every request is
+    recorded in `requests` as (method, path, body). `fail_next` makes the next N
+    requests return 503, `latency` delays every answer, `routes` and `pending`
+    are served as-is, and heartbeats echo the hash of the last registered list.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.latency = latency
+        self.fail_next = 0
+        self.routes = None
+        self.pending = []
+        self.printers_hash = None
+        self.requests = []
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/api/public"
+
+    @property
+    def register_url(self):
+        return self.base_url + "/register-device"
+
+    def count(self, path):
+        with self._lock:
+            return sum(1 for _, p, _ in self.requests if p.split("?", 1)[0].endswith(path))
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="fake-laravel", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _answer(self, method, path, body):
+        with self._lock:
+            self.requests.append((method, path, body))
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return 503, {"message": "unavailable"}
+        endpoint = path.split("?", 1)[0].rsplit("/api/public/", 1)[-1]
+        if endpoint == "register-device":
+            self.printers_hash = (body or {}).get("printers_hash")
+            return 200, {"ok": True}
+        if endpoint == "device-heartbeat":
+            return 200, {"printers_hash": self.printers_hash}
+        if endpoint == "pending-comandas":
+            return 200, self.pending
+        if endpoint == "printer-routes":
+            return (200, self.routes) if self.routes is not None else (404, {"message": "not found"})
+        return 404, {"message": "not found"}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                try:
+                    body = json.loads(raw) if raw else None
+                except ValueError:
+                    body = None
+                if server.latency:
+                    time.sleep(server.latency)
+                status, data = server._answer(method, self.path, body)
+                out = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def do_GET(self):
+                self._reply("GET")
+
+            def do_POST(self):
+                self._reply("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,84 @@
+# fake_printer.py — impresora 9100 falsa en loopback para pruebas de carga
+import socket
+import threading
+import time
+
+CUT = b"\x1dVB\x00"   # corte parcial: marca el final de cada ticket
+
+class FakePrinter:
+    """
+    Accepts connections like a port-9100 thermal printer and records every byte.
+    `latency` delays each read (slow printer), `fail_every` drops the connection
+    on every Nth read, and DLE EOT status requests are answered with "online".
+    `cut_times` holds the perf_counter() at which each ticket's cut arrived.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, fail_every=0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.received = bytearray()
+        self.connections = 0
+        self.reads = 0
+        self.cut_times = []
+        self._lock = threading.Lock()
+        self._server = socket.create_server((host, port))
+        self.host, self.port = self._server.getsockname()[:2]
+        self._running = False
+
+    def start(self):
+        self._running = True
+        threading.Thread(target=self._accept, name=f"fake-printer-{self.port}", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._server.close()
+
+    def _accept(self):
+        while self._running:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            with self._lock:
+                self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    data = conn.recv(65536)
+                except OSError:
+                    return
+                if not data:
+                    return
+                if self.latency:
+                    time.sleep(self.latency)
+                with self._lock:
+                    self.reads += 1
+                    if self.fail_every and self.reads % self.fail_every == 0:
+                        return
+                    # un corte puede quedar partido entre dos lecturas
+                    start = max(0, len(self.received) - len(CUT) + 1)
+                    self.received += data
+                    now = time.perf_counter()
+                    self.cut_times.extend([now] * self.received.count(CUT, start))
+                if b"\x10\x04" in data:
+                    conn.sendall(b"\x12")  # DLE EOT: online, sin error
+
+    def cut_count(self):
+        """Tickets received, counted by their ESC/POS cut command."""
+        with self._lock:
+            return len(self.cut_times)
+
+    def tickets(self):
+        """[(ticket bytes, cut time)]; bytes of a write dropped midway stay in front of the next ticket."""
+        with self._lock:
+            return list(zip(bytes(self.received).split(CUT), self.cut_times))
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
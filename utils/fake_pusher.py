@@ -0,0 +1,208 @@
+# fake_pusher.py — servidor WebSocket local que habla el protocolo de Pusher (pruebas y benchmarks)
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+class _Client:
+    def __init__(self, conn):
+        self.conn = conn
+        self.channels = set()
+        self.lock = threading.Lock()
+
+    def send_frame(self, payload, opcode=1):
+        header = bytes([0x80 | opcode])
+        n = len(payload)
+        if n < 126:
+            header += bytes([n])
+        elif n < 1 << 16:
+            header += bytes([126]) + struct.pack(">H", n)
+        else:
+            header += bytes([127]) + struct.pack(">Q", n)
+        with self.lock:
+            self.conn.sendall(header + payload)
+
+    def send_json(self, event, data, channel=None):
+        msg = {"event": event, "data": data if isinstance(data, str) else json.dumps(data)}
+        if channel:
+            msg["channel"] = channel
+        self.send_frame(json.dumps(msg).encode())
+
+class FakePusherServer:
+    """
+    Minimal Pusher stand-in: WebSocket handshake and framing, connection_established,
+    subscribe/subscription_succeeded and ping/pong. `broadcast()` pushes an event to the
+    subscribers of a channel; `drop_clients()` simulates a network cut; `answer_pings=False`
+    simulates a half-dead connection.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, activity_timeout=120, answer_pings=True):
+        self.activity_timeout = activity_timeout
+        self.answer_pings = answer_pings
+        self.clients = []
+        self.stats = {"connections": 0, "subscribes": 0, "pings": 0, "messages_sent": 0}
+        self._lock = threading.Lock()
+        self._subscribed = threading.Condition(self._lock)
+        self._server = socket.create_server((host, port))
+        self.host, self.port = self._server.getsockname()[:2]
+        self._running = False
+        self._next_id = 0
+
+    def url(self, app_key="test"):
+        return f"ws://{self.host}:{self.port}/app/{app_key}?protocol=7&client=python"
+
+    def start(self):
+        self._running = True
+        threading.Thread(target=self._accept, name="fake-pusher", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._server.close()
+        self.drop_clients()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- API de prueba ---
+
+    def broadcast(self, channel, event, data):
+        """Sends `event` to every client subscribed to `channel`. Returns how many got it."""
+        payload = json.dumps({"event": event, "channel": channel,
+                              "data": data if isinstance(data, str) else json.dumps(data)}).encode()
+        with self._lock:
+            targets = [c for c in self.clients if channel in c.channels]
+        for client in targets:
+            try:
+                client.send_frame(payload)
+            except OSError:
+                pass
+        with self._lock:
+            self.stats["messages_sent"] += len(targets)
+        return len(targets)
+
+    def wait_for_subscribers(self, channel, count=1, timeout=5.0):
+        with self._subscribed:
+            return self._subscribed.wait_for(
+                lambda: sum(channel in c.channels for c in self.clients) >= count, timeout)
+
+    def drop_clients(self):
+        with self._lock:
+            clients, self.clients = self.clients, []
+        for client in clients:
+            try:
+                client.conn.shutdown(socket.SHUT_RDWR)
+                client.conn.close()
+            except OSError:
+                pass
+
+    # --- servidor ---
+
+    def _accept(self):
+        while self._running:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _handshake(self, conn):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = conn.recv(4096)
+            if not chunk:
+                return False
+            request += chunk
+        key = None
+        for line in request.decode("latin-1").split("\r\n"):
+            if line.lower().startswith("sec-websocket-key:"):
+                key = line.split(":", 1)[1].strip()
+        if not key:
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        conn.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        return True
+
+    @staticmethod
+    def _recv_exact(conn, n):
+        buf = b""
+        while len(buf) < n:
+            chunk = conn.recv(n - len(buf))
+            if not chunk:
+                raise ConnectionError("closed")
+            buf += chunk
+        return buf
+
+    def _read_frame(self, conn):
+        b1, b2 = self._recv_exact(conn, 2)
+        opcode, length = b1 & 0x0F, b2 & 0x7F
+        if length == 126:
+            length = struct.unpack(">H", self._recv_exact(conn, 2))[0]
+        elif length == 127:
+            length = struct.unpack(">Q", self._recv_exact(conn, 8))[0]
+        mask = self._recv_exact(conn, 4) if b2 & 0x80 else None
+        payload = self._recv_exact(conn, length)
+        if mask:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return opcode, payload
+
+    def _serve(self, conn):
+        try:
+            if not self._handshake(conn):
+                conn.close()
+                return
+        except OSError:
+            return
+        client = _Client(conn)
+        with self._lock:
+            self.clients.append(client)
+            self.stats["connections"] += 1
+            self._next_id += 1
+            socket_id = f"{self._next_id}.{self.port}"
+        try:
+            client.send_json("pusher:connection_established",
+                             {"socket_id": socket_id, "activity_timeout": self.activity_timeout})
+            while True:
+                opcode, payload = self._read_frame(conn)
+                if opcode == 8:
+                    client.send_frame(payload[:2], opcode=8)
+                    break
+                if opcode == 9:
+                    client.send_frame(payload, opcode=10)
+                    continue
+                if opcode != 1:
+                    continue
+                self._on_message(client, json.loads(payload))
+        except (OSError, ConnectionError, ValueError):
+            pass
+        finally:
+            with self._lock:
+                if client in self.clients:
+                    self.clients.remove(client)
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _on_message(self, client, msg):
+        event, data = msg.get("event"), msg.get("data") or {}
+        if event == "pusher:subscribe":
+            channel = data.get("channel")
+            with self._subscribed:
+                client.channels.add(channel)
+                self.stats["subscribes"] += 1
+                self._subscribed.notify_all()
+            client.send_json("pusher_internal:subscription_succeeded", {}, channel=channel)
+        elif event == "pusher:ping":
+            with self._lock:
+                self.stats["pings"] += 1
+            if self.answer_pings:
+                client.send_json("pusher:pong", {})
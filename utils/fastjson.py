@@ -0,0 +1,45 @@
+# fastjson.py — decodificación rápida de mensajes de Pusher (orjson/msgspec opcionales)
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+msgspec = None
+if orjson is None:
+    # msgspec solo hace falta sin orjson: no se paga su import si no se usa
+    try:
+        import msgspec
+    except ImportError:
+        pass
+
+if orjson is not None:
+    def loads(data):
+        return orjson.loads(data)
+
+    def dumps(obj):
+        return orjson.dumps(obj).decode()
+elif msgspec is not None:
+    _decoder = msgspec.json.Decoder()
+    _encoder = msgspec.json.Encoder()
+
+    def loads(data):
+        return _decoder.decode(data)
+
+    def dumps(obj):
+        return _encoder.encode(obj).decode()
+else:
+    loads = json.loads
+
+    def dumps(obj):
+        return json.dumps(obj, separators=(",", ":"))
+
+def decode_payload(data):
+    """
+    Decodes the `data` of a NewOrderComanda event into a plain dict (the layout, routing
+    and spool all consume dicts). Already-decoded data is returned as is.
+    """
+    if not isinstance(data, (str, bytes)):
+        return data
+    return loads(data)
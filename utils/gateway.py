@@ -0,0 +1,216 @@
+# gateway.py — un solo proceso para muchas empresas (patios de comida, franquicias)
+import heapq
+import json
+import os
+import threading
+import time
+from utils import websocket_handler as wh
+from utils.api import authorize_channel, fetch_missed_orders, fetch_routes
+from utils.backends import use_printers
+from utils.config import CONFIG_FILE, apply_settings
+from utils.fastjson import decode_payload
+from utils.metrics import log_event, registry, span
+from utils.pusher_client import PusherClient, sign_channel
+from utils.registration import DeviceRegistrar
+from utils.routing import Router
+from utils.service import Supervisor
+
+TENANTS_FILE = "tenants.json"
+REGISTER_STAGGER = 0.05   # segundos entre el primer registro de cada empresa (sin ráfaga al arrancar)
+
+NO_ROUTES = Router()      # compartida por las empresas sin ruteo a estaciones
+
+class Tenant:
+    """One company (CUIT) served by the gateway, with its own printers and routing table."""
+    __slots__ = ("cuit", "device_id", "printers", "router", "channel", "event")
+
+    def __init__(self, cuit, device_id, printers, routes=None, channel=None):
+        self.cuit = str(cuit)
+        self.device_id = device_id
+        self.printers = printers
+        self.router = Router(routes) if routes else None  # sin tabla no se reserva nada
+        self.channel = channel or (wh.TENANT_CHANNEL.format(cuit=self.cuit) if wh.TENANT_CHANNEL else wh.CHANNEL)
+        self.event = f"{wh.EVENT_NAME}_{self.cuit}"
+
+def _printer(entry):
+    if isinstance(entry, dict):
+        return dict(entry, name=entry.get("name") or entry["identifier"], type=entry.get("type") or "network")
+    # sin "type": el backend sale del texto como con cualquier destino (IP[:puerto], cola, file:...)
+    return {"name": entry, "identifier": entry}
+
+def load_tenants(path=None):
+    """
+    Reads the tenant list, either a list or {"tenants": [...]} of:
+
+        {"cuit": "20361797400", "device_id": "patio-1", "printers": ["192.168.0.50", ...],
+         "routes": {...routing table...}, "channel": "private-comandas.20361797400"}
+
+    Printers can be identifiers or the same dicts discovery produces. Only `cuit` is required.
+    """
+    path = path or TENANTS_FILE
+    with open(path, "r") as f:
+        data = json.load(f)
+    entries = data.get("tenants", []) if isinstance(data, dict) else data
+    tenants = []
+    for entry in entries:
+        if not entry.get("cuit"):
+            print(f"[X] Skipping tenant without cuit in {path}: {entry}")
+            continue
+        tenants.append(Tenant(entry["cuit"], entry.get("device_id") or f"gateway-{entry['cuit']}",
+                              [_printer(p) for p in entry.get("printers") or []],
+                              entry.get("routes"), entry.get("channel")))
+    return tenants
+
+class Gateway:
+    """
+    Serves many tenants over one Pusher connection. Every tenant's channel is
+    subscribed once (tenants sharing a channel share the subscription) and incoming
+    events are dispatched to the tenant through a dict keyed by event name, so the
+    cost per message does not grow with the number of tenants; events for nobody
+    are dropped before decoding. The spool, print queues, history and health monitor
+    are the listener's own and shared: each printer gets one queue whatever tenant
+    it belongs to, and invoices are tagged with their tenant so equal invoice
+    numbers from different companies never dedupe each other.
+    """
+
+    def __init__(self, tenants):
+        self.tenants = tenants
+        self.by_event = {t.event: t for t in tenants}
+        self.by_channel = {}
+        for t in tenants:
+            self.by_channel.setdefault(t.channel, t)  # quien firma la suscripción de un canal privado
+        if len(self.by_event) < len(tenants):
+            print(f"[!] {len(tenants) - len(self.by_event)} tenants share a CUIT, only the last one gets its orders.")
+        self.client = None
+
+    def channels(self):
+        return list(self.by_channel)
+
+    def printers(self):
+        return [p for t in self.tenants for p in t.printers]
+
+    def targets(self):
+        targets = [p["identifier"] for p in self.printers()]
+        targets += [s.get("printer") for t in self.tenants if t.router for s in t.router.stations.values()]
+        targets += list(wh.dispatcher.stats())
+        targets += list(wh.health.fallbacks.values()) + [wh.health.default_fallback]
+        return targets
+
+    def process(self, tenant, payload, received_at=None, wait=False):
+        invoice = payload.get("invoice")
+        if invoice:
+            invoice["tenant"] = tenant.cuit
+        registry.inc("gateway_orders_total", tenant=tenant.cuit)
+        return wh.process_payload(payload, tenant.printers, received_at, router=tenant.router or NO_ROUTES, wait=wait)
+
+    def submit_local(self, payload, received_at=None):
+        """LAN API entry point: the order names its company with "cuit"."""
+        tenant = self.by_event.get(f"{wh.EVENT_NAME}_{payload.get('cuit')}")
+        if tenant is None:
+            raise ValueError(f"unknown cuit {payload.get('cuit')!r}")
+        return self.process(tenant, payload, received_at, wait=True)
+
+    def handle(self, msg):
+        received_at = time.monotonic()
+        tenant = self.by_event.get(msg.get("event"))
+        if tenant is None:
+            return
+        try:
+            with span("print_stage_seconds", stage="decode"):
+                payload = decode_payload(msg["data"])
+            self.process(tenant, payload, received_at)
+        except Exception as e:
+            registry.inc("message_errors_total")
+            log_event("message_failed", f"[X] Failed to process message for {tenant.cuit}: {e}", level="error",
+                      tenant=tenant.cuit, error=str(e))
+
+    def authorize(self, socket_id, channel):
+        if wh.PUSHER_APP_SECRET:
+            return sign_channel(wh.PUSHER_APP_KEY, wh.PUSHER_APP_SECRET, socket_id, channel)
+        tenant = self.by_channel[channel]
+        return authorize_channel(tenant.cuit, tenant.device_id, socket_id, channel)
+
+    def catch_up(self, since):
+        """Like the listener's catch-up, one tenant after the other on the resume thread."""
+        for tenant in self.tenants:
+            orders = fetch_missed_orders(tenant.cuit, tenant.device_id, since)
+            if orders:
+                print(f"[↻] Recovering {len(orders)} orders missed by {tenant.cuit}.")
+            for payload in orders:
+                try:
+                    self.process(tenant, payload)
+                except Exception as e:
+                    print(f"[X] Failed to recover order for {tenant.cuit}: {e}")
+
+    def refresh_routes(self):
+        """Fetches each tenant's routing table from Laravel; the one in the tenants file stays if that fails."""
+        for tenant in self.tenants:
+            routes = fetch_routes(tenant.cuit, tenant.device_id)
+            if routes:
+                tenant.router = tenant.router or Router()
+                tenant.router.update(routes)
+
+    def run_registration(self, stop_event):
+        """
+        One thread registers and heartbeats every tenant: each DeviceRegistrar.sync()
+        says when it wants to run next and a heap picks the earliest.
+        """
+        registrars = [DeviceRegistrar(t.cuit, t.device_id, t.printers, status=wh.device_status)
+                      for t in self.tenants]
+        now = time.monotonic()
+        heap = [(now + i * REGISTER_STAGGER, i) for i in range(len(registrars))]
+        while heap:
+            due, i = heap[0]
+            if stop_event.wait(max(0.0, due - time.monotonic())):
+                return
+            heapq.heappop(heap)
+            try:
+                wait = registrars[i].sync()
+            except Exception as e:
+                print(f"[X] Device registration failed for {registrars[i].cuit}: {e}")
+                wait = registrars[i].next_delay()
+            if wait is not None:
+                heapq.heappush(heap, (time.monotonic() + wait, i))
+
+    def run(self, supervisor=None, url=None):
+        """Runs the gateway on the calling thread until a signal or supervisor.stop()."""
+        supervisor = supervisor or Supervisor()
+        use_printers([p for p in self.printers() if "type" in p])
+        threading.Thread(target=self.refresh_routes, name="routes-refresh", daemon=True).start()
+        wh.start_pipeline(supervisor, self.targets)
+
+        def start_registration():
+            thread = threading.Thread(target=self.run_registration, args=(supervisor.stop_event,),
+                                      name="device-registration", daemon=True)
+            thread.start()
+            return thread
+
+        supervisor.add("registration", start_registration)
+        self.client = PusherClient(
+            url or wh.build_pusher_ws_url(),
+            self.channels(),
+            events=set(self.by_event),
+            authorizer=self.authorize,
+            on_event=self.handle,
+            on_resume=self.catch_up,
+        )
+        if wh.LAN_API_ENABLED:
+            wh.start_lan_api(supervisor, self.submit_local)
+        registry.gauge(lambda: [("gateway_tenants", {}, len(self.tenants))])
+        print(f"[🏬] Gateway serving {len(self.tenants)} tenants over {len(self.by_channel)} channel(s).")
+        wh.run_pusher(supervisor, self.client)
+
+def main():
+    config = {}
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, "r") as f:
+            config = json.load(f)
+    apply_settings(config)
+    tenants = load_tenants()
+    if not tenants:
+        print(f"[X] No tenants in {TENANTS_FILE}.")
+        return
+    Gateway(tenants).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# health.py — estado de las impresoras en segundo plano y failover
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.backends import DOWN, OK, backend_for, describe, tcp_reachable
+from utils.metrics import log_event, registry
+
+HEALTH_INTERVAL = 15     # segundos entre rondas de sondeo
+DOWN_AFTER = 2           # sondeos fallidos seguidos para dar una impresora por caída
+PROBE_WORKERS = 8        # una impresora colgada no frena al resto
+
+def probe(destination):
+    """Returns (state, detail) for a destination using its backend's status()."""
+    try:
+        return backend_for(destination).status()
+    except ValueError:
+        # backends sin envío propio (p.ej. IPP): solo alcanzable o no
+        _, target, port = describe(destination)
+        return tcp_reachable(target, port) if port else (DOWN, "unsupported backend")
+    except Exception as e:
+        return DOWN, str(e)
+
+class HealthMonitor:
+    """
+    Probes every printer returned by `targets()` every `interval` seconds and keeps
+    a health table, so dispatch only reads cached state and never blocks on a probe.
+    A printer is considered down after `down_after` failed probes in a row, or right
+    away when a real print to it fails. resolve() swaps an unhealthy destination for
+    its fallback (`fallbacks[destination]`, else `default_fallback`) if that one is up.
+    """
+
+    def __init__(self, targets, fallbacks=None, default_fallback=None,
+                 interval=HEALTH_INTERVAL, down_after=DOWN_AFTER):
+        self.targets = targets
+        self.fallbacks = dict(fallbacks or {})
+        self.default_fallback = default_fallback
+        self.interval = interval
+        self.down_after = down_after
+        self.table = {}
+        self.stats = {"rounds": 0, "probes": 0, "failovers": 0}
+        self._lock = threading.Lock()
+
+    # --- tabla ---
+
+    def _entry(self, destination):
+        return self.table.setdefault(destination, {"state": None, "detail": "", "failures": 0,
+                                                   "checked_at": None, "since": time.time()})
+
+    def _update(self, destination, state, detail):
+        now = time.time()
+        with self._lock:
+            entry = self._entry(destination)
+            entry["checked_at"] = now
+            entry["detail"] = detail
+            entry["failures"] = entry["failures"] + 1 if state == DOWN else 0
+            if state == DOWN and entry["state"] != DOWN and entry["failures"] < self.down_after:
+                return  # un sondeo fallido suelto no alcanza
+            previous = entry["state"]
+            if previous == state:
+                return
+            entry["state"] = state
+            entry["since"] = now
+        if previous is not None or state != OK:
+            level = "error" if state == DOWN else "info"
+            icon = "[X]" if state == DOWN else "[✓]"
+            log_event("printer_health", f"{icon} Printer {destination} is {state}: {detail}", level=level,
+                      printer=destination, state=state, previous=previous, detail=detail)
+
+    def state(self, destination):
+        entry = self.table.get(destination)
+        return entry["state"] if entry else None
+
+    def is_usable(self, destination):
+        """Unknown printers count as usable: only a known-bad printer is avoided."""
+        return self.state(destination) != DOWN
+
+    def report_failure(self, destination, error):
+        with self._lock:
+            entry = self._entry(destination)
+            entry["failures"] = max(entry["failures"], self.down_after - 1)
+        self._update(destination, DOWN, f"print failed: {error}")
+
+    # --- failover ---
+
+    def fallback_for(self, destination):
+        return self.fallbacks.get(destination) or self.default_fallback
+
+    def resolve(self, destination):
+        if self.is_usable(destination):
+            return destination
+        fallback = self.fallback_for(destination)
+        if fallback and fallback != destination and self.is_usable(fallback):
+            self.stats["failovers"] += 1
+            registry.inc("printer_failovers_total", printer=destination, fallback=fallback)
+            log_event("failover", f"[↪] {destination} is down, printing on {fallback}.",
+                      printer=destination, fallback=fallback)
+            return fallback
+        return destination
+
+    def with_failover(self, destination, send):
+        """Calls send(target) on the resolved printer; if that fails, marks it down and tries its fallback once."""
+        target = self.resolve(destination)
+        try:
+            return send(target)
+        except Exception as e:
+            self.report_failure(target, e)
+            fallback = self.resolve(target)
+            if fallback == target:
+                raise
+            return send(fallback)
+
+    # --- sondeo ---
+
+    def check_all(self):
+        destinations = [d for d in dict.fromkeys(self.targets()) if d]
+        if not destinations:
+            return
+        with ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(destinations))) as executor:
+            for destination, (state, detail) in zip(destinations, executor.map(probe, destinations)):
+                self._update(destination, state, detail)
+        self.stats["rounds"] += 1
+        self.stats["probes"] += len(destinations)
+
+    def run(self, stop_event):
+        while not stop_event.is_set():
+            try:
+                self.check_all()
+            except Exception as e:
+                print(f"[X] Health check failed: {e}")
+            stop_event.wait(self.interval)
+
+    def start(self, stop_event):
+        thread = threading.Thread(target=self.run, args=(stop_event,), name="printer-health", daemon=True)
+        thread.start()
+        return thread
+
+    def gauges(self):
+        return [("printer_up", {"printer": destination}, int(entry["state"] != DOWN))
+                for destination, entry in list(self.table.items()) if entry["state"] is not None]
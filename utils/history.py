@@ -0,0 +1,312 @@
+# history.py — historial de tickets impresos y reimpresión desde los bytes guardados
+import argparse
+import json
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from utils.backends import backend_for
+
+HISTORY_FILE = "history.db"
+HISTORY_MAX_BYTES = 64 * 1024 * 1024   # bytes comprimidos; al pasarse se borran los más viejos
+HISTORY_MAX_AGE = 30 * 24 * 3600
+COMPRESS_LEVEL = 6                     # ESC/POS es casi todo texto: ~4x más chico
+BATCH_SIZE = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    id INTEGER PRIMARY KEY,
+    code TEXT,
+    station TEXT,
+    printer TEXT NOT NULL,
+    table_name TEXT,
+    date TEXT,
+    created_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tickets_code ON tickets (code);
+CREATE INDEX IF NOT EXISTS tickets_table ON tickets (table_name, created_at);
+CREATE INDEX IF NOT EXISTS tickets_date ON tickets (date, created_at);
+CREATE TABLE IF NOT EXISTS ticket_tables (
+    ticket_id INTEGER NOT NULL,
+    table_name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ticket_tables_name ON ticket_tables (table_name, ticket_id);
+CREATE INDEX IF NOT EXISTS ticket_tables_ticket ON ticket_tables (ticket_id);
+"""
+
+COLUMNS = ("id", "code", "station", "printer", "table_name", "date", "created_at", "size")
+
+def ticket_meta(invoice, destination):
+    tables = [str(t.get("name")) for t in invoice.get("tables") or [] if t.get("name") is not None]
+    return {
+        "code": invoice.get("code"),
+        "station": invoice.get("station"),
+        "printer": destination,
+        "table_name": ", ".join(tables) or None,   # para mostrar; la búsqueda usa ticket_tables
+        "tables": tables,
+        "date": invoice.get("date"),
+    }
+
+class TicketHistory:
+    """
+    Keeps the exact bytes sent to each printer (zlib-compressed) with the invoice code,
+    station, table, date and printer, indexed for lookup. Writes are queued to one
+    writer thread and never slow the print path; reads use their own connection.
+    Retention is bounded by HISTORY_MAX_BYTES and HISTORY_MAX_AGE, oldest first.
+    """
+
+    def __init__(self, path=None, max_bytes=None, max_age=None):
+        self.path = path
+        self._max_bytes = max_bytes
+        self._max_age = max_age
+        self.stats = {"recorded": 0, "evicted": 0, "reprints": 0, "bytes": 0}
+        self._ops = queue.Queue()
+        self._thread = None
+        self._local = threading.local()
+
+    @property
+    def max_bytes(self):
+        return HISTORY_MAX_BYTES if self._max_bytes is None else self._max_bytes
+
+    @property
+    def max_age(self):
+        return HISTORY_MAX_AGE if self._max_age is None else self._max_age
+
+    def start(self):
+        if self._thread is None:
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._writer, args=(ready,), name="ticket-history", daemon=True)
+            self._thread.start()
+            ready.wait()
+        return self
+
+    def _connect(self):
+        db = sqlite3.connect(self.path or HISTORY_FILE, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")  # perder el último lote ante un corte no es grave
+        return db
+
+    def _reader(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    def _writer(self, ready):
+        db = self._connect()
+        db.executescript(SCHEMA)
+        self._backfill_tables(db)
+        self.stats["bytes"] = db.execute("SELECT COALESCE(SUM(size), 0) FROM tickets").fetchone()[0]
+        self._evict(db)
+        ready.set()
+        last_age_check = time.monotonic()
+        while True:
+            batch = [self._ops.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._ops.get_nowait())
+                except queue.Empty:
+                    break
+            flush = [op for op in batch if isinstance(op, threading.Event)]
+            rows = [op for op in batch if not isinstance(op, threading.Event)]
+            try:
+                if rows:
+                    with db:
+                        for row in rows:
+                            ticket_id = db.execute("INSERT INTO tickets (code, station, printer, table_name, date, "
+                                                   "created_at, size, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                                   row[:8]).lastrowid
+                            # una fila por mesa: un ticket de las mesas 1 y 2 aparece buscando cualquiera
+                            db.executemany("INSERT INTO ticket_tables (ticket_id, table_name) VALUES (?, ?)",
+                                           [(ticket_id, table) for table in row[8]])
+                    self.stats["recorded"] += len(rows)
+                    self.stats["bytes"] += sum(r[6] for r in rows)
+                if self.stats["bytes"] > self.max_bytes or time.monotonic() - last_age_check > 3600:
+                    self._evict(db)
+                    last_age_check = time.monotonic()
+            except Exception as e:
+                print(f"[X] Ticket history write failed: {e}")
+            for event in flush:
+                event.set()
+
+    def _backfill_tables(self, db):
+        """Historiales de antes de ticket_tables: parte el table_name guardado como "1, 2"."""
+        if db.execute("SELECT 1 FROM ticket_tables LIMIT 1").fetchone():
+            return
+        rows = db.execute("SELECT id, table_name FROM tickets WHERE table_name IS NOT NULL").fetchall()
+        with db:
+            db.executemany("INSERT INTO ticket_tables (ticket_id, table_name) VALUES (?, ?)",
+                           [(ticket_id, table) for ticket_id, names in rows for table in names.split(", ")])
+
+    def _evict(self, db):
+        """Drops tickets older than max_age, then the oldest ones until under max_bytes."""
+        with db:
+            cutoff_time = time.time() - self.max_age
+            db.execute("DELETE FROM ticket_tables WHERE ticket_id IN (SELECT id FROM tickets WHERE created_at < ?)",
+                       (cutoff_time,))
+            evicted = db.execute("DELETE FROM tickets WHERE created_at < ?", (cutoff_time,)).rowcount
+            excess = self.stats["bytes"] - self.max_bytes
+            if excess > 0:
+                # recorre de los más viejos a los más nuevos hasta cubrir el excedente
+                cutoff, freed = None, 0
+                for ticket_id, size in db.execute("SELECT id, size FROM tickets ORDER BY id"):
+                    freed += size
+                    cutoff = ticket_id
+                    if freed >= excess:
+                        break
+                if cutoff is not None:
+                    db.execute("DELETE FROM ticket_tables WHERE ticket_id <= ?", (cutoff,))
+                    evicted += db.execute("DELETE FROM tickets WHERE id <= ?", (cutoff,)).rowcount
+        if evicted:
+            self.stats["evicted"] += evicted
+            self.stats["bytes"] = db.execute("SELECT COALESCE(SUM(size), 0) FROM tickets").fetchone()[0]
+
+    # --- API ---
+
+    def record(self, invoice, destination, payload):
+        """Queues the ticket exactly as sent; printer.on_sent() hook signature."""
+        meta = ticket_meta(invoice, destination)
+        data = zlib.compress(payload, COMPRESS_LEVEL)
+        self._ops.put((meta["code"], meta["station"], destination, meta["table_name"], meta["date"],
+                       time.time(), len(data), data, meta["tables"]))
+
+    def flush(self):
+        """Waits until every queued ticket is written (tests, CLI, shutdown)."""
+        event = threading.Event()
+        self._ops.put(event)
+        event.wait()
+
+    def find(self, code=None, table=None, date=None, printer=None, limit=20):
+        """
+        Newest first, metadata only. `code` also matches station sub-tickets of that invoice;
+        `table` matches any one table of a multi-table ticket.
+        """
+        clauses, params = [], []
+        for column, value in (("code", code), ("date", date), ("printer", printer)):
+            if value not in (None, ""):
+                clauses.append(f"{column} = ?")
+                params.append(str(value))
+        if table not in (None, ""):
+            clauses.append("id IN (SELECT ticket_id FROM ticket_tables WHERE table_name = ?)")
+            params.append(str(table))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._reader().execute(f"SELECT {', '.join(COLUMNS)} FROM tickets {where} ORDER BY id DESC LIMIT ?",
+                                      (*params, int(limit))).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def get(self, ticket_id):
+        """Returns (meta, ESC/POS bytes) or None."""
+        row = self._reader().execute(f"SELECT {', '.join(COLUMNS)}, data FROM tickets WHERE id = ?",
+                                     (int(ticket_id),)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(COLUMNS, row[:-1])), zlib.decompress(row[-1])
+
+    def reprint(self, ticket_id=None, code=None, printer=None):
+        """
+        Sends the stored bytes again, to `printer` or the original one. With `code`,
+        reprints every ticket of the newest print of that invoice (receipt and stations).
+        Returns the list of reprinted tickets' metadata.
+        """
+        if ticket_id is not None:
+            tickets = [ticket_id]
+        else:
+            found = self.find(code=code, limit=50)
+            if not found:
+                return []
+            newest = {}
+            for meta in found:  # el más nuevo de cada (estación, impresora)
+                newest.setdefault((meta["station"], meta["printer"]), meta["id"])
+            tickets = sorted(newest.values())
+        done = []
+        for tid in tickets:
+            item = self.get(tid)
+            if item is None:
+                continue
+            meta, data = item
+            target = printer or meta["printer"]
+            backend_for(target).send(data)
+            self.stats["reprints"] += 1
+            print(f"[🖨️] Reimpreso {meta['code']} en {target} (ticket #{meta['id']})")
+            done.append(dict(meta, reprinted_on=target))
+        return done
+
+    # --- endpoints locales (ver MetricsServer) ---
+
+    def http_find(self, query, body=None):
+        return 200, self.find(query.get("code"), query.get("table"), query.get("date"), query.get("printer"),
+                              int(query.get("limit") or 20))
+
+    def http_reprint(self, query, body=None):
+        params = dict(query, **(body or {}))
+        if params.get("id") is None and not params.get("code"):
+            return 400, {"error": "id or code required"}
+        try:
+            done = self.reprint(params.get("id"), params.get("code"), params.get("printer"))
+        except Exception as e:
+            return 502, {"error": str(e)}
+        return (200, {"reprinted": done}) if done else (404, {"error": "ticket not found"})
+
+def main(argv=None):
+    import os
+    from utils.config import CONFIG_FILE, apply_settings
+    parser = argparse.ArgumentParser(description="Ticket history and reprint")
+    sub = parser.add_subparsers(dest="command", required=True)
+    find = sub.add_parser("list", help="list printed tickets, newest first")
+    find.add_argument("--code")
+    find.add_argument("--table")
+    find.add_argument("--date", help="invoice date, e.g. 2025-08-01")
+    find.add_argument("--printer")
+    find.add_argument("--limit", type=int, default=20)
+    again = sub.add_parser("reprint", help="send a stored ticket to the printer again")
+    again.add_argument("id", nargs="?", type=int)
+    again.add_argument("--code")
+    again.add_argument("--printer", help="print on another printer")
+    args = parser.parse_args(argv)
+
+    # history_file, metrics_port... como los usa el servicio
+    config = {}
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, "r") as f:
+            config = json.load(f)
+    apply_settings(config)
+    from utils.metrics import METRICS_HOST, METRICS_PORT
+    # con `python -m utils.history` este archivo es __main__: los ajustes quedaron en utils.history
+    from utils.history import HISTORY_FILE as history_file
+
+    if args.command == "reprint":
+        if args.id is None and not args.code:
+            parser.error("reprint needs a ticket id or --code")
+        # con el servicio corriendo, reimprime él (usa la conexión que ya tiene abierta con la impresora)
+        body = json.dumps({"id": args.id, "code": args.code, "printer": args.printer}).encode()
+        from urllib.error import HTTPError
+        from urllib.request import Request, urlopen
+        request = Request(f"http://{METRICS_HOST}:{METRICS_PORT}/reprint", data=body,
+                          headers={"Content-Type": "application/json"})
+        try:
+            with urlopen(request, timeout=10) as res:
+                print(json.dumps(json.loads(res.read()), indent=2, ensure_ascii=False))
+            return
+        except HTTPError as e:
+            print(f"[X] Reprint failed ({e.code}): {e.read().decode(errors='replace')}")
+            return
+        except OSError:
+            pass  # servicio apagado: se imprime desde acá
+
+    history = TicketHistory(history_file)
+    history._reader().executescript(SCHEMA)
+    history._backfill_tables(history._reader())
+    if args.command == "list":
+        for meta in history.find(args.code, args.table, args.date, args.printer, args.limit):
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(meta["created_at"]))
+            print(f"#{meta['id']:<6} {when}  {meta['code'] or '-':<16} mesa {meta['table_name'] or '-':<6} "
+                  f"{meta['station'] or 'ticket':<10} {meta['printer']}  ({meta['size']} B)")
+    else:
+        if not history.reprint(args.id, args.code, args.printer):
+            print("[X] Ticket not found.")
+
+if __name__ == "__main__":
+    main()
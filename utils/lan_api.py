@@ -0,0 +1,151 @@
+# lan_api.py — API HTTP en la red local: el POS manda la comanda directo, sin la vuelta por Pusher
+import threading
+import time
+from utils import fastjson
+from utils.metrics import log_event, registry
+
+LAN_API_HOST = "127.0.0.1"    # para escuchar en la red hace falta LAN_API_TOKEN
+LAN_API_PORT = 9465
+LAN_API_TOKEN = None          # si está, se exige "Authorization: Bearer <token>"
+MAX_BODY = 4 * 1024 * 1024    # un lote grande de comandas entra de sobra
+KEEPALIVE_TIMEOUT = 60        # segundos que una conexión del POS puede quedar ociosa
+DRAIN_MAX = 64 * 1024         # cuerpo que se descarta antes de cerrar una conexión rechazada
+
+registry.describe("lan_orders_total", "Orders received through the LAN print API, by result")
+
+def orders_in(body):
+    """The payload Pusher carries ({"invoice", "printer"}), a list of them or {"orders": [...]}."""
+    if isinstance(body, list):
+        return body
+    if isinstance(body, dict) and isinstance(body.get("orders"), list):
+        return body["orders"]
+    return [body]
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    import ipaddress
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+class LanPrintApi:
+    """
+    POST /print takes the same payload as the NewOrderComanda event, or a batch of them,
+    and hands each one to `submit(payload, received_at)` (the listener's process_payload),
+    which returns how many tickets it queued. Orders go through the spool like Pusher
+    ones, so the invoice `code` is the idempotency key for both paths: an order that
+    arrives from the POS and from Pusher prints once, whichever comes first.
+    Connections are HTTP/1.1 keep-alive, so a POS pays the TCP handshake once.
+    Without a token it only listens on loopback.
+    """
+
+    def __init__(self, submit, host=None, port=None, token=None):
+        from http.server import ThreadingHTTPServer
+        self.submit = submit
+        self.token = LAN_API_TOKEN if token is None else token
+        host = LAN_API_HOST if host is None else host
+        port = LAN_API_PORT if port is None else port
+        if not self.token and not is_loopback(host):
+            raise ValueError(f"refusing to listen on {host or '0.0.0.0'} without lan_api_token")
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+
+    def start(self):
+        thread = threading.Thread(target=self.httpd.serve_forever, name="lan-api", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def handle(self, body, received_at):
+        """Returns (status, result) with one {"code", "status", "tickets"} entry per order."""
+        results = []
+        for order in orders_in(body):
+            invoice = order.get("invoice") if isinstance(order, dict) else None
+            code = invoice.get("code") if isinstance(invoice, dict) else None
+            try:
+                if not isinstance(invoice, dict) or not invoice:
+                    raise ValueError("order without invoice")
+                tickets = self.submit(order, received_at)
+                result = {"code": code, "status": "queued" if tickets else "duplicate", "tickets": tickets}
+            except Exception as e:
+                log_event("lan_order_failed", f"[X] LAN order {code} rejected: {e}", level="error",
+                          code=code, error=str(e))
+                result = {"code": code, "status": "error", "error": str(e)}
+            registry.inc("lan_orders_total", result=result["status"])
+            results.append(result)
+        failed = any(r["status"] == "error" for r in results)
+        return (400 if failed and len(results) == 1 else 200), {"orders": results}
+
+    def _handler(self):
+        from http.server import BaseHTTPRequestHandler
+        api = self
+
+        class LanHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+            disable_nagle_algorithm = True  # cabeceras y cuerpo van en dos writes: sin esto el ACK diferido suma ~40 ms
+            timeout = KEEPALIVE_TIMEOUT
+
+            def _send(self, status, result):
+                body = fastjson.dumps(result).encode()
+                self.send_response(status)
+                if self.close_connection:
+                    self.send_header("Connection", "close")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] == "/health":
+                    self._send(200, {"ok": True})
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def do_POST(self):
+                received_at = time.monotonic()
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                except ValueError:
+                    length = -1
+                # los rechazos no leen el cuerpo (puede ser enorme) y cierran la conexión,
+                # que sin leerlo ya no se sabe dónde empieza el pedido siguiente
+                if length < 0:
+                    self._reject(400, "invalid Content-Length", 0)
+                elif length > MAX_BODY:
+                    self._reject(413, "body too large", length)
+                elif self.path.split("?", 1)[0] != "/print":
+                    self._reject(404, "not found", length)
+                elif api.token and self.headers.get("Authorization") != f"Bearer {api.token}":
+                    self._reject(401, "invalid token", length)
+                else:
+                    self._print(length, received_at)
+
+            def _reject(self, status, error, length):
+                self.close_connection = True
+                self._send(status, {"error": error})
+                # cerrar con datos sin leer manda un RST que puede pisar la respuesta: se descarta
+                # lo que ya esté llegando de un cuerpo chico, sin esperar al resto
+                try:
+                    self.connection.settimeout(0.2)
+                    self.rfile.read(min(length, DRAIN_MAX))
+                except OSError:
+                    pass
+
+            def _print(self, length, received_at):
+                try:
+                    body = fastjson.loads(self.rfile.read(length))
+                except ValueError:
+                    self._send(400, {"error": "invalid JSON"})
+                    return
+                self._send(*api.handle(body, received_at))
+
+            def log_message(self, format, *args):
+                pass
+
+        return LanHandler
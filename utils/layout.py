@@ -0,0 +1,188 @@
+# layout.py
+import string
+import textwrap
+
+PAPERS = {
+    # ancho en caracteres, columnas del detalle (cantidad x precio | importe) y ancho del QR en puntos
+    "58mm": {"width": 32, "item_cols": (19, 10), "total_width": 22, "qr_dots": 288},
+    "80mm": {"width": 48, "item_cols": (30, 18), "total_width": 41, "qr_dots": 384},
+}
+
+# Estilos (align, bold, alto). Se comparten entre filas para no crear tuplas al renderizar.
+NORMAL = ("left", False, 1)
+CENTER = ("center", False, 1)
+TITLE = ("center", True, 1)
+BIG = ("left", True, 2)
+
+FILTERS = {
+    "upper": "str({}).upper()",
+    "float": "float({})",
+}
+
+# --- Especificación declarativa ---
+#
+# Los campos usan la sintaxis de str.format: "{company.name|upper}", "{total|float:>22.2f}",
+# "{fields.income_brut|default=---}". El primer segmento de la ruta es la variable de un
+# Each, un nombre de `extras` o, si no, una clave de la factura.
+
+class Text:
+    def __init__(self, template, when=None, style=NORMAL, wrap=False):
+        self.template = template
+        self.when = when
+        self.style = style
+        self.wrap = wrap
+
+class Columns:
+    def __init__(self, *cells, when=None, style=NORMAL):
+        self.cells = cells  # (template, width, "<" | ">")
+        self.when = when
+        self.style = style
+
+class Separator:
+    def __init__(self, when=None):
+        self.when = when
+
+class Feed:
+    def __init__(self, lines=3, when=None):
+        self.lines = lines
+        self.when = when
+
+class Each:
+    def __init__(self, path, rows, name="item", prepare=None, when=None):
+        self.path = path
+        self.rows = rows
+        self.name = name
+        self.prepare = prepare
+        self.when = when
+
+# --- Compilación ---
+
+class _Compiler:
+    """Turns a row spec into the source of a single render function."""
+
+    def __init__(self, width, extras):
+        self.width = width
+        self.bound = set(extras)
+        self.consts = {"_E": {}, "_N": NORMAL, "_wrap": wrap_lines}
+        self.lines = []
+
+    def const(self, value):
+        name = f"_c{len(self.consts)}"
+        self.consts[name] = value
+        return name
+
+    def path(self, path, default="''"):
+        """'company.name' -> data.get('company', _E).get('name', '')"""
+        head, *rest = path.split(".")
+        if head in self.bound:
+            expr, keys = head, rest
+        else:
+            expr, keys = "data", [head] + rest
+        for key in keys[:-1]:
+            expr = f"{expr}.get({key!r}, _E)"
+        return f"{expr}.get({keys[-1]!r}, {default})" if keys else expr
+
+    def field(self, field, spec):
+        path, *filters = field.split("|")
+        default = "''"
+        wrappers = []
+        for f in filters:
+            if f.startswith("default="):
+                default = repr(f[len("default="):])
+            else:
+                wrappers.append(FILTERS[f])
+        expr = self.path(path, default)
+        for w in wrappers:
+            expr = w.format(expr)
+        return "{" + expr + (":" + spec if spec else "") + "}"
+
+    def template(self, template):
+        parts = []
+        for literal, field, spec, _ in string.Formatter().parse(template):
+            parts.append(literal.replace("{", "{{").replace("}", "}}"))
+            if field is not None:
+                parts.append(self.field(field, spec))
+        return "f" + repr("".join(parts))
+
+    def condition(self, when):
+        whens = (when,) if isinstance(when, str) else when
+        return " and ".join(self.path(w, "None") for w in whens)
+
+    def emit(self, code, indent):
+        self.lines.append("    " * indent + code)
+
+    def rows(self, rows, indent):
+        # Filas consecutivas con la misma condición comparten un solo `if`
+        group, when = [], None
+        for row in list(rows) + [None]:
+            if row is not None and group and row.when == when:
+                group.append(row)
+                continue
+            if group:
+                if when is not None:
+                    self.emit(f"if {self.condition(when)}:", indent)
+                for r in group:
+                    self.row(r, indent + (when is not None))
+            group, when = [row], getattr(row, "when", None)
+
+    def row(self, row, indent):
+        if isinstance(row, Separator):
+            self.emit(f"append(({'-' * self.width!r}, _N))", indent)
+        elif isinstance(row, Feed):
+            self.emit(f"append(({chr(10) * row.lines!r}, _N))", indent)
+        elif isinstance(row, Text):
+            style = self.const(row.style)
+            if row.wrap:
+                self.emit(f"_t = {self.template(row.template)}", indent)
+                self.emit(f"append((_t, {style})) if len(_t) <= {self.width} else _wrap(_t, {self.width}, {style}, out)", indent)
+            else:
+                self.emit(f"append(({self.template(row.template)}, {style}))", indent)
+        elif isinstance(row, Columns):
+            cells = " + ".join(
+                f"{self.template(t)}.{'ljust' if align == '<' else 'rjust'}({w})" for t, w, align in row.cells)
+            self.emit(f"append(({cells}, {self.const(row.style)}))", indent)
+        elif isinstance(row, Each):
+            self.emit(f"for {row.name} in {self.path(row.path, 'None')} or ():", indent)
+            if row.prepare:
+                self.emit(f"{row.name} = {self.const(row.prepare)}({row.name})", indent + 1)
+            added = row.name not in self.bound
+            self.bound.add(row.name)
+            self.rows(row.rows, indent + 1)
+            if added:
+                self.bound.discard(row.name)
+        else:
+            raise TypeError(f"Unknown layout row: {row!r}")
+
+def wrap_lines(text, width, style, out):
+    if len(text) <= width:
+        out.append((text, style))
+    else:
+        out.extend((part, style) for part in textwrap.wrap(text, width) or [""])
+
+def compile_layout(rows, width, extras=()):
+    """Generates and compiles `render(data, out, *extras)` for a row spec. Returns (function, source)."""
+    c = _Compiler(width, extras)
+    c.emit(f"def render({', '.join(('data', 'out') + tuple(extras))}):", 0)
+    c.emit("append = out.append", 1)
+    c.rows(rows, 1)
+    source = "\n".join(c.lines)
+    namespace = dict(c.consts)
+    exec(compile(source, "<layout>", "exec"), namespace)
+    return namespace["render"], source
+
+class CompiledLayout:
+    """A layout compiled once into a plain Python function that appends (line, style) tuples."""
+
+    def __init__(self, rows, width, extras=()):
+        self.width = width
+        self.extras = tuple(extras)
+        self._render, self.source = compile_layout(rows, width, self.extras)
+
+    def render(self, data, **extra):
+        """Returns [(line, style), ...] for one invoice."""
+        out = []
+        self._render(data, out, **extra)
+        return out
+
+    def render_text(self, data, **extra):
+        return "\n".join([line for line, _ in self.render(data, **extra)])
@@ -0,0 +1,284 @@
+# metrics.py — latencias, contadores, endpoint estilo Prometheus y log JSON-lines
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+METRICS_HOST = "127.0.0.1"   # solo local; "0.0.0.0" para scrapear desde otra máquina
+METRICS_PORT = 9464
+WINDOW = 1024                # muestras recientes por serie para p50/p95/p99
+QUANTILES = (0.5, 0.95, 0.99)
+
+LOG_FILE = "printer.log.jsonl"  # None = solo consola
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format(name, labels, value, extra=()):
+    pairs = list(labels) + list(extra)
+    if pairs:
+        name += "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+    return f"{name} {value:.6g}" if isinstance(value, float) else f"{name} {value}"
+
+def quantile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class Summary:
+    """Count and sum since start, quantiles over the last `window` observations."""
+    __slots__ = ("count", "sum", "max", "samples")
+
+    def __init__(self, window=WINDOW):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def quantiles(self, qs=QUANTILES):
+        ordered = sorted(self.samples)
+        return {q: quantile(ordered, q) for q in qs}
+
+class Registry:
+    """
+    Thread-safe counters and latency summaries keyed by name + labels.
+    Gauges are read on scrape from callbacks returning [(name, labels, value)],
+    so queue depths and client stats are never stale.
+    """
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.counters = {}
+        self.summaries = {}
+        self._gauges = []
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            summary = self.summaries.get(key)
+            if summary is None:
+                summary = self.summaries[key] = Summary(self.window)
+            summary.observe(seconds)
+
+    def gauge(self, fn):
+        self._gauges.append(fn)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Times the block into the `name` summary (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def _gauge_values(self):
+        values = []
+        for fn in self._gauges:
+            try:
+                values.extend((name, _labels(labels), value) for name, labels, value in fn())
+            except Exception as e:
+                print(f"[X] Metrics gauge failed: {e}")
+        return values
+
+    def snapshot(self):
+        """Plain dict of everything, for the JSON endpoint and benchmarks."""
+        with self._lock:
+            counters = dict(self.counters)
+            summaries = {key: (s.count, s.sum, s.max, s.quantiles()) for key, s in self.summaries.items()}
+        result = {"counters": [], "summaries": [], "gauges": []}
+        for (name, labels), value in sorted(counters.items()):
+            result["counters"].append({"name": name, "labels": dict(labels), "value": value})
+        for (name, labels), (count, total, peak, qs) in sorted(summaries.items()):
+            result["summaries"].append({"name": name, "labels": dict(labels), "count": count, "sum": total,
+                                        "max": peak, **{f"p{int(q * 100)}": v for q, v in qs.items()}})
+        for name, labels, value in self._gauge_values():
+            result["gauges"].append({"name": name, "labels": dict(labels), "value": value})
+        return result
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            summaries = sorted((key, (s.count, s.sum, s.quantiles())) for key, s in self.summaries.items())
+        out = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                if name in self._help:
+                    out.append(f"# HELP {name} {self._help[name]}")
+                out.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            out.append(_format(name, labels, value))
+        for (name, labels), (count, total, qs) in summaries:
+            header(name, "summary")
+            for q, v in qs.items():
+                out.append(_format(name, labels, v, (("quantile", str(q)),)))
+            out.append(_format(name + "_sum", labels, total))
+            out.append(_format(name + "_count", labels, count))
+        for name, labels, value in sorted(self._gauge_values(), key=lambda g: (g[0], g[1])):
+            header(name, "gauge")
+            out.append(_format(name, labels, value))
+        return "\n".join(out) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.summaries.clear()
+
+registry = Registry()
+span = registry.span
+
+registry.describe("order_to_paper_seconds", "Pusher message received until the printer accepted the bytes")
+registry.describe("print_stage_seconds", "Time per pipeline stage (decode, render, qr, encode, send)")
+registry.describe("print_queue_wait_seconds", "Time a ticket waited in its printer queue")
+registry.describe("print_bytes_total", "ESC/POS bytes handed to each printer")
+registry.describe("print_jobs_total", "Tickets finished per printer and result")
+
+# --- log JSON-lines ---
+
+_logger = None
+_logger_lock = threading.Lock()
+
+def _get_logger():
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            _logger = logging.getLogger("printer.events")
+            _logger.propagate = False
+            _logger.setLevel(logging.INFO)
+            if LOG_FILE:
+                try:
+                    handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS,
+                                                  encoding="utf-8")
+                    handler.setFormatter(logging.Formatter("%(message)s"))
+                    _logger.addHandler(handler)
+                except OSError as e:
+                    print(f"[X] Cannot open {LOG_FILE}: {e}")
+        return _logger
+
+def log_event(event, message=None, level="info", **fields):
+    """
+    Writes one JSON line ({"ts", "level", "event", ...fields}) to LOG_FILE and
+    echoes `message` to the console, keeping the usual "[✓]"/"[X]" output.
+    """
+    if message:
+        print(message)
+    record = {"ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), "level": level, "event": event}
+    record.update(fields)
+    logger = _get_logger()
+    if logger.handlers:
+        logger.log(logging.ERROR if level == "error" else logging.INFO, json.dumps(record, default=str))
+
+# --- endpoint HTTP ---
+
+def _handler_class(registry, routes):
+    from http.server import BaseHTTPRequestHandler  # ~20 ms de import, solo si se sirve el endpoint
+    from urllib.parse import parse_qsl
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def _route(self, method):
+            path, _, query = self.path.partition("?")
+            handler = routes.get((method, path))
+            if handler is None:
+                self.send_error(404)
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length > 0 else None
+            except ValueError:
+                self.send_error(400, "invalid JSON")
+                return
+            try:
+                status, result = handler(dict(parse_qsl(query)), body)
+            except (ValueError, TypeError) as e:
+                status, result = 400, {"error": str(e)}  # parámetro inválido, p. ej. ?limit=abc
+            except Exception as e:
+                log_event("route_failed", f"[X] {method} {path} failed: {e}", level="error", path=path, error=str(e))
+                status, result = 500, {"error": str(e)}
+            self._send(status, json.dumps(result, default=str, ensure_ascii=False).encode(), "application/json")
+
+        def _send(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/metrics":
+                body, content_type = registry.render().encode(), "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/metrics.json":
+                body, content_type = json.dumps(registry.snapshot(), default=str).encode(), "application/json"
+            else:
+                self._route("GET")
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            self._route("POST")
+
+        def log_message(self, format, *args):
+            pass  # sin ruido en consola por cada scrape
+
+    return MetricsHandler
+
+# Endpoints locales extra: {("GET", "/history"): fn(query, body) -> (status, objeto JSON)}
+routes = {}
+
+class MetricsServer:
+    """
+    Serves /metrics (Prometheus text), /metrics.json and the local `routes`
+    (history, reprint...) on a background thread.
+    """
+
+    def __init__(self, host=None, port=None, registry=registry, routes=routes):
+        from http.server import ThreadingHTTPServer
+        host = METRICS_HOST if host is None else host
+        port = METRICS_PORT if port is None else port
+        self.httpd = ThreadingHTTPServer((host, port), _handler_class(registry, routes))
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+
+    def start(self):
+        thread = threading.Thread(target=self.httpd.serve_forever, name="metrics", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -1,6 +1,16 @@
+import ipaddress
+import os
 import socket
-import threading
-import win32print
+import subprocess
+import time
+
+PRINTER_PORTS = (9100, 515, 631)  # RAW/JetDirect, LPD, IPP
+PORT_BACKENDS = {9100: "raw", 515: "lpd", 631: "ipp"}
+SCAN_TIMEOUT = 0.3
+SCAN_CONCURRENCY = 256
+
+# Estadísticas del último barrido (hosts, probes, found, elapsed...)
+last_scan_stats = {}
 
 def get_local_ip():
     try:
@@ -12,6 +22,33 @@ def get_local_ip():
     except:
         return None
 
+def get_local_ips():
+    """Returns the IPv4 addresses of every non-loopback interface we can find."""
+    ips = []
+    primary = get_local_ip()
+    if primary:
+        ips.append(primary)
+    try:
+        for ip in socket.gethostbyname_ex(socket.gethostname())[2]:
+            if ip not in ips and not ip.startswith("127."):
+                ips.append(ip)
+    except OSError:
+        pass
+    return ips
+
+def local_networks(prefix=24):
+    return [str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False)) for ip in get_local_ips()]
+
+def iter_hosts(networks):
+    seen = set()
+    for net in networks:
+        net = ipaddress.ip_network(net, strict=False)
+        hosts = [net.network_address] if net.num_addresses == 1 else net.hosts()
+        for ip in hosts:
+            if ip not in seen:
+                seen.add(ip)
+                yield str(ip)
+
 def is_ip_open(ip, port=9100, timeout=0.3):
     try:
         with socket.socket() as sock:
@@ -21,25 +58,83 @@ def is_ip_open(ip, port=9100, timeout=0.3):
     except:
         return False
 
-def scan_network_printers():
-    base_ip = get_local_ip()
-    if not base_ip:
-        return []
+async def probe(ip, port, timeout=SCAN_TIMEOUT):
+    import asyncio
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
 
-    subnet = ".".join(base_ip.split(".")[:3]) + "."
-    results = []
+async def scan_hosts(hosts, ports=PRINTER_PORTS, timeout=SCAN_TIMEOUT, concurrency=SCAN_CONCURRENCY, expected=None):
+    """
+    Probes every (host, port) pair with at most `concurrency` connects in flight.
+    Returns {ip: port} using the first port (in `ports` order) that answered.
+    If `expected` is given, stops as soon as all of those IPs were found.
+    """
+    import asyncio
+    expected = set(expected or ())
+    found = {}
+    stats = {"probes": 0}
+    rank = {port: i for i, port in reversed(list(enumerate(ports)))}
+    pending = ((ip, port) for ip in hosts for port in ports)
 
-    def worker(ip):
-        if is_ip_open(ip):
-            results.append({"name": f"Network Printer ({ip})", "identifier": ip, "type": "network"})
+    async def worker():
+        for ip, port in pending:
+            if expected and expected <= found.keys():
+                return
+            if ip in found and rank[found[ip]] <= rank[port]:
+                continue
+            stats["probes"] += 1
+            # los puertos de un host se prueban a la vez: gana el primero de `ports`, no el que contestó antes
+            if await probe(ip, port, timeout) and (ip not in found or rank[port] < rank[found[ip]]):
+                found[ip] = port
 
-    threads = [threading.Thread(target=worker, args=(f"{subnet}{i}",)) for i in range(1, 255)]
-    for t in threads: t.start()
-    for t in threads: t.join()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return found, stats["probes"]
 
-    return results
+def scan_network_printers(networks=None, ports=PRINTER_PORTS, timeout=SCAN_TIMEOUT,
+                          concurrency=SCAN_CONCURRENCY, expected=None):
+    networks = networks or local_networks()
+    if not networks:
+        return []
 
-def detect_local_printers():
-    return [{"name": p[2], "identifier": p[2], "type": "local"} for p in win32print.EnumPrinters(2)]
+    import asyncio  # ~40 ms de import: solo cuando realmente se escanea
+    hosts = list(iter_hosts(networks))
+    start = time.perf_counter()
+    found, probes = asyncio.run(scan_hosts(hosts, ports, timeout, concurrency, expected))
+    elapsed = time.perf_counter() - start
 
+    last_scan_stats.clear()
+    last_scan_stats.update({
+        "networks": list(networks),
+        "hosts": len(hosts),
+        "probes": probes,
+        "found": len(found),
+        "concurrency": concurrency,
+        "early_exit": bool(expected) and set(expected) <= found.keys(),
+        "elapsed": elapsed,
+    })
+    print(f"[🌐] Scanned {len(hosts)} hosts ({probes} probes) in {elapsed:.2f}s, found {len(found)} printers.")
 
+    return [
+        {"name": f"Network Printer ({ip})", "identifier": ip, "type": "network", "port": port,
+         "backend": PORT_BACKENDS.get(port, "raw")}
+        for ip, port in sorted(found.items(), key=lambda item: ipaddress.ip_address(item[0]))
+    ]
+
+def detect_local_printers():
+    if os.name == "nt":
+        import win32print
+        return [{"name": p[2], "identifier": p[2], "type": "local", "backend": "windows"}
+                for p in win32print.EnumPrinters(2)]
+    try:
+        res = subprocess.run(["lpstat", "-e"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        return []
+    return [{"name": q, "identifier": q, "type": "local", "backend": "cups"} for q in res.stdout.split()]
@@ -0,0 +1,330 @@
+# passive.py — descubrimiento sin barrer la red: caché ARP, mDNS/DNS-SD y SNMP
+import ipaddress
+import os
+import re
+import socket
+import struct
+import subprocess
+import time
+from utils.network import PORT_BACKENDS, PRINTER_PORTS, SCAN_TIMEOUT, local_networks, scan_hosts
+
+MDNS_ADDR = ("224.0.0.251", 5353)
+MDNS_SERVICES = ("_pdl-datastream._tcp.local", "_ipp._tcp.local", "_printer._tcp.local")
+SERVICE_BACKENDS = {"_pdl-datastream._tcp.local": "raw", "_printer._tcp.local": "lpd", "_ipp._tcp.local": "ipp"}
+MDNS_TIMEOUT = 0.6
+
+SNMP_PORT = 161
+SNMP_COMMUNITY = "public"
+SNMP_TIMEOUT = 0.6
+SYS_DESCR = "1.3.6.1.2.1.1.1.0"
+SYS_NAME = "1.3.6.1.2.1.1.5.0"
+HR_DEVICE_DESCR = "1.3.6.1.2.1.25.3.2.1.3.1"   # modelo, en las que implementan la Host/Printer MIB
+
+# Ancho de papel a partir del modelo (None si no se sabe)
+PAPER_HINTS = (
+    (re.compile(r"TM-?(m10|P20|P60|T70)|\b58\s?mm|POS-?58", re.I), "58mm"),
+    (re.compile(r"TM-?(T20|T8\d|T88|m30|m50|U220|L90)|TSP\d{3}|\b80\s?mm|POS-?80", re.I), "80mm"),
+)
+ESCPOS_HINTS = re.compile(r"TM-|TSP|Epson|Star Micronics|Xprinter|Bixolon|SRP-|Citizen|CT-S|POS|thermal|receipt",
+                          re.I)
+
+# --- caché ARP / vecinos ---
+
+ARP_LINE = re.compile(r"(\d{1,3}(?:\.\d{1,3}){3})\)?\s+(?:\S+\s+\S+\s+)??(?:at\s+)?"
+                      r"([0-9a-fA-F]{1,2}(?:[:-][0-9a-fA-F]{1,2}){5})")
+
+def parse_arp(text):
+    """{ip: mac} from /proc/net/arp, `arp -a` (Windows) or `arp -an` (macOS/BSD) output."""
+    neighbors = {}
+    for line in text.splitlines():
+        if "incomplete" in line or " 0x0 " in line:
+            continue
+        m = ARP_LINE.search(line)
+        if not m:
+            continue
+        ip, mac = m.group(1), m.group(2).lower().replace("-", ":")
+        if mac in ("00:00:00:00:00:00", "ff:ff:ff:ff:ff:ff") or ipaddress.ip_address(ip).is_multicast:
+            continue
+        neighbors[ip] = mac
+    return neighbors
+
+def arp_neighbors():
+    """Hosts the OS already talked to: no packet is sent."""
+    try:
+        if os.path.exists("/proc/net/arp"):
+            with open("/proc/net/arp", "r") as f:
+                return parse_arp(f.read())
+        res = subprocess.run(["arp", "-a"] if os.name == "nt" else ["arp", "-an"],
+                             capture_output=True, text=True, timeout=3)
+        return parse_arp(res.stdout)
+    except (OSError, subprocess.TimeoutExpired):
+        return {}
+
+# --- mDNS / DNS-SD ---
+
+def _encode_name(name):
+    return b"".join(bytes([len(label)]) + label.encode() for label in name.split(".") if label) + b"\x00"
+
+def _read_name(data, offset):
+    labels, end = [], None
+    for _ in range(128):  # corta punteros en bucle
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(data[offset:offset + length].decode("utf-8", "replace"))
+        offset += length
+    return ".".join(labels), end if end is not None else offset
+
+def mdns_query(services=MDNS_SERVICES):
+    """PTR questions with the unicast-response bit, so answers come back to our own port."""
+    questions = b"".join(_encode_name(s) + struct.pack(">HH", 12, 0x8001) for s in services)
+    return struct.pack(">HHHHHH", 0, 0, len(services), 0, 0, 0) + questions
+
+def parse_mdns(data):
+    """Returns the records of one DNS message as [(name, type, value)] (PTR, SRV, TXT and A only)."""
+    _, _, qd, an, ns, ar = struct.unpack(">HHHHHH", data[:12])
+    offset = 12
+    for _ in range(qd):
+        offset = _read_name(data, offset)[1] + 4
+    records = []
+    for _ in range(an + ns + ar):
+        name, offset = _read_name(data, offset)
+        rtype, _, _, length = struct.unpack(">HHIH", data[offset:offset + 10])
+        offset += 10
+        rdata = data[offset:offset + length]
+        if rtype == 12:
+            records.append((name, "PTR", _read_name(data, offset)[0]))
+        elif rtype == 33:
+            port = struct.unpack(">H", rdata[4:6])[0]
+            records.append((name, "SRV", (port, _read_name(data, offset + 6)[0])))
+        elif rtype == 16:
+            txt, i = {}, 0
+            while i < len(rdata):
+                item = rdata[i + 1:i + 1 + rdata[i]].decode("utf-8", "replace")
+                key, _, value = item.partition("=")
+                txt[key.lower()] = value
+                i += 1 + rdata[i]
+            records.append((name, "TXT", txt))
+        elif rtype == 1 and length == 4:
+            records.append((name, "A", socket.inet_ntoa(rdata)))
+        offset += length
+    return records
+
+def mdns_browse(addr=MDNS_ADDR, timeout=MDNS_TIMEOUT, services=MDNS_SERVICES):
+    """
+    Asks for printer services over mDNS and collects answers for `timeout` seconds.
+    Returns {ip: {"port", "backend", "name", "txt"}}, preferring the raw 9100 service.
+    """
+    records = []
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 255)
+        sock.settimeout(0.1)
+        try:
+            sock.sendto(mdns_query(services), addr)
+        except OSError:
+            return {}
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                data, (source, _) = sock.recvfrom(9000)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                records += [(source, *r) for r in parse_mdns(data)]
+            except (struct.error, IndexError):
+                pass  # paquete truncado o de otra cosa
+    addresses = {name: value for _, name, kind, value in records if kind == "A"}
+    txts = {name: value for _, name, kind, value in records if kind == "TXT"}
+    services = {value: name for _, name, kind, value in records if kind == "PTR"}
+    order = {s: i for i, s in enumerate(SERVICE_BACKENDS)}
+    found = {}
+    for source, name, kind, value in sorted(records, key=lambda r: order.get(services.get(r[1]), 9)):
+        if kind != "SRV":
+            continue
+        port, target = value
+        ip = addresses.get(target, source)
+        service = services.get(name) or name.split(".", 1)[-1]
+        found.setdefault(ip, {"port": port, "backend": SERVICE_BACKENDS.get(service, "raw"),
+                              "name": name.split("._", 1)[0], "txt": txts.get(name, {})})
+    return found
+
+# --- SNMP (v2c, GET de sysDescr/sysName/hrDeviceDescr) ---
+
+def _ber(tag, payload):
+    n = len(payload)
+    if n < 0x80:
+        return bytes([tag, n]) + payload
+    size = n.to_bytes((n.bit_length() + 7) // 8, "big")
+    return bytes([tag, 0x80 | len(size)]) + size + payload
+
+def _ber_int(value):
+    return _ber(0x02, value.to_bytes(max(1, (value.bit_length() + 8) // 8), "big", signed=True))
+
+def _ber_oid(oid):
+    parts = [int(p) for p in oid.split(".")]
+    out = bytearray([40 * parts[0] + parts[1]])
+    for part in parts[2:]:
+        chunk = [part & 0x7F]
+        while part > 0x7F:
+            part >>= 7
+            chunk.append(0x80 | (part & 0x7F))
+        out += bytes(reversed(chunk))
+    return _ber(0x06, bytes(out))
+
+def _ber_read(data, offset):
+    """Returns (tag, value bytes, next offset)."""
+    tag, length = data[offset], data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        size = length & 0x7F
+        length = int.from_bytes(data[offset:offset + size], "big")
+        offset += size
+    return tag, data[offset:offset + length], offset + length
+
+def _oid_str(raw):
+    parts, value = [raw[0] // 40, raw[0] % 40], 0
+    for byte in raw[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            parts.append(value)
+            value = 0
+    return ".".join(map(str, parts))
+
+def snmp_get_request(oids, request_id=1, community=None):
+    community = SNMP_COMMUNITY if community is None else community
+    varbinds = b"".join(_ber(0x30, _ber_oid(oid) + b"\x05\x00") for oid in oids)
+    pdu = _ber(0xA0, _ber_int(request_id) + _ber_int(0) + _ber_int(0) + _ber(0x30, varbinds))
+    return _ber(0x30, _ber_int(1) + _ber(0x04, community.encode()) + pdu)
+
+def parse_snmp_response(data):
+    """{oid: text} for every OCTET STRING in a GetResponse; missing objects are left out."""
+    _, message, _ = _ber_read(data, 0)
+    offset = _ber_read(message, 0)[2]       # versión
+    offset = _ber_read(message, offset)[2]  # comunidad
+    tag, pdu, _ = _ber_read(message, offset)
+    if tag != 0xA2:
+        return {}
+    offset = 0
+    for _ in range(3):                      # request-id, error-status, error-index
+        offset = _ber_read(pdu, offset)[2]
+    _, varbinds, _ = _ber_read(pdu, offset)
+    values, offset = {}, 0
+    while offset < len(varbinds):
+        _, varbind, offset = _ber_read(varbinds, offset)
+        _, oid, rest = _ber_read(varbind, 0)
+        tag, value, _ = _ber_read(varbind, rest)
+        if tag == 0x04:
+            values[_oid_str(oid)] = value.decode("utf-8", "replace").strip("\x00 \r\n")
+    return values
+
+def snmp_sweep(hosts, port=SNMP_PORT, timeout=SNMP_TIMEOUT, community=None):
+    """
+    One GET per host (and per subnet broadcast address in `hosts`) on a single UDP
+    socket; whoever answers within `timeout` is returned as {ip: {oid: text}}.
+    """
+    request = snmp_get_request((SYS_DESCR, SYS_NAME, HR_DEVICE_DESCR), community=community)
+    answers = {}
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.settimeout(0.1)
+        for host in hosts:
+            try:
+                sock.sendto(request, (host, port))
+            except OSError:
+                pass
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                data, (source, _) = sock.recvfrom(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                values = parse_snmp_response(data)
+            except (IndexError, ValueError):
+                continue
+            if values:
+                answers[source] = values
+    return answers
+
+# --- enriquecido ---
+
+def model_info(model):
+    """(paper, escpos) guessed from a model string; None when it can't be told."""
+    paper = next((p for pattern, p in PAPER_HINTS if model and pattern.search(model)), None)
+    escpos = True if model and ESCPOS_HINTS.search(model) else None
+    return paper, escpos
+
+def printer_record(ip, port, backend, model=None, source="scan", mac=None):
+    paper, escpos = model_info(model)
+    if backend == "ipp" and escpos is None:
+        escpos = False  # por IPP llegan PDF/PWG, no ESC/POS
+    return {"name": model or f"Network Printer ({ip})", "identifier": ip, "type": "network", "port": port,
+            "backend": backend, "model": model, "paper": paper, "escpos": escpos, "mac": mac, "source": source}
+
+def snmp_model(values):
+    """The model from an SNMP answer: hrDeviceDescr, else the first line of sysDescr."""
+    if not values:
+        return None
+    model = values.get(HR_DEVICE_DESCR) or (values.get(SYS_DESCR) or "").split(";")[0].strip()
+    return model.splitlines()[0][:60] if model else None
+
+# Estadísticas de la última búsqueda pasiva (vecinos, respuestas mDNS/SNMP, sondeos TCP...)
+last_passive_stats = {}
+
+def passive_scan(networks=None, neighbors=None, ports=PRINTER_PORTS, mdns_addr=MDNS_ADDR, snmp_port=SNMP_PORT):
+    """
+    Finds printers without sweeping the subnet. Candidates come from the ARP/neighbor
+    cache (`neighbors`, read from the OS when None), mDNS/DNS-SD answers and SNMP
+    replies to a subnet broadcast; mDNS and SNMP listen at the same time. Printers
+    announced over mDNS already carry their port; only the other candidates get the
+    usual TCP probe. Returns enriched records (model, paper, escpos, mac, source).
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    networks = [ipaddress.ip_network(n, strict=False) for n in (networks or local_networks())]
+    if not networks:
+        return []
+
+    def local(ip):
+        address = ipaddress.ip_address(ip)
+        return any(address in net for net in networks)
+
+    start = time.perf_counter()
+    neighbors = {ip: mac for ip, mac in (arp_neighbors() if neighbors is None else neighbors).items() if local(ip)}
+    snmp_targets = [str(net.broadcast_address) for net in networks if net.num_addresses > 2] + list(neighbors)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        mdns_future = executor.submit(mdns_browse, mdns_addr)
+        snmp_future = executor.submit(snmp_sweep, snmp_targets, snmp_port)
+        announced = {ip: info for ip, info in mdns_future.result().items() if local(ip)}
+        snmp = {ip: values for ip, values in snmp_future.result().items() if local(ip)}
+
+    records = {}
+    for ip, info in announced.items():
+        txt = info["txt"]
+        model = txt.get("ty") or txt.get("product", "").strip("()") or snmp_model(snmp.get(ip)) or info["name"]
+        records[ip] = printer_record(ip, info["port"], info["backend"], model, "mdns", neighbors.get(ip))
+
+    unresolved = [ip for ip in dict.fromkeys(list(snmp) + list(neighbors)) if ip not in records]
+    found, probes = asyncio.run(scan_hosts(unresolved, ports, SCAN_TIMEOUT, len(unresolved))) if unresolved else ({}, 0)
+    for ip, port in found.items():
+        records[ip] = printer_record(ip, port, PORT_BACKENDS.get(port, "raw"), snmp_model(snmp.get(ip)),
+                                     "snmp" if ip in snmp else "arp", neighbors.get(ip))
+    elapsed = time.perf_counter() - start
+
+    last_passive_stats.clear()
+    last_passive_stats.update({"networks": [str(n) for n in networks], "neighbors": len(neighbors),
+                               "mdns": len(announced), "snmp": len(snmp), "probed_hosts": len(unresolved),
+                               "probes": probes, "found": len(records), "elapsed": elapsed})
+    print(f"[🌐] Passive discovery: {len(neighbors)} neighbors, {len(announced)} mDNS, {len(snmp)} SNMP answers, "
+          f"{probes} probes in {elapsed:.2f}s, found {len(records)} printers.")
+    return [records[ip] for ip in sorted(records, key=ipaddress.ip_address)]
@@ -1,12 +1,33 @@
-import win32print
-import socket
-from utils.ticket import generate_ticket_text
-from PIL import ImageWin
-import io
-import win32ui
+from utils import render_pool
+from utils.backends import backend_for
+from utils.escpos import DEFAULT_CODEPAGE
+from utils.metrics import log_event, registry, span
+from utils.ticket import generate_ticket_text, generate_ticket_bytes
+
+# Las térmicas locales reciben ESC/POS en crudo; False vuelve al dibujo GDI (drivers que no aceptan RAW)
+LOCAL_RAW = True
+PAPER = "58mm"               # "58mm" o "80mm"
+CODEPAGE = DEFAULT_CODEPAGE
+
+_sent_hooks = []
+
+def on_sent(fn):
+    """Registers fn(invoice, destination, payload), called after each ESC/POS ticket is sent."""
+    _sent_hooks.append(fn)
+
+def _notify_sent(data, destination, payload):
+    for fn in _sent_hooks:
+        try:
+            fn(data, destination, payload)
+        except Exception as e:
+            print(f"[X] Sent hook failed: {e}")
 
 
 def print_ticket(printer_name, content, qr_img=None):
+    import win32print
+    import win32ui
+    from PIL import ImageWin
+
     hPrinter = win32print.OpenPrinter(printer_name)
     hDC = win32ui.CreateDC()
     hDC.CreatePrinterDC(printer_name)
@@ -46,8 +67,8 @@ def print_ticket(printer_name, content, qr_img=None):
         y += 26
 
     if qr_img:
-        qr_size = 300
-        qr_img = qr_img.resize((qr_size, qr_size))
+        # generate_afip_qr ya entrega el QR al tamaño final, sin reescalar
+        qr_size = qr_img.size[0]
         x_centered = (paper_width - qr_size) // 2
         dib = ImageWin.Dib(qr_img)
         dib.draw(hDC.GetHandleOutput(), (x_centered, y + 10, x_centered + qr_size, y + 10 + qr_size))
@@ -60,12 +81,74 @@ def print_ticket(printer_name, content, qr_img=None):
 
     print("[🖨️] Ticket impreso correctamente.")
 
+def render_tickets(invoices):
+    """[(bytes, None) or (None, error)] per invoice; in worker processes when the render pool is running."""
+    if render_pool.active():
+        return render_pool.render_many(invoices, PAPER, CODEPAGE)
+    results = []
+    for data in invoices:
+        try:
+            results.append((generate_ticket_bytes(data, PAPER, CODEPAGE), None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
 def print_invoice(data, destination):
-    content, qr_image = generate_ticket_text(data)
-    if destination.replace(".", "").isdigit():
-        with socket.socket() as s:
-            s.connect((destination, 9100))
-            s.sendall(content.encode("utf-8"))
-        print(f"[🖨️] Ticket enviado por red a {destination}")
-    else:
+    backend = backend_for(destination)
+    if backend.kind == "windows" and not LOCAL_RAW:
+        content, qr_image = generate_ticket_text(data, PAPER)
         print_ticket(destination, content, qr_image)
+    else:
+        if render_pool.active():
+            payload = render_pool.render(data, PAPER, CODEPAGE)
+        else:
+            payload = generate_ticket_bytes(data, PAPER, CODEPAGE)
+        try:
+            with span("print_stage_seconds", stage="send", printer=destination):
+                backend.send(payload)
+        except Exception:
+            registry.inc("print_errors_total", printer=destination, backend=backend.kind)
+            raise
+        registry.inc("print_bytes_total", len(payload), printer=destination)
+        log_event("ticket_sent", f"[🖨️] Ticket enviado a {destination} ({backend.kind})",
+                  printer=destination, backend=backend.kind, code=data.get("code"), bytes=len(payload))
+        _notify_sent(data, destination, payload)
+
+def print_batch(invoices, destination):
+    """
+    Coalesced send: renders every ticket (each ends with its own cut) and writes
+    them to the printer in one go. Returns one error (or None) per invoice; a
+    ticket that fails to render doesn't hold back the rest.
+    """
+    backend = backend_for(destination)
+    if backend.kind == "windows" and not LOCAL_RAW:
+        errors = []
+        for data in invoices:
+            try:
+                print_invoice(data, destination)
+                errors.append(None)
+            except Exception as e:
+                errors.append(e)
+        return errors
+
+    payloads, errors, sent = [], [], []
+    for data, (ticket, error) in zip(invoices, render_tickets(invoices)):
+        errors.append(error)
+        if error is None:
+            payloads.append(ticket)
+            sent.append(data)
+    if payloads:
+        payload = b"".join(payloads)
+        try:
+            with span("print_stage_seconds", stage="send", printer=destination):
+                backend.send(payload)
+        except Exception:
+            registry.inc("print_errors_total", printer=destination, backend=backend.kind)
+            raise
+        registry.inc("print_bytes_total", len(payload), printer=destination)
+        log_event("ticket_sent", f"[🖨️] {len(payloads)} tickets enviados a {destination} ({backend.kind})",
+                  printer=destination, backend=backend.kind, tickets=len(payloads), bytes=len(payload),
+                  codes=[data.get("code") for data in sent])
+        for data, ticket in zip(sent, payloads):
+            _notify_sent(data, destination, ticket)
+    return errors
@@ -0,0 +1,233 @@
+# pusher_client.py — cliente Pusher (protocolo 7) con reconexión y ping/pong
+import hashlib
+import hmac
+import json
+import random
+import socket
+import threading
+import time
+import websocket
+from utils import fastjson
+
+RECONNECT_BASE = 1.0
+RECONNECT_MAX = 60.0
+ACTIVITY_TIMEOUT = 120   # el servidor puede pedir otro valor en connection_established
+PONG_TIMEOUT = 30
+WATCHDOG_INTERVAL = 1.0
+
+def peek_event(message):
+    """Reads the event name from a raw Pusher frame without decoding it (None if not found)."""
+    i = message.find('"event":')
+    if i < 0:
+        return None
+    start = message.find('"', i + 8)
+    end = message.find('"', start + 1)
+    return message[start + 1:end] if start >= 0 and end > start else None
+
+def sign_channel(app_key, app_secret, socket_id, channel):
+    """Pusher private-channel signature, for devices that hold the app secret."""
+    digest = hmac.new(app_secret.encode(), f"{socket_id}:{channel}".encode(), hashlib.sha256).hexdigest()
+    return f"{app_key}:{digest}"
+
+class PusherClient:
+    """
+    Keeps a Pusher connection alive: reconnects with jittered exponential backoff,
+    sends pusher:ping after `activity_timeout` of silence and drops the socket if no
+    answer arrives within `pong_timeout`, and resubscribes every channel on connect.
+
+    `on_event(msg)` receives every non-protocol message (already decoded).
+    `on_resume(since)` is called (in its own thread) after a reconnect, with the
+    time the previous connection was lost, so missed orders can be fetched.
+
+    With `events`, frames whose event name is not in the set are dropped before
+    decoding. Channels starting with "private-" are subscribed with the signature
+    returned by `authorizer(socket_id, channel)`.
+    """
+
+    def __init__(self, url, channels, on_event, on_connected=None, on_resume=None, events=None, authorizer=None,
+                 reconnect_base=RECONNECT_BASE, reconnect_max=RECONNECT_MAX,
+                 activity_timeout=ACTIVITY_TIMEOUT, pong_timeout=PONG_TIMEOUT):
+        self.url = url
+        self.channels = list(channels)
+        self.on_event = on_event
+        self.on_connected = on_connected
+        self.on_resume = on_resume
+        self.events = set(events) if events else None
+        self.authorizer = authorizer
+        self.reconnect_base = reconnect_base
+        self.reconnect_max = reconnect_max
+        self.activity_timeout = activity_timeout
+        self.pong_timeout = pong_timeout
+        self.ws = None
+        self.socket_id = None
+        self.state = "initialized"
+        self.stats = {"connects": 0, "disconnects": 0, "reconnect_attempts": 0, "messages": 0,
+                      "received": 0, "relevant": 0, "filtered": 0,
+                      "pings_sent": 0, "pong_timeouts": 0, "resumes": 0, "last_connected": None}
+        self._attempt = 0
+        self._last_activity = time.monotonic()
+        self._ping_sent_at = None
+        self._disconnected_at = None
+        self._server_timeout = activity_timeout
+
+    # --- conexión ---
+
+    def run(self, stop_event):
+        """Connects and reconnects until `stop_event` is set. Blocks the calling thread."""
+        # un watchdog por llamada, que termina con ella: los reinicios del Supervisor no los acumulan
+        done = threading.Event()
+        watchdog = threading.Thread(target=self._watchdog, args=(stop_event, done), name="pusher-watchdog",
+                                    daemon=True)
+        watchdog.start()
+        try:
+            self._connect_loop(stop_event)
+        finally:
+            done.set()
+        self.state = "disconnected"
+
+    def _connect_loop(self, stop_event):
+        while not stop_event.is_set():
+            self.state = "connecting"
+            self.ws = websocket.WebSocketApp(
+                self.url,
+                on_message=self._on_message,
+                on_error=lambda ws, err: print("[X] WebSocket error:", err),
+                on_close=self._on_close,
+            )
+            self._touch()
+            self.ws.run_forever()
+            if stop_event.is_set():
+                break
+            delay = self.next_delay()
+            self.state = "unavailable"
+            print(f"[↻] Reconnecting to Pusher in {delay:.1f}s.")
+            stop_event.wait(delay)
+
+    def next_delay(self):
+        self._attempt += 1
+        self.stats["reconnect_attempts"] += 1
+        delay = min(self.reconnect_max, self.reconnect_base * 2 ** (self._attempt - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def close(self):
+        """
+        Drops the connection from any thread. The socket is shut down, not closed:
+        WebSocketApp.close() closes it under run_forever's select, which then never wakes.
+        """
+        ws = self.ws
+        if not ws:
+            return
+        ws.keep_running = False
+        sock = ws.sock.sock if ws.sock else None
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def send(self, event, data):
+        self.ws.send(json.dumps({"event": event, "data": data}))
+
+    def subscribe(self, channel):
+        data = {"channel": channel}
+        if channel.startswith("private-"):
+            if not self.authorizer:
+                print(f"[X] No authorizer for private channel {channel}.")
+                return
+            try:
+                data["auth"] = self.authorizer(self.socket_id, channel)
+            except Exception as e:
+                print(f"[X] Failed to authorize {channel}: {e}")
+                return
+        self.send("pusher:subscribe", data)
+
+    # --- callbacks del websocket ---
+
+    def _touch(self):
+        self._last_activity = time.monotonic()
+        self._ping_sent_at = None
+
+    def _on_close(self, ws, code, msg):
+        if self.state == "connected":
+            self.stats["disconnects"] += 1
+            self._disconnected_at = time.time()
+            print(f"[X] WebSocket closed: {msg}")
+        self.state = "unavailable"
+
+    def _on_message(self, ws, message):
+        self._touch()
+        self.stats["messages"] += 1
+        if self.events is not None:
+            event = peek_event(message)
+            if event is not None and not event.startswith("pusher") and event not in self.events:
+                self.stats["received"] += 1
+                self.stats["filtered"] += 1
+                return
+        try:
+            msg = fastjson.loads(message)
+        except ValueError:
+            print(f"[X] Invalid Pusher frame: {message[:80]!r}")
+            return
+        event = msg.get("event", "")
+        if event.startswith("pusher:") or event.startswith("pusher_internal:"):
+            self._on_protocol(event, msg)
+        else:
+            self.stats["received"] += 1
+            if self.events is not None and event not in self.events:
+                self.stats["filtered"] += 1
+                return
+            self.stats["relevant"] += 1
+            self.on_event(msg)
+
+    def _on_protocol(self, event, msg):
+        if event == "pusher:connection_established":
+            data = msg.get("data")
+            data = fastjson.loads(data) if isinstance(data, str) else (data or {})
+            self.socket_id = data.get("socket_id")
+            self._server_timeout = min(self.activity_timeout, data.get("activity_timeout") or self.activity_timeout)
+            self.state = "connected"
+            self._attempt = 0
+            self.stats["connects"] += 1
+            self.stats["last_connected"] = time.time()
+            for channel in self.channels:
+                self.subscribe(channel)
+            print("[✅] Connected to Pusher WebSocket.")
+            first = self.stats["connects"] == 1
+            if self.on_connected:
+                self.on_connected(first)
+            if self._disconnected_at and self.on_resume:
+                since, self._disconnected_at = self._disconnected_at, None
+                self.stats["resumes"] += 1
+                threading.Thread(target=self.on_resume, args=(since,), name="pusher-resume", daemon=True).start()
+        elif event == "pusher:ping":
+            self.send("pusher:pong", {})
+        elif event == "pusher_internal:subscription_succeeded":
+            print(f"[🔔] Subscribed to {msg.get('channel')}.")
+        elif event == "pusher:error":
+            data = msg.get("data") or {}
+            code = data.get("code") if isinstance(data, dict) else None
+            print(f"[X] Pusher error {code}: {data}")
+            if isinstance(code, int) and 4000 <= code < 4100:
+                # errores de aplicación: no insistir rápido
+                self._attempt = max(self._attempt, 10)
+
+    # --- ping/pong ---
+
+    def _watchdog(self, stop_event, done):
+        while not (done.wait(WATCHDOG_INTERVAL) or stop_event.is_set()):
+            if self.state != "connected":
+                continue
+            now = time.monotonic()
+            try:
+                if self._ping_sent_at is None and now - self._last_activity > self._server_timeout:
+                    # antes de mandarlo: un pong rápido lo borra en _touch y no tiene que quedar pisado
+                    self._ping_sent_at = now
+                    self.send("pusher:ping", {})
+                    self.stats["pings_sent"] += 1
+                elif self._ping_sent_at is not None and now - self._ping_sent_at > self.pong_timeout:
+                    print("[X] No pong from Pusher, reconnecting.")
+                    self.stats["pong_timeouts"] += 1
+                    self.close()
+            except Exception as e:
+                print(f"[X] Pusher ping failed: {e}")
+                self.close()
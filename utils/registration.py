@@ -0,0 +1,118 @@
+# registration.py — registro del equipo en Laravel fuera del camino de arranque
+import random
+import threading
+import time
+from utils.api import printers_hash, register_device_to_laravel, register_printer_changes, send_heartbeat
+from utils.backends import supported
+
+RETRY_BASE = 2
+RETRY_MAX = 300
+HEARTBEAT_INTERVAL = 300   # segundos entre latidos (0 = sin latidos)
+
+class DeviceRegistrar:
+    """
+    Registers the device and its printers in the background so a slow or down backend
+    never delays the listener. Failed attempts are retried with jittered exponential
+    backoff; a printer list whose hash was already accepted is never re-sent.
+    Between changes it sends a heartbeat every `heartbeat_interval`; if the backend
+    answers with a different `printers_hash`, the full list is registered again.
+    """
+
+    def __init__(self, cuit, device_id, printers, heartbeat_interval=HEARTBEAT_INTERVAL,
+                 retry_base=RETRY_BASE, retry_max=RETRY_MAX, status=None):
+        self.cuit = cuit
+        self.device_id = device_id
+        self.printers = printers
+        self.heartbeat_interval = heartbeat_interval
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.status = status
+        self.sent_hash = None
+        self.stats = {"registrations": 0, "failures": 0, "skipped": 0, "heartbeats": 0, "heartbeat_failures": 0}
+        self._changes = []   # deltas (added, removed) pendientes de informar
+        self._wake = threading.Event()
+        self._waiter = None
+        self._lock = threading.Lock()
+        self._attempt = 0
+        self._next_heartbeat = 0.0
+
+    def notify_change(self, added, removed, current=None):
+        """PrinterRevalidator on_change hook: only wakes the worker, never blocks discovery."""
+        with self._lock:
+            self._changes.append((added, removed))
+        self._wake.set()
+
+    def next_delay(self):
+        self._attempt += 1
+        delay = min(self.retry_max, self.retry_base * 2 ** (self._attempt - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def sync(self):
+        """One pass: registers if the list changed, else heartbeats when due. Returns seconds to wait."""
+        current = [p for p in list(self.printers) if supported(p)]  # sin backend (IPP) no se anuncian
+        digest = printers_hash(current)
+        with self._lock:
+            changes, self._changes = self._changes, []
+
+        if digest == self.sent_hash:
+            if changes:
+                self.stats["skipped"] += 1
+        else:
+            if self.sent_hash is not None and changes:
+                added = [p for delta in changes for p in delta[0] if supported(p)]
+                removed = [p for delta in changes for p in delta[1] if supported(p)]
+                ok = register_printer_changes(self.cuit, self.device_id, current, added, removed)
+            else:
+                ok = register_device_to_laravel(self.cuit, self.device_id, current)
+            if not ok:
+                self.stats["failures"] += 1
+                with self._lock:
+                    self._changes[:0] = changes
+                return self.next_delay()
+            self._attempt = 0
+            self.sent_hash = digest
+            self.stats["registrations"] += 1
+            self._next_heartbeat = time.monotonic() + self.heartbeat_interval
+
+        if not self.heartbeat_interval:
+            return None
+        wait = self._next_heartbeat - time.monotonic()
+        if wait > 0:
+            return wait
+        answer = send_heartbeat(self.cuit, self.device_id, digest, self.status() if self.status else None)
+        if answer is None:
+            self.stats["heartbeat_failures"] += 1
+            return self.next_delay()
+        self._attempt = 0
+        self.stats["heartbeats"] += 1
+        if answer.get("unsupported"):
+            print("[!] Backend has no heartbeat endpoint, heartbeats disabled.")
+            self.heartbeat_interval = 0
+            return None
+        if answer.get("printers_hash") not in (None, digest):
+            print("[↻] Backend has a different printer list, registering again.")
+            self.sent_hash = None
+            return 0
+        self._next_heartbeat = time.monotonic() + self.heartbeat_interval
+        return self.heartbeat_interval
+
+    def run(self, stop_event):
+        while not stop_event.is_set():
+            self._wake.clear()
+            try:
+                wait = self.sync()
+            except Exception as e:
+                print(f"[X] Device registration failed: {e}")
+                wait = self.next_delay()
+            if wait != 0:
+                self._wake.wait(wait)
+
+    def start(self, stop_event):
+        # stop_event también despierta al hilo para que termine enseguida; uno solo aunque el Supervisor reinicie
+        if self._waiter is None or not self._waiter.is_alive():
+            self._waiter = threading.Thread(target=lambda: (stop_event.wait(), self._wake.set()),
+                                            name="device-registration-waiter", daemon=True)
+            self._waiter.start()
+        thread = threading.Thread(target=self.run, args=(stop_event,), name="device-registration", daemon=True)
+        thread.start()
+        return thread
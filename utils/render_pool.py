@@ -0,0 +1,114 @@
+# render_pool.py — render de tickets ESC/POS en procesos aparte (fuera del GIL del listener)
+import os
+import threading
+from utils.metrics import log_event, registry, span
+
+RENDER_WORKERS = 0      # 0 = se renderiza en el hilo de cada impresora; None = uno por núcleo
+RENDER_TIMEOUT = 30     # segundos; un worker colgado no frena la cola para siempre
+
+_executor = None
+_workers = 0
+_lock = threading.Lock()
+
+def _warm(qr_mode, papers):
+    """Worker initializer: settings from the parent, heavy imports and compiled layouts before the first ticket."""
+    from utils import ticket
+    ticket.QR_MODE = qr_mode
+    if qr_mode == "raster":
+        import qrcode  # lo más pesado de importar: se paga antes de la primera comanda
+    for paper in papers:
+        for kind in ("receipt", "kitchen"):
+            ticket.get_layout(paper, kind)
+
+def _render(data, paper, codepage):
+    from utils.ticket import generate_ticket_bytes
+    # bytes tal cual: un solo pickle de vuelta, sin pasar por str ni base64
+    return generate_ticket_bytes(data, paper, codepage)
+
+def start(workers=None, papers=None):
+    """Starts (or resizes) the pool. Returns the number of workers, 0 when disabled."""
+    global _executor, _workers
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from utils import printer, ticket
+    workers = RENDER_WORKERS if workers is None else workers
+    if workers == 0:
+        return 0
+    workers = workers or os.cpu_count() or 1
+    if _executor is not None and _workers == workers:
+        return workers
+    stop()
+    papers = papers or (printer.PAPER,)
+    # fork copiaría locks tomados por otros hilos del listener; forkserver/spawn arrancan limpios
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    _executor = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_warm,
+                                    initargs=(ticket.QR_MODE, tuple(papers)))
+    _workers = workers
+    # los procesos se crean al primer submit: uno por worker para que arranquen ya y no con la primera comanda
+    try:
+        for future in [_executor.submit(os.getpid) for _ in range(workers)]:
+            future.result(RENDER_TIMEOUT)
+    except Exception as e:
+        print(f"[X] Render workers failed to start ({e}), rendering in-thread.")
+        stop()
+        return 0
+    print(f"[⚙️] Rendering tickets in {workers} worker processes.")
+    return workers
+
+def stop():
+    global _executor, _workers
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor, _workers = None, 0
+
+def active():
+    return _executor is not None
+
+def _broken(executor, e):
+    with _lock:
+        if _executor is not executor:
+            return  # otro hilo ya lo reinició
+        log_event("render_pool_failed", f"[X] Render worker died ({e}), restarting the pool.", level="error",
+                  error=str(e))
+        registry.inc("render_pool_restarts_total")
+        workers = _workers
+        stop()
+        start(workers)
+
+def render_many(invoices, paper, codepage):
+    """
+    Renders every invoice in the pool, in parallel. Returns [(bytes, None) or
+    (None, error)] in order; if the pool breaks, what is left renders in-thread.
+    """
+    from concurrent.futures.process import BrokenProcessPool
+    from utils.ticket import generate_ticket_bytes
+    executor, futures, results = _executor, [], []
+    with span("print_stage_seconds", stage="render_pool", paper=paper):
+        if executor is not None:
+            try:
+                futures = [executor.submit(_render, data, paper, codepage) for data in invoices]
+            except BrokenProcessPool as e:
+                _broken(executor, e)
+            except RuntimeError:
+                pass  # se apagó mientras tanto
+        for future in futures:
+            try:
+                results.append((future.result(RENDER_TIMEOUT), None))
+            except BrokenProcessPool as e:
+                _broken(executor, e)
+                break
+            except Exception as e:
+                results.append((None, e))
+    for data in invoices[len(results):]:
+        try:
+            results.append((generate_ticket_bytes(data, paper, codepage), None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+def render(data, paper, codepage):
+    payload, error = render_many([data], paper, codepage)[0]
+    if error is not None:
+        raise error
+    return payload
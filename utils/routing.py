@@ -0,0 +1,87 @@
+# routing.py — reparto de una comanda entre impresoras de estación (barra, parrilla, cocina...)
+from utils.api import fetch_routes
+from utils.config import load_routes, save_routes
+
+def _names(value):
+    """Category/tag values come as strings, ids or {"id", "name"} objects; returns lowercase keys."""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [key for item in value for key in _names(item)]
+    if isinstance(value, dict):
+        return [str(value[k]).strip().lower() for k in ("name", "slug", "id") if value.get(k) not in (None, "")]
+    return [str(value).strip().lower()]
+
+def product_keys(prod):
+    """Everything a product can be routed by: explicit station, category and tags."""
+    return _names(prod.get("category")) + _names(prod.get("tags"))
+
+class Router:
+    """
+    Maps products to station printers with a table like:
+
+        {"receipt": true,
+         "stations": {"barra": {"printer": "192.168.0.51", "categories": ["bebidas"], "tags": ["bar"]},
+                      "parrilla": {"printer": "192.168.0.52", "categories": ["carnes"]}},
+         "default_station": null}
+
+    A product goes to its explicit `station` field, else to the first station that
+    lists one of its categories or tags, else to `default_station` (None = receipt only).
+    With `receipt` (default) the full ticket still prints on the order's printer.
+    """
+
+    def __init__(self, table=None):
+        self.update(table or {})
+
+    def update(self, table):
+        stations = table.get("stations") or {}
+        index = {}
+        for name, station in stations.items():
+            for key in _names(station.get("categories")) + _names(station.get("tags")):
+                index.setdefault(key, name)
+        self.table = table
+        self.stations = stations
+        self.receipt = table.get("receipt", True)
+        self.default_station = table.get("default_station")
+        self._index = index
+
+    def station_for(self, prod):
+        station = prod.get("station")
+        if station in self.stations:
+            return station
+        for key in product_keys(prod):
+            station = self._index.get(key)
+            if station:
+                return station
+        return self.default_station if self.default_station in self.stations else None
+
+    def split(self, invoice):
+        """
+        Returns [(station, printer, sub_invoice)], one per station with products, in
+        station table order. Sub-invoices share everything but `products` and carry
+        `station`, which selects the kitchen layout and keeps their spool keys apart.
+        """
+        groups = {}
+        for prod in invoice.get("products") or ():
+            station = self.station_for(prod)
+            if station:
+                groups.setdefault(station, []).append(prod)
+        result = []
+        for station, products in sorted(groups.items(), key=lambda g: list(self.stations).index(g[0])):
+            printer = self.stations[station].get("printer")
+            if not printer:
+                print(f"[X] Station {station} has no printer, its items stay on the receipt only.")
+                continue
+            sub = dict(invoice)
+            sub["products"] = products
+            sub["station"] = station
+            result.append((station, printer, sub))
+        return result
+
+def refresh_routes(cuit, device_id):
+    """Fetches the routing table from Laravel and caches it; falls back to the cached copy."""
+    routes = fetch_routes(cuit, device_id)
+    if routes is None:
+        return load_routes()
+    save_routes(routes)
+    return routes
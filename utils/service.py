@@ -0,0 +1,80 @@
+# service.py — ciclo de vida del listener
+import signal
+import threading
+
+SUPERVISE_INTERVAL = 5.0
+
+class Supervisor:
+    """
+    Owns the main thread: blocks on a stop event (no polling loop), restarts
+    supervised threads that died, and runs every stop hook on shutdown.
+    `factory()` must start and return the thread for a service.
+    """
+
+    def __init__(self, interval=SUPERVISE_INTERVAL):
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.restarts = {}
+        self._services = []
+        self._stop_hooks = []
+
+    def add(self, name, factory, on_stop=None):
+        self._services.append({"name": name, "factory": factory, "on_stop": on_stop, "thread": None})
+        self.restarts[name] = 0
+
+    def on_shutdown(self, fn):
+        self._stop_hooks.append(fn)
+
+    def install_signal_handlers(self):
+        for sig in ("SIGINT", "SIGTERM", "SIGBREAK"):
+            if hasattr(signal, sig):
+                try:
+                    signal.signal(getattr(signal, sig), lambda signum, frame: self.stop())
+                except ValueError:
+                    pass  # solo se puede desde el hilo principal
+
+    def _start(self, service):
+        try:
+            service["thread"] = service["factory"]()
+        except Exception as e:
+            service["thread"] = None
+            print(f"[X] Failed to start {service['name']}: {e}")
+
+    def check(self):
+        for service in self._services:
+            thread = service["thread"]
+            if thread is None or not thread.is_alive():
+                if thread is not None:
+                    self.restarts[service["name"]] += 1
+                    print(f"[↻] {service['name']} stopped, restarting.")
+                self._start(service)
+
+    def run(self):
+        """Starts every service and blocks until stop() is called or a signal arrives."""
+        self.install_signal_handlers()
+        for service in self._services:
+            self._start(service)
+        try:
+            while not self.stop_event.wait(self.interval):
+                self.check()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def shutdown(self):
+        self.stop_event.set()
+        hooks = [(s["name"], s["on_stop"]) for s in reversed(self._services) if s["on_stop"]]
+        hooks += [(getattr(fn, "__qualname__", "hook"), fn) for fn in self._stop_hooks]
+        for name, fn in hooks:
+            try:
+                fn()
+            except Exception as e:
+                print(f"[X] Failed to stop {name}: {e}")
+
+    def status(self):
+        return {s["name"]: {"alive": bool(s["thread"] and s["thread"].is_alive()),
+                            "restarts": self.restarts[s["name"]]} for s in self._services}
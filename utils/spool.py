@@ -0,0 +1,213 @@
+# spool.py
+import queue
+import sqlite3
+import threading
+import time
+from utils import fastjson
+
+SPOOL_FILE = "spool.db"
+RETRY_BASE = 2.0        # segundos; se duplica en cada intento
+RETRY_MAX = 300.0
+RETRY_POLL = 1.0
+BATCH_SIZE = 500        # operaciones por transacción (un solo fsync por lote)
+DONE_RETENTION = 7 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE,
+    destination TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_next ON jobs (status, next_attempt);
+"""
+
+def job_key(invoice, destination):
+    """
+    Deduplication key: the same invoice `code` (or station sub-ticket) on the same printer
+    prints once. In gateway mode `tenant` keeps two companies' invoice numbers apart.
+    """
+    code = invoice.get("code")
+    if code in (None, ""):
+        return None
+    station = invoice.get("station")
+    key = f"{code}#{station}@{destination}" if station else f"{code}@{destination}"
+    tenant = invoice.get("tenant")
+    return f"{tenant}/{key}" if tenant else key
+
+def backoff(attempts):
+    return min(RETRY_MAX, RETRY_BASE * 2 ** max(0, attempts - 1))
+
+class PrintSpool:
+    """
+    Write-ahead spool in SQLite (WAL). Every job is committed before it is handed to
+    the printer and marked done afterwards, so a crash or a failed send never loses a
+    ticket. All statements run on a single writer thread that groups whatever is
+    queued into one transaction, so bursts cost one fsync per batch instead of per job.
+    That only coalesces when callers don't wait for each insert: the Pusher thread
+    uses add(on_added=...) and the job reaches the dispatcher from the writer thread.
+
+    Job states: "queued" (handed to the dispatcher), "retry" (failed, waiting for
+    `next_attempt`) and "done".
+    """
+
+    def __init__(self, path=None):
+        self.path = path  # None = SPOOL_FILE al arrancar (puede venir de config.json)
+        self._ops = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._writer, args=(ready,), name="print-spool", daemon=True)
+            self._thread.start()
+            ready.wait()
+        return self
+
+    def _writer(self, ready):
+        db = sqlite3.connect(self.path or SPOOL_FILE, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=FULL")
+        db.executescript(SCHEMA)
+        ready.set()
+        while True:
+            batch = [self._ops.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._ops.get_nowait())
+                except queue.Empty:
+                    break
+            db.execute("BEGIN")
+            results = []
+            try:
+                for fn, args, reply in batch:
+                    try:
+                        results.append((fn(db, *args), None))
+                    except Exception as e:
+                        results.append((None, e))
+                db.execute("COMMIT")
+            except Exception as e:
+                print(f"[X] Spool commit failed: {e}")
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                results = [(None, e)] * len(batch)
+            # recién después del COMMIT: quien espera (o su callback) ve el job ya en disco
+            for (_, _, reply), result in zip(batch, results):
+                if isinstance(reply, _Reply):
+                    reply.append(result)
+                    reply.event.set()
+                elif reply is not None:
+                    try:
+                        reply(*result)
+                    except Exception as e:
+                        print(f"[X] Spool callback failed: {e}")
+
+    def _call(self, fn, *args, wait=True, after=None):
+        """Runs `fn` on the writer thread. Without `wait`, `after(result, error)` (if given) runs there after the commit."""
+        if not wait:
+            self._ops.put((fn, args, after))
+            return None
+        reply = _Reply()
+        self._ops.put((fn, args, reply))
+        reply.event.wait()
+        result, error = reply[0]
+        if error:
+            raise error
+        return result
+
+    # --- operaciones (corren en el hilo escritor) ---
+
+    @staticmethod
+    def _add(db, key, destination, payload, now):
+        cur = db.execute(
+            "INSERT OR IGNORE INTO jobs (key, destination, payload, status, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?)", (key, destination, payload, now, now))
+        return cur.lastrowid if cur.rowcount else None
+
+    @staticmethod
+    def _done(db, job_id, now):
+        db.execute("UPDATE jobs SET status = 'done', updated_at = ? WHERE id = ?", (now, job_id))
+
+    @staticmethod
+    def _failed(db, job_id, error, now):
+        row = db.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        attempts = (row[0] if row else 0) + 1
+        db.execute("UPDATE jobs SET status = 'retry', attempts = ?, next_attempt = ?, last_error = ?, updated_at = ? "
+                   "WHERE id = ?", (attempts, now + backoff(attempts), str(error), now, job_id))
+
+    @staticmethod
+    def _claim(db, statuses, now):
+        marks = ",".join("?" * len(statuses))
+        rows = db.execute(f"SELECT id, destination, payload FROM jobs WHERE status IN ({marks}) AND next_attempt <= ? "
+                          "ORDER BY id", (*statuses, now)).fetchall()
+        db.executemany("UPDATE jobs SET status = 'queued', updated_at = ? WHERE id = ?", [(now, r[0]) for r in rows])
+        return rows
+
+    @staticmethod
+    def _prune(db, before):
+        db.execute("DELETE FROM jobs WHERE status = 'done' AND updated_at < ?", (before,))
+
+    # --- API pública ---
+
+    def add(self, invoice, destination, on_added=None):
+        """
+        Durably records a job. Returns its id, or None if it is a duplicate. With
+        `on_added(job_id, error)` it returns at once instead, and the writer thread calls
+        it once the batch holding the job is committed (job_id None for a duplicate).
+        """
+        args = (job_key(invoice, destination), destination, fastjson.dumps(invoice), time.time())
+        if on_added is not None:
+            return self._call(self._add, *args, wait=False, after=on_added)
+        return self._call(self._add, *args)
+
+    def mark_done(self, job_id):
+        self._call(self._done, job_id, time.time(), wait=False)
+
+    def mark_failed(self, job_id, error):
+        self._call(self._failed, job_id, error, time.time(), wait=False)
+
+    def recover(self):
+        """Jobs left "queued" or "retry" by a previous run, to be printed again."""
+        return self._decode(self._call(self._claim, ("queued", "retry"), float("inf")))
+
+    def due(self):
+        """Failed jobs whose backoff has expired."""
+        return self._decode(self._call(self._claim, ("retry",), time.time()))
+
+    def prune(self):
+        self._call(self._prune, time.time() - DONE_RETENTION, wait=False)
+
+    @staticmethod
+    def _decode(rows):
+        return [(job_id, destination, fastjson.loads(payload)) for job_id, destination, payload in rows]
+
+class _Reply(list):
+    def __init__(self):
+        super().__init__()
+        self.event = threading.Event()
+
+def start_retry_loop(spool, submit, interval=RETRY_POLL, stop_event=None):
+    """Resubmits failed jobs once their backoff expires. `submit(invoice, destination, job_id)`. Returns the thread."""
+    stop_event = stop_event or threading.Event()
+
+    def loop():
+        last_prune = 0
+        while not stop_event.wait(interval):
+            try:
+                for job_id, destination, invoice in spool.due():
+                    submit(invoice, destination, job_id)
+                if time.time() - last_prune > 3600:
+                    spool.prune()
+                    last_prune = time.time()
+            except Exception as e:
+                print(f"[X] Spool retry failed: {e}")
+
+    thread = threading.Thread(target=loop, name="spool-retry", daemon=True)
+    thread.start()
+    return thread
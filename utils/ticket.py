@@ -2,10 +2,12 @@
 import base64
 import json
 from datetime import datetime
-import qrcode
-from PIL import Image
+from functools import lru_cache
+from utils.escpos import DEFAULT_CODEPAGE, encode_lines, raster_image
+from utils.layout import PAPERS, CENTER, TITLE, BIG, CompiledLayout, Text, Columns, Separator, Feed, Each
+from utils.metrics import span
 
-def generate_afip_qr(data, company_session, fields):
+def afip_qr_url(data, company_session, fields):
     doc_qr = {
         "ver": 1,
         "fecha": data.get("date", datetime.today().strftime("%Y-%m-%d")),
@@ -22,75 +24,158 @@ def generate_afip_qr(data, company_session, fields):
         "codAut": int(fields["cae"])
     }
     encoded = base64.b64encode(json.dumps(doc_qr, separators=(",", ":")).encode("utf-8")).decode("utf-8")
-    url = f"https://servicioscf.afip.gob.ar/publico/comprobantes/cae.aspx?p={encoded}"
-    return qrcode.make(url)
+    return f"https://servicioscf.afip.gob.ar/publico/comprobantes/cae.aspx?p={encoded}"
+
+QR_MODE = "native"      # "native" (GS ( k, lo arma la impresora) o "raster" (imagen 1-bit precalculada)
+QR_GDI_SIZE = 300       # píxeles del QR en la impresión GDI
+QR_CACHE_SIZE = 256     # reimpresiones recientes
+QR_MASK_PATTERN = 0     # máscara fija: evita evaluar las 8 máscaras (~4x más rápido); None = la óptima
+
+_INVERT = bytes(255 - i for i in range(256))
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def qr_bitmap(url, dots):
+    """
+    Packs the QR into 1-bit rows (1 = black, MSB first) scaled by the largest integer
+    factor that fits in `dots`, so no resampling is ever needed. Returns (rows, width_bytes).
+    """
+    import qrcode  # solo con QR raster/GDI; el modo nativo no lo necesita
+    qr = qrcode.QRCode(border=0, error_correction=qrcode.constants.ERROR_CORRECT_M, mask_pattern=QR_MASK_PATTERN)
+    qr.add_data(url)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+    box = max(1, dots // len(matrix))
+    width_bytes = (len(matrix) * box + 7) // 8
+    on, off = "1" * box, "0" * box
+    rows = bytearray()
+    for row in matrix:
+        bits = "".join(on if cell else off for cell in row).ljust(width_bytes * 8, "0")
+        rows += int(bits, 2).to_bytes(width_bytes, "big") * box
+    return bytes(rows), width_bytes
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def qr_raster(url, dots):
+    return raster_image(*qr_bitmap(url, dots))
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def qr_image(url, size=QR_GDI_SIZE):
+    from PIL import Image
+    rows, width_bytes = qr_bitmap(url, size)
+    height = len(rows) // width_bytes
+    # En modo "1" de PIL el bit en 1 es blanco
+    return Image.frombytes("1", (width_bytes * 8, height), rows.translate(_INVERT)).crop((0, 0, height, height))
+
+def generate_afip_qr(data, company_session, fields):
+    return qr_image(afip_qr_url(data, company_session, fields))
+
+def product_row(prod):
+    pivot = prod["pivot"]
+    cantidad = float(pivot["amount"])
+    precio = float(pivot["price"])
+    tax = pivot.get("taxe", None)
+    return {"qty": cantidad, "price": precio, "subtotal": cantidad * precio,
+            "tax": tax, "has_tax": tax is not None, "name": prod.get("name", "")}
+
+def ticket_layout(width, item_cols, total_width):
+    return [
+        # Encabezado
+        Text("RAZON SOCIAL: {company.name|upper}"),
+        Text("{client.name}"),
+        Text("DIRECCION: {company.address}"),
+        Text("C.U.I.T.: {company.document_number}"),
+        Text("IIBB: {fields.income_brut|default=---}", when="billing"),
+        Text("INICIO ACT: {fields.activity_start_date|default=---}", when="billing"),
+        Separator(),
 
-def generate_ticket_text(data):
-    lines = []
-    sep = "-" * 32
-    qr_image = None
+        # Factura centrada
+        Text("{fields.voucher_type.Desc|upper}", when="billing", style=TITLE),
+        Text("Código: {fields.voucher_type.Id}", when="billing", style=CENTER),
+        Separator(when="billing"),
+
+        # Datos de la factura
+        Text("NRO: {code}"),
+        Text("CLIENTE: {client.name|default=CONSUMIDOR FINAL}"),
+        Text("FECHA: {date}"),
+        Text("HORA: {hour}"),
+        Text("Vendedor: {seller.name}"),
+        Text("TIPO: {invoice_type.name}"),
+        Text("CONCEPTO: {fields.concept_type.Desc}", when="billing"),
+        Each("tables", [Text("MESA: {table.name} SALA {table.living_room.name}")], name="table"),
+        Separator(),
+
+        # Detalle
+        Text("Cant x P.Unit".ljust(sum(item_cols) - 1 - len("IMPORTE")) + "IMPORTE"),
+        Text("Descripcion"),
+        Separator(),
+        Each("products", [
+            Columns(("{prod.qty:.2f} x {prod.price:.2f}", item_cols[0], "<"), ("{prod.subtotal:.2f}", item_cols[1], ">")),
+            Text("IVA {prod.tax}%", when=("prod.has_tax", "billing")),
+            Text("{prod.name|upper}", wrap=True),
+        ], name="prod", prepare=product_row),
+        Separator(),
+        Text("TOTAL: {total|float:>%d.2f}" % total_width, style=BIG),
+        Separator(),
+
+        # CAE y Vto
+        Text("CAE: {fields.cae}", when="billing"),
+        Text("Vto: {fields.caef_ch_vto}", when="billing"),
+        Feed(3),
+    ]
+
+def kitchen_layout(width):
+    # Comanda de estación: sin precios ni QR, cantidades grandes para leer de lejos
+    return [
+        Text("{station|upper}", style=TITLE),
+        Text("NRO: {code}"),
+        Text("FECHA: {date} {hour}"),
+        Text("Vendedor: {seller.name}"),
+        Each("tables", [Text("MESA: {table.name} SALA {table.living_room.name}", style=BIG)], name="table"),
+        Separator(),
+        Each("products", [Text("{prod.qty:g} x {prod.name|upper}", style=BIG, wrap=True)],
+             name="prod", prepare=product_row),
+        Separator(),
+        Feed(3),
+    ]
+
+_layouts = {}
+
+def get_layout(paper="58mm", kind="receipt"):
+    """Compiles the ticket (or kitchen) layout for a paper size once and reuses it."""
+    layout = _layouts.get((paper, kind))
+    if layout is None:
+        profile = PAPERS[paper]
+        if kind == "kitchen":
+            rows = kitchen_layout(profile["width"])
+        else:
+            rows = ticket_layout(profile["width"], profile["item_cols"], profile["total_width"])
+        layout = _layouts[paper, kind] = CompiledLayout(rows, profile["width"], extras=("fields",))
+    return layout
+
+def layout_kind(data):
+    return "kitchen" if data.get("station") else "receipt"
+
+def invoice_fields(data):
+    if data.get("station"):
+        return {}
+    return data.get("electronic_invoice", {}).get("fields", {}) if data.get("billing") else {}
+
+def generate_ticket_text(data, paper="58mm"):
     company = data.get("company", {})
-    fields = data.get("electronic_invoice", {}).get("fields", {}) if data.get("billing") else {}
-
-    # Encabezado
-    lines.append(f"RAZON SOCIAL: {company.get('name', '').upper()}")
-    lines.append(f"{data.get('client', {}).get('name', '')}")
-    lines.append(f"DIRECCION: {company.get('address', '')}")
-    lines.append(f"C.U.I.T.: {company.get('document_number', '')}")
-    if data.get("billing"):
-        lines.append(f"IIBB: {fields.get('income_brut', '---')}")
-        lines.append(f"INICIO ACT: {fields.get('activity_start_date', '---')}")
-    lines.append(sep)
-
-    # Factura centrada
-    if data.get("billing"):
-        lines.append(fields.get('voucher_type', {}).get('Desc', '').upper())
-        lines.append(f"Código: {fields.get('voucher_type', {}).get('Id', '')}")
-        lines.append(sep)
-
-
-    # Datos de la factura
-    lines.append(f"NRO: {data.get('code', '')}")
-    lines.append(f"CLIENTE: {data.get('client', {}).get('name', 'CONSUMIDOR FINAL')}")
-    lines.append(f"FECHA: {data.get('date', '')}")
-    lines.append(f"HORA: {data.get('hour', '')}")
-    vendedor = data.get("seller", {})
-    lines.append(f"Vendedor: {vendedor.get('name', '')}")
-    lines.append(f"TIPO: {data.get('invoice_type', {}).get('name', '')}")
-    if data.get("billing"):
-        lines.append(f"CONCEPTO: {fields.get('concept_type', {}).get('Desc', '')}")
-
-    if data.get("tables"):
-        for table in data["tables"]:
-            lines.append(f"MESA: {table.get('name', '')} SALA {table.get('living_room', {}).get('name', '')}")
-
-    lines.append(sep)
-
-    # Detalle
-    lines.append("Cant x P.Unit        IMPORTE")
-    lines.append("Descripcion")
-    lines.append(sep)
-
-    for prod in data.get("products", []):
-        cantidad = float(prod["pivot"]["amount"])
-        precio = float(prod["pivot"]["price"])
-        subtotal = cantidad * precio
-        tax = prod["pivot"].get("taxe", None)
-
-        lines.append(f"{cantidad:.2f} x {precio:.2f}".ljust(19) + f"{subtotal:.2f}".rjust(10))
-        if tax is not None and data.get("billing"):
-            lines.append(f"IVA {tax}%")
-        lines.append(prod.get("name", "").upper())
-
-    lines.append(sep)
-    lines.append(f"TOTAL: {float(data['total']):>22.2f}")
-    lines.append(sep)
-
-    # CAE y Vto
-    if data.get("billing"):
-        lines.append(f"CAE: {fields.get('cae', '')}")
-        lines.append(f"Vto: {fields.get('caef_ch_vto', '')}")
-        qr_image = generate_afip_qr(data, company, fields) if data.get("billing") else None
-
-    lines.append("\n" * 3)
-    return "\n".join(lines), qr_image
+    fields = invoice_fields(data)
+    content = get_layout(paper, layout_kind(data)).render_text(data, fields=fields)
+    qr_image = generate_afip_qr(data, company, fields) if data.get("billing") and not data.get("station") else None
+    return content, qr_image
+
+def generate_ticket_bytes(data, paper="58mm", codepage=DEFAULT_CODEPAGE):
+    """Renders the ticket straight to ESC/POS, with the AFIP QR as a native printer command."""
+    with span("print_stage_seconds", stage="render", paper=paper):
+        fields = invoice_fields(data)
+        lines = get_layout(paper, layout_kind(data)).render(data, fields=fields)
+    qr = None
+    if data.get("billing") and not data.get("station"):
+        with span("print_stage_seconds", stage="qr", paper=paper):
+            qr = afip_qr_url(data, data.get("company", {}), fields)
+            if QR_MODE == "raster":
+                qr = qr_raster(qr, PAPERS[paper]["qr_dots"])
+    with span("print_stage_seconds", stage="encode", paper=paper):
+        return encode_lines(lines, codepage, qr=qr, qr_dots=PAPERS[paper]["qr_dots"])
@@ -1,13 +1,133 @@
 # websocket_handler.py
 import json
+import os
 import threading
-import websocket
-from utils.printer import print_invoice
+import time
+from utils import render_pool
+from utils.api import authorize_channel, fetch_missed_orders
+from utils.backends import supported
+from utils.config import load_routes
+from utils.connection_pool import pool
+from utils.dispatcher import PrintDispatcher
+from utils.fastjson import decode_payload
+from utils.health import HealthMonitor
+from utils.history import TicketHistory
+from utils.lan_api import LanPrintApi
+from utils.metrics import MetricsServer, log_event, registry, routes, span
+from utils.printer import on_sent, print_batch, print_invoice
+from utils.pusher_client import PusherClient, sign_channel
+from utils.routing import Router, refresh_routes
+from utils.service import Supervisor
+from utils.spool import PrintSpool, start_retry_loop
 
-PUSHER_APP_KEY = "baa549b06e82421f4895"
+PUSHER_APP_KEY = "baa549b06e82421f4895"  # el index.py viejo usaba "30f8b5b5dfcc8631cb40"
 PUSHER_CLUSTER = "us2"
 CHANNEL = "comandas"
+# Canal propio por empresa, p.ej. "private-comandas.{cuit}" (None = canal compartido CHANNEL)
+TENANT_CHANNEL = None
+PUSHER_APP_SECRET = None  # si está, los canales privados se firman localmente en vez de pedirlo a Laravel
 EVENT_NAME = "NewOrderComanda"
+METRICS_ENABLED = True
+HEALTH_ENABLED = True
+HISTORY_ENABLED = True
+LAN_API_ENABLED = False  # POST /print en la red local (ver utils/lan_api.py); conviene con lan_api_token
+# Failover: {"192.168.0.50": "192.168.0.51"} por impresora, y/o una de respaldo para todas
+FALLBACKS = {}
+FALLBACK_PRINTER = None
+COALESCE_WINDOW = 0.0
+COALESCE_MAX = 1
+
+spool = PrintSpool()
+
+def on_job_done(job, error):
+    if job.job_id is None:
+        return
+    if error is None:
+        spool.mark_done(job.job_id)
+    else:
+        spool.mark_failed(job.job_id, error)
+
+health = HealthMonitor(lambda: [], FALLBACKS, FALLBACK_PRINTER)
+
+def print_with_failover(invoice, destination):
+    health.with_failover(destination, lambda target: print_invoice(invoice, target))
+
+def print_batch_with_failover(invoices, destination):
+    return health.with_failover(destination, lambda target: print_batch(invoices, target))
+
+dispatcher = PrintDispatcher(print_with_failover, on_done=on_job_done, batch_handler=print_batch_with_failover)
+router = Router(load_routes())
+registry.gauge(dispatcher.gauges)
+registry.gauge(health.gauges)
+registry.gauge(lambda: [(f"printer_pool_{k}", {}, v) for k, v in pool.stats.items()])
+
+def enqueue_print(invoice, destination, received_at=None, wait=False):
+    """
+    Records the job in the spool before printing; redeliveries of the same invoice (from
+    Pusher or the LAN API) are ignored. Without `wait` the caller (the Pusher thread) only
+    queues the insert: the writer thread commits a whole burst at once and then hands
+    each job to the dispatcher, and this returns True. With `wait` it returns False
+    for a duplicate.
+    """
+    if wait:
+        return _spooled(invoice, destination, received_at, spool.add(invoice, destination))
+    spool.add(invoice, destination, on_added=lambda job_id, error: _spooled(invoice, destination, received_at,
+                                                                             job_id, error))
+    return True
+
+def _spooled(invoice, destination, received_at, job_id, error=None):
+    if error is not None:
+        # sin spool se imprime igual: mejor sin reintento que perder la comanda
+        log_event("spool_failed", f"[X] Could not spool {invoice.get('code')}: {error}", level="error",
+                  printer=destination, code=invoice.get("code"), error=str(error))
+        dispatcher.submit(invoice, destination, None, received_at)
+        return True
+    if job_id is None:
+        registry.inc("print_duplicates_total", printer=destination)
+        log_event("duplicate", f"[!] Invoice {invoice.get('code')} already printed on {destination}, skipping.",
+                  printer=destination, code=invoice.get("code"))
+        return False
+    dispatcher.submit(invoice, destination, job_id, received_at)
+    return True
+
+def start_metrics(supervisor, host=None, port=None):
+    try:
+        server = MetricsServer(host, port)
+    except OSError as e:
+        print(f"[X] Metrics endpoint unavailable: {e}")
+        return None
+    supervisor.add("metrics", server.start, on_stop=server.stop)
+    print(f"[📈] Metrics on http://{server.host}:{server.port}/metrics")
+    return server
+
+history = TicketHistory()
+
+def start_lan_api(supervisor, submit):
+    """`submit(payload, received_at)` is process_payload for the printers this listener serves."""
+    try:
+        api = LanPrintApi(submit)
+    except (OSError, ValueError) as e:
+        print(f"[X] LAN print API unavailable: {e}")
+        return None
+    supervisor.add("lan-api", api.start, on_stop=api.stop)
+    print(f"[🖧] LAN print API on http://{api.host}:{api.port}/print")
+    return api
+
+def start_history():
+    """Keeps the bytes of every printed ticket for reprints (GET /history, POST /reprint)."""
+    history.start()
+    on_sent(history.record)
+    routes[("GET", "/history")] = history.http_find
+    routes[("POST", "/reprint")] = history.http_reprint
+
+def start_spool(supervisor):
+    spool.start()
+    pending = spool.recover()
+    if pending:
+        print(f"[↻] Replaying {len(pending)} pending tickets from the spool.")
+    for job_id, destination, invoice in pending:
+        dispatcher.submit(invoice, destination, job_id)
+    supervisor.add("spool-retry", lambda: start_retry_loop(spool, dispatcher.submit, stop_event=supervisor.stop_event))
 
 def build_pusher_ws_url():
     clusters = {
@@ -18,29 +138,119 @@ def build_pusher_ws_url():
     }
     return f"wss://{clusters.get(PUSHER_CLUSTER, 'ws.pusherapp.com')}/app/{PUSHER_APP_KEY}?protocol=7&client=python"
 
+def default_destination(printers):
+    """First printable printer the health monitor doesn't know to be down (the first one if all are)."""
+    printable = [p for p in printers if supported(p)]
+    for p in printable:
+        if health.is_usable(p["identifier"]):
+            return p["identifier"]
+    return printable[0]["identifier"] if printable else None
+
+def health_targets(printers):
+    targets = [p["identifier"] for p in list(printers)]
+    targets += list(dispatcher.stats())
+    targets += [s.get("printer") for s in router.stations.values()]
+    targets += list(health.fallbacks.values()) + [health.default_fallback]
+    return targets
+
+def start_health(supervisor, targets):
+    health.targets = targets
+    supervisor.add("health", lambda: health.start(supervisor.stop_event))
+
+def start_pipeline(supervisor, targets):
+    """Everything between the WebSocket and the printers; `targets()` lists the printers to watch."""
+    # ajustes que viven en objetos creados al importar (config.apply_settings cambia las constantes)
+    health.fallbacks, health.default_fallback = dict(FALLBACKS), FALLBACK_PRINTER
+    dispatcher.coalesce_window, dispatcher.coalesce_max = COALESCE_WINDOW, COALESCE_MAX
+    if render_pool.start():
+        supervisor.on_shutdown(render_pool.stop)
+    start_spool(supervisor)
+    if HISTORY_ENABLED:
+        start_history()
+    if HEALTH_ENABLED:
+        start_health(supervisor, targets)
+
+def device_status():
+    """Small summary sent with the registration heartbeat."""
+    return {
+        "pusher": pusher.state if pusher else None,
+        "printers": {d: e["state"] for d, e in list(health.table.items())},
+        "queued": sum(s["depth"] for s in dispatcher.stats().values()),
+    }
+
+def refresh_routes_async(cuit, device_id):
+    """The cached table is used right away; Laravel's copy replaces it when (if) it arrives."""
+    def refresh():
+        router.update(refresh_routes(cuit, device_id))
+        if router.stations:
+            print(f"[🍳] Routing items to {len(router.stations)} stations: {', '.join(router.stations)}")
+    threading.Thread(target=refresh, name="routes-refresh", daemon=True).start()
+
+def allowed_destinations(printers, router=router):
+    """What an order from the network may name: discovered printers, route stations and fallbacks."""
+    allowed = {p["identifier"] for p in printers} | {p.get("name") for p in printers}
+    allowed |= {s.get("printer") for s in router.stations.values()}
+    allowed |= set(health.fallbacks.values()) | {health.default_fallback}
+    allowed.discard(None)
+    return allowed
+
+def process_payload(payload, printers, received_at=None, router=router, wait=False):
+    """
+    Queues the receipt and station tickets of one order. Returns how many were queued;
+    duplicates are only left out of the count with `wait` (see enqueue_print).
+    Raises ValueError when the order names a printer outside allowed_destinations.
+    """
+    invoice = payload.get("invoice")
+    printer = payload.get("printer")
+    # "printer_address": el payload que mandaba el backend de index.py, con la impresora como texto
+    requested = printer.get("name") if isinstance(printer, dict) else payload.get("printer_address")
+    if requested and requested not in allowed_destinations(printers, router):
+        # ni file:, ni null:, ni IPs sueltas: el pedido llega de la red
+        raise ValueError(f"unknown printer {requested!r}")
+    destination = requested or default_destination(printers)
+    if not invoice:
+        return 0
+    queued = 0
+    if router.stations:
+        # cada estación tiene su propia cola: se imprimen en paralelo
+        for station, target, sub in router.split(invoice):
+            registry.inc("routed_tickets_total", station=station)
+            queued += enqueue_print(sub, target, received_at, wait)
+        if not router.receipt:
+            return queued
+    if destination:
+        queued += enqueue_print(invoice, destination, received_at, wait)
+    return queued
+
 def handle_pusher_message(ws, message, printers, cuit):
+    received_at = time.monotonic()
     try:
-        msg = json.loads(message)
+        msg = json.loads(message) if isinstance(message, str) else message
         event = msg.get("event")
         expected_event = f"{EVENT_NAME}_{cuit}"
 
-
-        if event == "pusher:connection_established":
-            ws.send(json.dumps({"event": "pusher:subscribe", "data": {"channel": CHANNEL}}))
-            on_open()
-
-        elif event == expected_event:
-            payload = json.loads(msg["data"]) if isinstance(msg["data"], str) else msg["data"]
-            invoice = payload.get("invoice")
-            printer = payload.get("printer")
-            if invoice:
-                print_invoice(invoice, printer['name'])
-            elif printers:
-                print_invoice(invoice, printers[0]['identifier'])
+        if event == expected_event:
+            with span("print_stage_seconds", stage="decode"):
+                payload = decode_payload(msg["data"])
+            process_payload(payload, printers, received_at)
     except Exception as e:
-        print(f"[X] Failed to process message: {e}")
+        registry.inc("message_errors_total")
+        log_event("message_failed", f"[X] Failed to process message: {e}", level="error", error=str(e))
+
+def catch_up(cuit, device_id, since, printers):
+    """Prints orders issued while disconnected; the spool drops the ones already printed."""
+    orders = fetch_missed_orders(cuit, device_id, since)
+    if orders:
+        print(f"[↻] Recovering {len(orders)} orders missed while disconnected.")
+    for payload in orders:
+        try:
+            process_payload(payload, printers)
+        except Exception as e:
+            print(f"[X] Failed to recover order: {e}")
 
 def on_open():
+    if os.name != "nt":
+        return
     try:
         import subprocess
         subprocess.Popen(['powershell', '-Command', 
@@ -49,22 +259,50 @@ def on_open():
     except Exception as e:
         print("[X] Notificación fallida:", e)
 
-def connect_to_pusher(printers, cuit):
-    url = build_pusher_ws_url()
+pusher = None
+
+def connect_to_pusher(printers, cuit, supervisor=None, url=None, device_id=None):
+    """Runs the listener on the calling thread until a signal or supervisor.stop()."""
+    supervisor = supervisor or Supervisor()
+    refresh_routes_async(cuit, device_id)
+    start_pipeline(supervisor, lambda: health_targets(printers))
+    channel = TENANT_CHANNEL.format(cuit=cuit) if TENANT_CHANNEL else CHANNEL
 
-    ws = websocket.WebSocketApp(
-        url,
-        on_open=lambda ws: print("[✅] Connected to Pusher WebSocket."),
-        on_message=lambda ws, msg: handle_pusher_message(ws, msg, printers, cuit),
-        on_error=lambda ws, err: print("[X] WebSocket error:", err),
-        on_close=lambda ws, code, msg: print("[X] WebSocket closed:", msg)
+    def authorizer(socket_id, channel_name):
+        if PUSHER_APP_SECRET:
+            return sign_channel(PUSHER_APP_KEY, PUSHER_APP_SECRET, socket_id, channel_name)
+        return authorize_channel(cuit, device_id, socket_id, channel_name)
+
+    client = PusherClient(
+        url or build_pusher_ws_url(),
+        [channel],
+        events={f"{EVENT_NAME}_{cuit}"},
+        authorizer=authorizer,
+        on_event=lambda msg: handle_pusher_message(client.ws, msg, printers, cuit),
+        on_connected=lambda first: on_open() if first else None,
+        on_resume=lambda since: catch_up(cuit, device_id, since, printers),
     )
+    if LAN_API_ENABLED:
+        # la API LAN espera al spool para contestar "duplicate"; corre en sus propios hilos
+        start_lan_api(supervisor, lambda payload, received_at: process_payload(payload, printers, received_at,
+                                                                               wait=True))
+    run_pusher(supervisor, client)
 
-    threading.Thread(target=ws.run_forever, daemon=True).start()
+def run_pusher(supervisor, client):
+    """Runs `client` under the supervisor (with the metrics endpoint) until shutdown."""
+    global pusher
+    pusher = client
 
-    try:
-        while True:
-            pass
-    except KeyboardInterrupt:
-        ws.close()
-        print("[⏹️] Listener stopped.")
+    def start_pusher():
+        thread = threading.Thread(target=client.run, args=(supervisor.stop_event,), name="pusher", daemon=True)
+        thread.start()
+        return thread
+
+    registry.gauge(lambda: [(f"pusher_{k}", {}, v) for k, v in client.stats.items()
+                            if isinstance(v, (int, float)) and k != "last_connected"])
+    supervisor.add("pusher", start_pusher, on_stop=client.close)
+    if METRICS_ENABLED:
+        start_metrics(supervisor)  # después de Pusher: no demora la conexión
+    supervisor.on_shutdown(dispatcher.stop)
+    supervisor.run()
+    print("[⏹️] Listener stopped.")